@@ -1,3 +1,9 @@
+import time
+STARTUP_TIME = time.perf_counter()  # Taken before the heavy imports for first-frame timing
+
+import import_profiler
+import_profiler.start()  # No-op unless ATTENDANCE_PROFILE_IMPORTS=1 or --profile-imports
+
 import sys
 import os
 from PyQt5.QtGui import QIcon
@@ -54,7 +60,7 @@ if __name__ == '__main__':
         app.setWindowIcon(app_icon)
         
         # Create the main window instance
-        window = MainWindow()
+        window = MainWindow(startup_time=STARTUP_TIME)
         
         # Set window icon explicitly
         window.setWindowIcon(app_icon)
@@ -0,0 +1,169 @@
+# attendance.py command line entry point for running without the GUI
+#
+#   python -m attendance sync --once            one time + data sync, exit status 0 on success
+#   python -m attendance sync --daemon          keep syncing on the GUI's schedule
+#   python -m attendance hub [--sync]           serve terminals headless, optionally syncing too
+#   python -m attendance backup [--keep N]      one verified snapshot into backups/, for cron
+#   python -m attendance maintain [--if-due]    ANALYZE, vacuum and orphan cleanup, for cron
+#   python -m attendance import-attendance FILE  load historical attendance from a CSV
+#
+# Nothing here imports Qt, so it is cheap enough for cron and servers.
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+def build_core(on_sync_complete=None):
+    from db_manager import init_db
+    from sync_core import TimeSync, DataSync, SyncCore
+
+    init_db()
+    time_sync = TimeSync()
+    current_datetime = time_sync.get_current_datetime()
+    return SyncCore(time_sync, DataSync(current_datetime), current_datetime,
+                    on_sync_complete=on_sync_complete)
+
+def stop_on_signals():
+    """Event set by SIGINT or SIGTERM so the loops can finish cleanly"""
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+    return stop_event
+
+def run_daemon(core, interval):
+    import metrics
+
+    if interval:
+        core.fix_interval(interval)
+    previous = core.on_sync_complete
+
+    def on_sync_complete(success):
+        if previous:
+            previous(success)
+        metrics.registry.export()
+
+    core.on_sync_complete = on_sync_complete
+    if core.min_sync_interval == core.max_sync_interval:
+        print(f"Sync daemon running every {core.sync_interval} s in {os.getcwd()}")
+    else:
+        print(f"Sync daemon running every {core.min_sync_interval}-{core.max_sync_interval} s in {os.getcwd()}")
+    core.run_forever(stop_on_signals())
+    print("Sync daemon stopped")
+
+def command_sync(args):
+    core = build_core()
+    if args.daemon:
+        run_daemon(core, args.interval)
+        return 0
+
+    start = time.perf_counter()
+    success = core.sync_now()
+    print(f"Sync {'completed' if success else 'failed'} in {time.perf_counter() - start:.2f} s")
+    return 0 if success else 1
+
+def command_hub(args):
+    import hub_protocol
+    from hub_server import HubServer
+
+    host, port = hub_protocol.hub_address()
+    hub = HubServer(host=host, port=port, token=hub_protocol.hub_token())
+
+    def on_sync_complete(success):
+        # Staff and schedules may have changed; terminals drop their cached roster
+        if success:
+            hub.notify_reload()
+
+    core = build_core(on_sync_complete) if args.sync else None
+    if not hub.start():
+        return 1
+    try:
+        if core:
+            run_daemon(core, args.interval)
+        else:
+            stop_on_signals().wait()
+    finally:
+        hub.stop()
+    return 0
+
+def command_backup(args):
+    from db_backup import BackupManager, BACKUP_KEEP
+
+    manager = BackupManager(keep=args.keep or BACKUP_KEEP)
+    if args.if_due and not manager.is_due():
+        print("Latest snapshot is recent, nothing to do")
+        return 0
+    return 0 if manager.backup() else 1
+
+def command_maintain(args):
+    from db_manager import init_db
+    from db_maintenance import MaintenanceManager, enable_incremental_vacuum
+
+    init_db()
+    if args.enable_vacuum:
+        # Rewrites the whole file; the app should be closed
+        if enable_incremental_vacuum():
+            print("Incremental vacuum enabled")
+    manager = MaintenanceManager()
+    tasks = manager.due_tasks() if args.if_due else None
+    if tasks == []:
+        print("No maintenance due")
+        return 0
+    return 0 if manager.run(tasks) else 1
+
+def command_import_attendance(args):
+    from db_manager import init_db
+    from bulk_import import import_attendance, BATCH_SIZE
+
+    init_db()
+    result = import_attendance(args.file, batch_size=args.batch_size or BATCH_SIZE,
+                               allow_unknown_staff=args.allow_unknown_staff, rejects_path=args.rejects)
+    if result is None:
+        return 1
+    print(result.summary())
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="attendance", description="Silver Attendance without the GUI")
+    parser.add_argument("--dir", help="directory holding attendance.db (default: current directory)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync = commands.add_parser("sync", help="sync time and data from the server")
+    mode = sync.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--once", action="store_true", help="sync once and exit")
+    mode.add_argument("--daemon", action="store_true", help="keep syncing until interrupted")
+    sync.add_argument("--interval", type=int, help="fixed seconds between syncs (default: adapt between 30 and 900)")
+    sync.set_defaults(handler=command_sync)
+
+    hub = commands.add_parser("hub", help="serve attendance.db to terminals without a window")
+    hub.add_argument("--sync", action="store_true", help="also run the sync daemon and notify terminals")
+    hub.add_argument("--interval", type=int, help="fixed seconds between syncs (default: adapt between 30 and 900)")
+    hub.set_defaults(handler=command_hub)
+
+    backup = commands.add_parser("backup", help="snapshot attendance.db while it is in use")
+    backup.add_argument("--keep", type=int, help="snapshots to keep (default 7)")
+    backup.add_argument("--if-due", action="store_true", help="skip if the latest snapshot is under a day old")
+    backup.set_defaults(handler=command_backup)
+
+    maintain = commands.add_parser("maintain", help="analyze, vacuum and remove rows of deleted staff")
+    maintain.add_argument("--if-due", action="store_true", help="only the tasks whose interval has passed")
+    maintain.add_argument("--enable-vacuum", action="store_true",
+                          help="one-off full VACUUM to turn on incremental vacuum (close the app first)")
+    maintain.set_defaults(handler=command_maintain)
+
+    importer = commands.add_parser("import-attendance", help="load historical attendance from a CSV (close the app first)")
+    importer.add_argument("file", help="CSV with staff_id,work_date,work_in,work_off columns")
+    importer.add_argument("--batch-size", type=int, help="rows validated per batch (default 50000)")
+    importer.add_argument("--rejects", help="write the invalid rows and why to this CSV")
+    importer.add_argument("--allow-unknown-staff", action="store_true",
+                          help="import days of staff not in staff_tbl (default: skip them)")
+    importer.set_defaults(handler=command_import_attendance)
+
+    args = parser.parse_args(argv)
+    if args.dir:
+        os.chdir(args.dir)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
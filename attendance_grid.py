@@ -0,0 +1,348 @@
+# attendance_grid.py staff x day grid of past attendance, opened from the tray menu
+#
+# The model is virtual: a row per staff member and a column per day over
+# HISTORY_DAYS, but only the cells Qt asks for are read. Days are loaded
+# BLOCK_DAYS columns at a time with one date range query, and at most
+# MAX_BLOCKS blocks are kept, least recently used dropped first, so memory
+# stays flat however far back the grid is scrolled.
+#
+# Blocks are read on a loader thread, never while Qt paints: a missing
+# block's cells show empty, and fill in when the block arrives. The blocks
+# either side of those shown are read ahead, so stepping a week or a month
+# usually finds them already there.
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView, QPushButton,
+                             QComboBox, QLabel)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+
+import db_functions
+import metrics
+from hub_protocol import LOAD_ERRORS
+
+HISTORY_DAYS = 731  # two years back, through today
+BLOCK_DAYS = 7      # columns per range query
+MAX_BLOCKS = 16     # sixteen weeks of columns in memory: the shown month and a month's read-ahead either side
+# Blocks read ahead either side of the shown ones: enough for the next week, or the next month
+READ_AHEAD_BLOCKS = {False: 1, True: 5}
+LOADER_IDLE_SECONDS = 30  # the loader thread exits after this long without a request
+
+WEEK = "Week"
+MONTH = "Month"
+COLUMN_WIDTHS = {WEEK: 150, MONTH: 64}  # a month only shows hours; in and out are in the tooltip
+
+def display_time(value):
+    """
+    HH:MM:SS as utilities.format_time shows it ("08:05 PM"), by slicing: a
+    year of history holds tens of thousands of distinct times, too many to
+    run through strptime or keep in roster_row's cache.
+    """
+    if not value:
+        return ""
+    try:
+        hours = int(value[0:2])
+    except ValueError:
+        return value
+    return f"{(hours - 1) % 12 + 1:02d}:{value[3:5]} {'AM' if hours < 12 else 'PM'}"
+
+class AttendanceGridModel(QAbstractTableModel):
+    """Staff by day, from first_date through last_date"""
+    # Emitted by the loader thread; the queued connection runs _block_arrived on the UI thread
+    block_loaded = pyqtSignal(int, object, object)  # block, version it was read at, cells
+
+    def __init__(self, first_date, last_date, store=None, parent=None):
+        super().__init__(parent)
+        self.store = store if store is not None else db_functions
+        self.first_date = first_date
+        self.day_count = (last_date - first_date).days + 1
+        self.block_count = (self.day_count + BLOCK_DAYS - 1) // BLOCK_DAYS
+        self.compact = False
+        self.read_ahead = READ_AHEAD_BLOCKS[False]
+        # block index -> {staff_id * BLOCK_DAYS + column in block: (work_in, work_off, hours_worked)}
+        self.blocks = OrderedDict()
+        # Blocks waiting for the loader, shown ones first, and everything requested but not arrived
+        self.requests = OrderedDict()
+        self.loading = set()
+        # A read started before the block was invalidated (or the staff reloaded) is dropped on arrival
+        self.generation = 0
+        self.versions = {}
+        self.condition = threading.Condition()
+        self.loader = None
+        self.block_loaded.connect(self._block_arrived)
+        self.staff = []
+        self.reload_staff()
+
+    def reload_staff(self):
+        self.beginResetModel()
+        try:
+            self.staff = self.store.fetch_grid_staff()
+        except LOAD_ERRORS as e:
+            print(f"Error loading staff for the attendance grid: {str(e)}")
+            self.staff = []
+        self._drop_blocks()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.staff)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.day_count
+
+    def date_of(self, column):
+        return self.first_date + timedelta(days=column)
+
+    def column_of(self, day):
+        return min(max((day - self.first_date).days, 0), self.day_count - 1)
+
+    def _version(self, block):
+        return self.generation, self.versions.get(block, 0)
+
+    def _drop_blocks(self):
+        with self.condition:
+            self.generation += 1
+            self.blocks.clear()
+            # Only the block being read still arrives, and is dropped then
+            self.loading.difference_update(self.requests)
+            self.requests.clear()
+
+    def _request(self, block, urgent):
+        """Queue a block for the loader; shown blocks go ahead of read-ahead ones"""
+        if not 0 <= block < self.block_count or block in self.blocks:
+            return
+        with self.condition:
+            if block in self.loading and (not urgent or block not in self.requests):
+                return
+            self.loading.add(block)
+            self.requests[block] = None
+            if urgent:
+                self.requests.move_to_end(block, last=False)
+            # Scrolled far past them: more could not be kept anyway
+            while len(self.requests) > MAX_BLOCKS:
+                dropped, _ = self.requests.popitem()
+                self.loading.discard(dropped)
+            if self.loader is None:
+                self.loader = threading.Thread(target=self._load_loop, name="grid-loader", daemon=True)
+                self.loader.start()
+            self.condition.notify()
+
+    def _load_loop(self):
+        """Read queued blocks one at a time, until none is asked for in a while"""
+        while True:
+            with self.condition:
+                if not self.requests:
+                    self.condition.wait(LOADER_IDLE_SECONDS)
+                if not self.requests:
+                    self.loader = None
+                    return
+                block, _ = self.requests.popitem(last=False)
+                version = self._version(block)
+            cells = self._read_block(block)
+            try:
+                self.block_loaded.emit(block, version, cells)
+            except RuntimeError:
+                # The dialog and its model were deleted while the block was read
+                return
+
+    def _block_arrived(self, block, version, cells):
+        with self.condition:
+            self.loading.discard(block)
+            current = version == self._version(block)
+        if current:
+            self.blocks[block] = cells
+            if len(self.blocks) > MAX_BLOCKS:
+                self.blocks.popitem(last=False)
+        # The shown cells were painted empty: asked again, they show the block, or request a stale one again
+        self._block_changed(block)
+
+    def _block_changed(self, block):
+        first = block * BLOCK_DAYS
+        last = min(first + BLOCK_DAYS, self.day_count) - 1
+        if self.staff:
+            self.dataChanged.emit(self.index(0, first), self.index(len(self.staff) - 1, last))
+
+    def _read_block(self, block):
+        """Read a block of columns from the store; runs on the loader thread"""
+        first_column = block * BLOCK_DAYS
+        start = self.date_of(first_column)
+        end = self.date_of(min(first_column + BLOCK_DAYS, self.day_count) - 1)
+        offsets = {self.date_of(first_column + offset).isoformat(): offset for offset in range(BLOCK_DAYS)}
+        cells = {}
+        try:
+            for staff_id, work_date, work_in, work_off, hours_worked in \
+                    self.store.fetch_attendance_range(start.isoformat(), end.isoformat()):
+                cells[staff_id * BLOCK_DAYS + offsets[work_date]] = (work_in, work_off, hours_worked)
+        except LOAD_ERRORS as e:
+            # Kept empty until the next refresh, so painting doesn't retry on every cell
+            print(f"Error loading attendance from {start} to {end}: {str(e)}")
+        metrics.counter("grid.blocks_loaded", "Attendance grid blocks read from the database").inc()
+        return cells
+
+    def cell(self, row, column):
+        """(work_in, work_off, hours_worked), or None for no attendance or a block still loading"""
+        block, offset = divmod(column, BLOCK_DAYS)
+        cells = self.blocks.get(block)
+        if cells is None:
+            self._request(block, urgent=True)
+        else:
+            self.blocks.move_to_end(block)
+        for distance in range(1, self.read_ahead + 1):
+            for neighbour in (block - distance, block + distance):
+                if neighbour not in self.blocks and neighbour not in self.loading:
+                    self._request(neighbour, urgent=False)
+        if cells is None:
+            return None
+        return cells.get(self.staff[row][0] * BLOCK_DAYS + offset)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+
+        cell = self.cell(index.row(), index.column())
+        if cell is None:
+            return None
+        work_in, work_off, hours_worked = cell
+        hours = f"{hours_worked:.2f} h" if hours_worked is not None else ""
+        if role == Qt.DisplayRole and self.compact:
+            # Still on shift, or a day never punched off
+            return hours or "in"
+        span = f"{display_time(work_in)} - {display_time(work_off) or '...'}"
+        return f"{span}\n{hours}" if hours else span
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Vertical:
+            staff_id, first_name, last_name = self.staff[section]
+            return f"{first_name} {last_name}"
+        day = self.date_of(section)
+        return day.strftime("%a %d") if self.compact else day.strftime("%a %d %b")
+
+    def set_compact(self, compact):
+        self.compact = compact
+        self.read_ahead = READ_AHEAD_BLOCKS[compact]
+        self.headerDataChanged.emit(Qt.Horizontal, 0, self.day_count - 1)
+        self.dataChanged.emit(self.index(0, 0), self.index(len(self.staff) - 1, self.day_count - 1))
+
+    def invalidate(self, day=None):
+        """Drop the block holding day (every block when None); it is read again when next shown"""
+        if day is None:
+            self._drop_blocks()
+            if self.staff:
+                self.dataChanged.emit(self.index(0, 0), self.index(len(self.staff) - 1, self.day_count - 1))
+            return
+        block = self.column_of(day) // BLOCK_DAYS
+        with self.condition:
+            self.versions[block] = self.versions.get(block, 0) + 1
+            loaded = self.blocks.pop(block, None) is not None
+        if loaded:
+            self._block_changed(block)
+
+class AttendanceGridDialog(QDialog):
+    """Weekly or monthly view of the attendance grid"""
+    def __init__(self, today, store=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Silver Attendance - Attendance Grid")
+        self.resize(1200, 700)
+        self.today = today
+
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.mode_box = QComboBox()
+        self.mode_box.addItems([WEEK, MONTH])
+        self.mode_box.currentTextChanged.connect(self.set_mode)
+        controls.addWidget(self.mode_box)
+        for label, handler in (("<", lambda: self.step(-1)), ("Today", self.show_today), (">", lambda: self.step(1))):
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            controls.addWidget(button)
+        self.period_label = QLabel()
+        controls.addWidget(self.period_label)
+        controls.addStretch()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        controls.addWidget(refresh_button)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        controls.addWidget(close_button)
+        layout.addLayout(controls)
+
+        self.model = AttendanceGridModel(today - timedelta(days=HISTORY_DAYS - 1), today, store, self)
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.setEditTriggers(QTableView.NoEditTriggers)
+        self.view.setWordWrap(True)
+        # The scroll bar then counts columns, which show_date relies on
+        self.view.setHorizontalScrollMode(QTableView.ScrollPerItem)
+        # Fixed sizes: Qt never has to measure cells, so only the visible ones are read
+        for header in (self.view.horizontalHeader(), self.view.verticalHeader()):
+            header.setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(40)
+        self.view.horizontalScrollBar().valueChanged.connect(self.update_period_label)
+        self.view.horizontalHeader().setDefaultSectionSize(COLUMN_WIDTHS[WEEK])
+        layout.addWidget(self.view)
+
+    def mode(self):
+        return self.mode_box.currentText()
+
+    def set_mode(self, mode):
+        first_visible = self.first_visible_date()
+        self.model.set_compact(mode == MONTH)
+        self.view.horizontalHeader().setDefaultSectionSize(COLUMN_WIDTHS[mode])
+        self.show_date(first_visible or self.today)
+
+    def first_visible_date(self):
+        column = self.view.columnAt(0)
+        return self.model.date_of(column) if column >= 0 else None
+
+    def period_start(self, day):
+        """Monday of day's week, or the 1st of its month"""
+        if self.mode() == MONTH:
+            return day.replace(day=1)
+        return day - timedelta(days=day.weekday())
+
+    def show_date(self, day):
+        """Scroll so the week or month holding day starts at the left edge"""
+        column = self.model.column_of(self.period_start(day))
+        self.view.horizontalScrollBar().setValue(column)
+        self.update_period_label()
+
+    def show_today(self):
+        self.show_date(self.today)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Once the view is laid out and its scroll range known
+        QTimer.singleShot(0, self.show_today)
+
+    def step(self, direction):
+        """Previous (-1) or next (1) week or month"""
+        start = self.period_start(self.first_visible_date() or self.today)
+        if self.mode() == MONTH:
+            month = start.month - 1 + direction
+            start = start.replace(year=start.year + month // 12, month=month % 12 + 1)
+        else:
+            start += timedelta(days=7 * direction)
+        self.show_date(start)
+
+    def update_period_label(self, *args):
+        day = self.first_visible_date()
+        if day is not None:
+            self.period_label.setText(day.strftime("%B %Y") if self.mode() == MONTH
+                                      else f"Week of {day.strftime('%d %b %Y')}")
+
+    def refresh(self):
+        """Re-read staff and every shown day"""
+        first_visible = self.first_visible_date()
+        self.model.reload_staff()
+        self.show_date(first_visible or self.today)
+
+    def punched(self, day):
+        """A punch changed day's attendance"""
+        self.model.invalidate(day)
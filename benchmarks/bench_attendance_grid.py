@@ -0,0 +1,138 @@
+"""
+Scrolling the attendance grid through its whole history.
+
+Builds a synthetic database and pages an AttendanceGridModel from today back
+to the first day a week (or a month) at a time, reading the cells of
+--visible-rows rows at a few vertical positions per page, the way a view
+paints. Blocks load on the model's loader thread, so two times are reported
+per page: how long painting held the UI thread, and how long until the page
+was filled in. Between pages the read-ahead is let finish, as it would while
+someone looks at a page; a page already loaded when first painted counts as
+a read-ahead hit. Also reports the blocks read and the most blocks (and MB)
+held at once, next to what loading the whole range would hold.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_attendance_grid.py --staff 2000 --days 365
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import bench_utils
+import generate_data
+
+def page(model, first_column, columns, rows):
+    """What painting a page asks the model for: every visible cell and the headers"""
+    from PyQt5.QtCore import Qt
+
+    last_column = min(first_column + columns, model.columnCount())
+    for column in range(first_column, last_column):
+        model.headerData(column, Qt.Horizontal)
+    for row in rows:
+        model.headerData(row, Qt.Vertical)
+        for column in range(first_column, last_column):
+            model.data(model.index(row, column))
+
+def wait_until(app, done, timeout=60):
+    """Deliver the loader's signals until done() holds"""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("attendance grid blocks did not arrive")
+        app.processEvents()
+        time.sleep(0.0005)
+
+def scroll(app, model, columns, visible_rows, positions, rng):
+    """
+    Page from the last column to the first. Returns per-page paint and
+    ready milliseconds, the read-ahead hits and the most blocks held.
+    """
+    from attendance_grid import BLOCK_DAYS
+
+    paint_ms, ready_ms = [], []
+    hits = 0
+    most_blocks = 0
+    for first_column in range(model.columnCount() - columns, -columns, -columns):
+        first_column = max(first_column, 0)
+        last_column = min(first_column + columns, model.columnCount()) - 1
+        shown = range(first_column // BLOCK_DAYS, last_column // BLOCK_DAYS + 1)
+        hits += all(block in model.blocks for block in shown)
+        tops = [rng.randrange(max(model.rowCount() - visible_rows, 1)) for _ in range(positions)]
+
+        start = time.perf_counter()
+        painting = 0.0
+        for top in tops:
+            paint_start = time.perf_counter()
+            page(model, first_column, columns, range(top, min(top + visible_rows, model.rowCount())))
+            painting += time.perf_counter() - paint_start
+        wait_until(app, lambda: all(block in model.blocks for block in shown))
+        # dataChanged makes the view paint the arrived cells
+        paint_start = time.perf_counter()
+        page(model, first_column, columns, range(tops[-1], min(tops[-1] + visible_rows, model.rowCount())))
+        painting += time.perf_counter() - paint_start
+        ready_ms.append((time.perf_counter() - start) * 1000)
+        paint_ms.append(painting * 1000 / (positions + 1))
+
+        wait_until(app, lambda: not model.loading)
+        most_blocks = max(most_blocks, len(model.blocks))
+    return paint_ms, ready_ms, hits, most_blocks
+
+def spread(values):
+    return (f"p50 {bench_utils.percentile(values, 50):.1f} ms, p99 {bench_utils.percentile(values, 99):.1f} ms, "
+            f"max {max(values):.1f} ms")
+
+def run(args):
+    generate_data.generate(args.staff, args.days)
+
+    from PyQt5.QtCore import QCoreApplication
+    import metrics
+    from attendance_grid import AttendanceGridModel, MAX_BLOCKS
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    today = date.today()
+    first = today - timedelta(days=args.days)
+    rng = random.Random(3)
+    blocks_loaded = metrics.counter("grid.blocks_loaded")
+
+    for mode, columns in (("week", 7), ("month", 31)):
+        model = AttendanceGridModel(first, today)
+        model.set_compact(mode == "month")
+        loaded_before = blocks_loaded.value
+        paint_ms, ready_ms, hits, most_blocks = scroll(app, model, columns, args.visible_rows, args.positions, rng)
+        blocks_read = blocks_loaded.value - loaded_before
+        # Again under tracemalloc, which would skew the timings
+        model = AttendanceGridModel(first, today)
+        model.set_compact(mode == "month")
+        tracemalloc.start()
+        scroll(app, model, columns, args.visible_rows, 1, rng)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{mode}: {len(paint_ms)} pages; UI thread per paint {spread(paint_ms)}")
+        print(f"{mode}: filled in {spread(ready_ms)}; {hits} of {len(paint_ms)} pages already read ahead")
+        print(f"{mode}: {blocks_read} blocks read, at most {most_blocks} held (limit {MAX_BLOCKS}), "
+              f"peak {peak / 1024 / 1024:.1f} MB")
+
+    # Holding the whole range instead, for comparison
+    model = AttendanceGridModel(first, today)
+    tracemalloc.start()
+    for block in range(model.block_count):
+        model.blocks[block] = model._read_block(block)
+    cells = sum(len(block) for block in model.blocks.values())
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"whole range: {cells} cells, {size / 1024 / 1024:.1f} MB if every block were kept")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--visible-rows", type=int, default=25)
+    parser.add_argument("--positions", type=int, default=4, help="vertical scroll positions read per page")
+    args = parser.parse_args()
+
+    with bench_utils.work_dir():
+        run(args)
+
+if __name__ == "__main__":
+    main()
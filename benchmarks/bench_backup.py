@@ -0,0 +1,95 @@
+"""
+Punch latency with and without an online backup running.
+
+Builds a synthetic database padded to --size-mb, then records punches at a
+steady pace through db_functions.record_punch, first with nothing else going
+on and then while BackupManager copies the database on its own thread.
+Reports punch latency for both phases and how long the backup took.
+
+    python benchmarks/bench_backup.py --size-mb 2048 --dir /var/tmp/bench
+
+Use --dir to put the database on the disk you care about; the default is a
+temporary directory.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date
+
+import bench_utils
+import generate_data
+
+FILLER_ROW_BYTES = 4000
+
+def pad_database(db_file, size_mb):
+    """Grow db_file to about size_mb with a filler table the app never reads"""
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE IF NOT EXISTS bench_filler (id INTEGER PRIMARY KEY, payload BLOB)")
+    target = size_mb * 1024 * 1024
+    while os.path.getsize(db_file) + os.path.getsize(db_file + "-wal") < target:
+        conn.executemany("INSERT INTO bench_filler (payload) VALUES (randomblob(?))",
+                         [(FILLER_ROW_BYTES,)] * 2500)
+        conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+def punch_while(keep_going, db_functions, staff_count, pace, work_date):
+    """Record alternating punches every pace seconds while keep_going() is true. Returns latencies in ms."""
+    latencies = []
+    punch = 0
+    while keep_going():
+        staff_id = punch % staff_count + 1
+        punch_type = "in" if (punch // staff_count) % 2 == 0 else "off"
+        start = time.perf_counter()
+        db_functions.record_punch(staff_id, punch_type, time.strftime("%H:%M:%S"), work_date)
+        latencies.append((time.perf_counter() - start) * 1000)
+        punch += 1
+        time.sleep(pace)
+    return latencies
+
+def summary(latencies):
+    return (f"{len(latencies)} punches, p50 {bench_utils.percentile(latencies, 50):.2f} ms, "
+            f"p99 {bench_utils.percentile(latencies, 99):.2f} ms, max {max(latencies):.2f} ms")
+
+def run(args):
+    start = time.perf_counter()
+    generate_data.generate(args.staff, 30)
+    pad_database("attendance.db", args.size_mb)
+    size_mb = os.path.getsize("attendance.db") / 1024 / 1024
+    print(f"Database of {size_mb:.0f} MB ready in {time.perf_counter() - start:.1f} s")
+
+    import db_functions
+    from db_backup import BackupManager
+
+    work_date = date.today().strftime("%Y-%m-%d")
+    deadline = time.monotonic() + args.idle_seconds
+    idle = punch_while(lambda: time.monotonic() < deadline, db_functions, args.staff, args.pace, work_date)
+
+    manager = BackupManager(keep=1)
+    backup_start = time.perf_counter()
+    manager.start_backup()
+    during = punch_while(manager.is_running, db_functions, args.staff, args.pace, work_date)
+    backup_s = time.perf_counter() - backup_start
+
+    print(f"without backup: {summary(idle)}")
+    print(f"during backup:  {summary(during)}")
+    if manager.last_backup:
+        print(f"backup of {size_mb:.0f} MB verified in {backup_s:.1f} s")
+    else:
+        print("backup failed")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--staff", type=int, default=500)
+    parser.add_argument("--pace", type=float, default=0.02, help="seconds between punches")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--dir", help="directory for the database (default: a temporary one)")
+    args = parser.parse_args()
+
+    with bench_utils.work_dir(args.dir):
+        run(args)
+
+if __name__ == "__main__":
+    main()
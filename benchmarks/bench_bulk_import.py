@@ -0,0 +1,101 @@
+"""
+Bulk attendance import throughput against the per-row write path.
+
+Writes a CSV of --staff x --days historical days (a few percent left
+without a punch off, plus some invalid lines), imports it with
+bulk_import.import_attendance and reports rows per second. For
+comparison it times --per-row-sample days through update_work_in /
+update_work_off on a second database and extrapolates to the full file.
+
+    python benchmarks/bench_bulk_import.py --staff 2740 --days 365   # about 1M rows
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import bench_utils
+import generate_data
+
+def write_csv(path, staff_count, days, seed=7):
+    """One row per staff member and day before today. Returns the number of rows."""
+    rng = random.Random(seed)
+    end = date.today() - timedelta(days=1)
+    rows = 0
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["staff_id", "work_date", "work_in", "work_off", "hours"])
+        for offset in range(days, 0, -1):
+            work_date = (end - timedelta(days=offset - 1)).isoformat()
+            for staff_id in range(1, staff_count + 1):
+                start = 7 * 3600 + rng.randrange(3 * 3600)
+                roll = rng.random()
+                if roll < 0.0005:
+                    writer.writerow([staff_id, work_date, "25:00", "", ""])  # invalid
+                elif roll < 0.03:
+                    writer.writerow([staff_id, work_date, generate_data._clock(start), "", ""])
+                else:
+                    finish = (start + 8 * 3600 + rng.randrange(2 * 3600)) % 86400
+                    writer.writerow([staff_id, work_date, generate_data._clock(start)[:5],
+                                     generate_data._clock(finish), ""])
+                rows += 1
+    return rows
+
+def per_row(path, sample):
+    """Milliseconds per day through the app's punch functions, for the first sample days of the CSV"""
+    import db_functions
+
+    with open(path, newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        days = [row for _, row in zip(range(sample * 2), reader) if row[2] != "25:00"][:sample]
+    start = time.perf_counter()
+    for staff_id, work_date, work_in, work_off, _ in days:
+        db_functions.update_work_in(int(staff_id), work_in, work_date)
+        if work_off:
+            db_functions.update_work_off(int(staff_id), work_off, work_date)
+    return (time.perf_counter() - start) * 1000 / len(days)
+
+def run(work_dir, args):
+    from bulk_import import import_attendance
+
+    csv_path = os.path.join(work_dir, "history.csv")
+    start = time.perf_counter()
+    rows = write_csv(csv_path, args.staff, args.days)
+    print(f"{rows} rows, {os.path.getsize(csv_path) / 1024 / 1024:.0f} MB of CSV written in "
+          f"{time.perf_counter() - start:.1f} s")
+
+    for name in ("bulk", "per_row"):
+        os.makedirs(os.path.join(work_dir, name))
+    os.chdir(os.path.join(work_dir, "bulk"))
+    generate_data.generate(args.staff, 0)
+    result = import_attendance(csv_path)
+    print(result.summary())
+
+    conn = sqlite3.connect("attendance.db")
+    events, days = conn.execute("SELECT (SELECT COUNT(*) FROM punch_events), (SELECT COUNT(*) FROM staff_attendance)").fetchone()
+    conn.close()
+    print(f"punch_events {events}, staff_attendance {days}")
+
+    os.chdir(os.path.join(work_dir, "per_row"))
+    generate_data.generate(args.staff, 0)
+    ms_per_day = per_row(csv_path, args.per_row_sample)
+    print(f"per-row path: {ms_per_day:.2f} ms per day, about {ms_per_day * rows / 1000:.0f} s for the file "
+          f"({1000 / ms_per_day:,.0f} rows/s), bulk is {ms_per_day * result.rows_per_second / 1000:.0f}x faster")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2740)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-row-sample", type=int, default=2000)
+    parser.add_argument("--dir", help="directory for the databases (default: a temporary one)")
+    args = parser.parse_args()
+
+    with bench_utils.work_dir(args.dir) as work_dir:
+        run(work_dir, args)
+
+if __name__ == "__main__":
+    main()
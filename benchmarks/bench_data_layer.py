@@ -0,0 +1,165 @@
+"""
+Data layer micro-benchmarks.
+
+Builds a synthetic database in a temporary directory and times the roster
+query, single punches, the three db_sync reconcile paths fed from fixture
+payloads, and the format_time/compare_times helpers. Results are written as
+JSON to benchmarks/results/<label>.json so versions can be compared.
+
+    python benchmarks/bench_data_layer.py --label before
+    python benchmarks/bench_data_layer.py --label after --compare benchmarks/results/before.json
+
+With --compare, exits with status 1 if any mean is slower than the other run
+by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import bench_utils
+import generate_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def measure(func, repeat, calls=1):
+    """Time repeat runs of func; with calls > 1 each sample is the per-call mean of a batch"""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(i)
+        samples.append((time.perf_counter() - start) * 1000 / calls)
+    return samples
+
+def summarize(samples, unit="ms"):
+    scale = 1000 if unit == "us" else 1
+    values = [sample * scale for sample in samples]
+    return {
+        "unit": unit,
+        "n": len(values),
+        "mean": round(statistics.mean(values), 4),
+        "p50": round(bench_utils.percentile(values, 50), 4),
+        "p95": round(bench_utils.percentile(values, 95), 4),
+        "min": round(min(values), 4),
+    }
+
+def run_benchmarks(staff_count, days, repeat):
+    # Imported after the chdir so DB_FILE resolves inside the temporary directory
+    import db_functions
+    import db_sync
+    from utilities import format_time, compare_times
+
+    results = {}
+    today = date.today().strftime("%Y-%m-%d")
+    past_day = (date.today() - timedelta(days=max(1, days // 2))).strftime("%Y-%m-%d")
+
+    results["fetch_all_staff.today"] = summarize(measure(lambda i: db_functions.fetch_all_staff(today), repeat))
+    results["fetch_all_staff.past_day"] = summarize(measure(lambda i: db_functions.fetch_all_staff(past_day), repeat))
+
+    # One punch per call, on distinct staff so every call takes the same path
+    staff_ids = list(range(1, min(staff_count, repeat) + 1))
+    results["update_work_in"] = summarize(measure(
+        lambda i: db_functions.update_work_in(staff_ids[i % len(staff_ids)], "08:00:00", today), repeat))
+    results["update_work_off"] = summarize(measure(
+        lambda i: db_functions.update_work_off(staff_ids[i % len(staff_ids)], "16:00:00", today), repeat))
+
+    # Reconcile paths: an unchanged payload, then alternating between the original and an
+    # edited copy (5% changed, 5% deleted) so every sample has real work to do
+    payloads = {
+        "apply_staff_data": (db_sync.apply_staff_data,
+                             generate_data.staff_records(staff_count),
+                             "last_name", "Renamed"),
+        "apply_schedule_data": (db_sync.apply_schedule_data,
+                                generate_data.schedule_records(staff_count),
+                                "start_time", "10:00:00"),
+        "apply_temp_schedule_data": (db_sync.apply_temp_schedule_data,
+                                     generate_data.temp_schedule_records(staff_count),
+                                     "scheduled_in", "10:00:00"),
+    }
+    for name, (apply, original, field, value) in payloads.items():
+        edited = generate_data.mutate_records(original, field, value, 0.05)
+        apply(original)
+        results[f"{name}.unchanged"] = summarize(measure(lambda i: apply(original), repeat))
+        results[f"{name}.changed"] = summarize(measure(lambda i: apply(edited if i % 2 == 0 else original), repeat))
+
+    times = ["%02d:%02d:00" % (hour, minute) for hour in range(24) for minute in (0, 15, 30, 45)]
+    formatted = [format_time(value) for value in times]
+    results["format_time"] = summarize(measure(lambda i: format_time(times[i % len(times)]), repeat, 1000), "us")
+    results["compare_times"] = summarize(measure(
+        lambda i: compare_times(formatted[i % len(formatted)], formatted[-1 - i % len(formatted)]), repeat, 1000), "us")
+
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=bench_utils.REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results, other_file, tolerance):
+    """Print the change in mean against another run. Returns the names of regressed benchmarks."""
+    with open(other_file) as other:
+        other_results = json.load(other)["results"]
+    regressions = []
+    print(f"\n{'benchmark':34} {'before':>10} {'after':>10} {'change':>8}")
+    for name, stats in results.items():
+        before = other_results.get(name)
+        if before is None:
+            print(f"{name:34} {'-':>10} {stats['mean']:>10.3f}")
+            continue
+        change = stats["mean"] / before["mean"] - 1 if before["mean"] else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:34} {before['mean']:>10.3f} {stats['mean']:>10.3f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--label", help="results file name, defaults to the git revision")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    label = args.label or revision
+
+    with bench_utils.work_dir():
+        start = time.perf_counter()
+        generate_data.generate(args.staff, args.days)
+        print(f"Generated {args.staff} staff x {args.days} days in {time.perf_counter() - start:.1f} s")
+        results = run_benchmarks(args.staff, args.days, args.repeat)
+
+    for name, stats in results.items():
+        print(f"{name:34} mean {stats['mean']:9.3f} {stats['unit']}  p95 {stats['p95']:9.3f} {stats['unit']}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_file = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(output_file, "w") as output:
+        json.dump({
+            "label": label,
+            "revision": revision,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "params": {"staff": args.staff, "days": args.days, "repeat": args.repeat},
+            "results": results,
+        }, output, indent=2)
+    print(f"Results written to {output_file}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
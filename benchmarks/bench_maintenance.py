@@ -0,0 +1,75 @@
+"""
+Punch latency while db_maintenance runs every task.
+
+Builds a synthetic database, removes --removed-staff staff the way sync
+does (staff_tbl only, leaving their schedules and attendance behind), then
+records punches at a steady pace while MaintenanceManager deletes the
+orphans, vacuums and analyzes on its own thread. Reports punch latency
+with and without maintenance, and the file size before and after.
+
+    python benchmarks/bench_maintenance.py --staff 2000 --days 365 --dir /var/tmp/bench
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date
+
+import bench_utils
+import generate_data
+from bench_backup import punch_while, summary
+
+def file_mb(db_file):
+    wal = db_file + "-wal"
+    return (os.path.getsize(db_file) + (os.path.getsize(wal) if os.path.exists(wal) else 0)) / 1024 / 1024
+
+def run(args):
+    generate_data.generate(args.staff, args.days)
+
+    import db_functions
+    from db_maintenance import MaintenanceManager, MaintenancePolicy, enable_incremental_vacuum
+
+    # Databases from before incremental vacuum; a no-op on new ones
+    enable_incremental_vacuum()
+    conn = sqlite3.connect("attendance.db")
+    conn.execute("DELETE FROM staff_tbl WHERE staff_id > ?", (args.staff - args.removed_staff,))
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    size_before = file_mb("attendance.db")
+
+    remaining = args.staff - args.removed_staff
+    work_date = date.today().strftime("%Y-%m-%d")
+    deadline = time.monotonic() + args.idle_seconds
+    idle = punch_while(lambda: time.monotonic() < deadline, db_functions, remaining, args.pace, work_date)
+
+    # orphan_attendance_days=0 so every orphaned attendance row goes
+    manager = MaintenanceManager(policy=MaintenancePolicy(idle_seconds=0, orphan_attendance_days=0))
+    manager.last_activity -= 1
+    start = time.perf_counter()
+    manager.start_if_due()
+    during = punch_while(manager.is_running, db_functions, remaining, args.pace, work_date)
+    maintenance_s = time.perf_counter() - start
+
+    conn = sqlite3.connect("attendance.db")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    print(f"without maintenance: {summary(idle)}")
+    print(f"during maintenance:  {summary(during)}")
+    print(f"maintenance took {maintenance_s:.1f} s, file {size_before:.1f} MB -> {file_mb('attendance.db'):.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--removed-staff", type=int, default=500)
+    parser.add_argument("--pace", type=float, default=0.01, help="seconds between punches")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--dir", help="directory for the database (default: a temporary one)")
+    args = parser.parse_args()
+
+    with bench_utils.work_dir(args.dir):
+        run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Late/early status per cell, and the rolling punctuality statistics.
+
+Builds a synthetic database and:
+
+  1. times the late/early check of a roster's Work In and Work Off cells
+     the old way (compare_times on the formatted AM/PM strings, every
+     rebuild) against the minutes_late and minutes_early of RosterRow
+  2. times loading 30 days of punctuality, recording yesterday's punches
+     into it one at a time and sliding it over midnight, then checks the
+     incrementally kept figures against a fresh load
+
+    python benchmarks/bench_punctuality.py --staff 5000 --days 60
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import bench_utils
+import generate_data
+
+def per_cell(rows, repeat):
+    from utilities import compare_times
+
+    def legacy():
+        # What create_work_time_item did for every punched cell
+        for row in rows:
+            if row.work_in and row.sched_in and not row.open_schedule:
+                compare_times(row.work_in_display, row.sched_in_display) > 0
+            if row.work_off and row.sched_out and not row.open_schedule:
+                compare_times(row.work_off_display, row.sched_out_display) < 0
+
+    def current():
+        for row in rows:
+            row.minutes_late is not None and row.minutes_late > 0
+            row.minutes_early is not None and row.minutes_early > 0
+
+    results = {}
+    for name, check in (("compare_times", legacy), ("minutes on the row", current)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            check()
+        results[name] = (time.perf_counter() - start) * 1000 / repeat
+    return results
+
+def colour_mismatches(rows):
+    """Cells whose red/green status differs between the old check and the row's minutes"""
+    from utilities import compare_times
+
+    mismatches = 0
+    for row in rows:
+        if row.work_in:
+            old = (compare_times(row.work_in_display, row.sched_in_display) > 0
+                   if row.sched_in and not row.open_schedule else None)
+            new = row.minutes_late > 0 if row.minutes_late is not None else None
+            mismatches += old != new
+        if row.work_off:
+            old = (compare_times(row.work_off_display, row.sched_out_display) < 0
+                   if row.sched_out and not row.open_schedule else None)
+            new = row.minutes_early > 0 if row.minutes_early is not None else None
+            mismatches += old != new
+    return mismatches
+
+def run(args):
+    generate_data.generate(args.staff, args.days)
+    import db_functions
+    from punctuality import PunctualityStats
+
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    # Yesterday's roster is fully punched
+    rows = db_functions.fetch_all_staff(yesterday.isoformat())
+    for row in rows:
+        row.work_in_display, row.sched_in_display, row.work_off_display, row.sched_out_display
+    for name, ms in per_cell(rows, args.repeat).items():
+        print(f"late/early check of {len(rows)} rows, {name}: {ms:.2f} ms per rebuild")
+    mismatches = colour_mismatches([row for row in rows if not row.day_off])
+    print(f"cells coloured differently from before: {mismatches}")
+
+    # The window as it stood yesterday morning, then yesterday's punches as they arrived, then midnight
+    stats = PunctualityStats()
+    start = time.perf_counter()
+    stats.advance(yesterday, background=False)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"load {stats.window_days} days: {load_ms:.1f} ms, {sum(len(day) for day in stats.days.values())} arrivals")
+
+    punched = [row for row in rows if row.work_in]
+    random.Random(9).shuffle(punched)
+    start = time.perf_counter()
+    for row in punched:
+        stats.record(row.staff_id, row.minutes_late)
+        stats.describe(row.staff_id)
+    record_us = (time.perf_counter() - start) * 1e6 / max(len(punched), 1)
+    print(f"record + describe per punch: {record_us:.1f} us over {len(punched)} punches")
+
+    start = time.perf_counter()
+    stats.advance(today)
+    print(f"slide over midnight: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    fresh = PunctualityStats()
+    fresh.advance(today, background=False)
+    for row in db_functions.fetch_all_staff(today.isoformat()):
+        stats.record(row.staff_id, row.minutes_late)
+        fresh.record(row.staff_id, row.minutes_late)
+    staff_ids = {row.staff_id for row in rows}
+    mismatched = [staff_id for staff_id in staff_ids if stats.summary(staff_id) != fresh.summary(staff_id)]
+    print(f"incremental vs fresh load: {len(mismatched)} of {len(staff_ids)} staff differ")
+    return 1 if mismatched or mismatches else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with bench_utils.work_dir():
+        return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
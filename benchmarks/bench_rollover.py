@@ -0,0 +1,92 @@
+"""
+Midnight rollover of the attendance table: rebuild from scratch vs the prefetched roster.
+
+Shows a table of N synthetic staff, then rolls it over to another N-row day
+twice: once through _rebuild_table alone (what happens when the prefetch
+missed, less the query), and once through refresh() with tomorrow's roster
+prefetched by build_next_day, so its search index and punctuality arrivals
+are ready. Reports the time the UI thread is blocked at midnight, the
+following paint, and whether the prefetched table matches the rebuilt one
+cell for cell.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_rollover.py --staff 10000
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bench_utils  # noqa: F401  (puts the application modules on sys.path)
+from bench_utils import synthetic_roster
+
+class RosterStore:
+    """Store whose roster is whatever the benchmark set last"""
+    def __init__(self):
+        self.rows = []
+
+    def fetch_all_staff(self, target_date=None):
+        return self.rows
+
+    def fetch_arrivals(self, start_date, end_date):
+        return []
+
+def cells(manager):
+    """Everything the rollover is expected to reproduce: the shown rows, their cells and spans on screen"""
+    model = manager.model
+    return (list(model.shown), [model.cells(row) for row in range(model.rowCount())],
+            sorted(manager.spanned_rows))
+
+def run(args):
+    from PyQt5.QtWidgets import QApplication, QTableView
+    from table_manager import TableManager
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    view = QTableView()
+    view.resize(1200, 800)
+    view.show()
+
+    before_midnight = datetime.now().replace(hour=23, minute=55, second=0, microsecond=0)
+    store = RosterStore()
+    manager = TableManager(view, before_midnight, None, store)
+    manager.set_callbacks(print, print, print)
+    store.rows = synthetic_roster(args.staff)
+    manager.refresh(force=True)
+    manager.apply_search(args.search)
+    app.processEvents()
+
+    # Rebuild: the UI thread indexes and shows every row at midnight
+    store.rows = synthetic_roster(args.staff)
+    manager.staff_data = store.rows
+    start = time.perf_counter()
+    manager._rebuild_table()
+    rebuilt = time.perf_counter()
+    app.processEvents()
+    rebuild_ms, rebuild_paint_ms = (rebuilt - start) * 1000, (time.perf_counter() - rebuilt) * 1000
+    expected = cells(manager)
+
+    # Prefetched: built off the UI thread before midnight, shown at midnight
+    prepared = manager.build_next_day(before_midnight.date() + timedelta(days=1))
+    manager.set_next_day(prepared)
+    manager.update_current_datetime(before_midnight + timedelta(minutes=6))
+    start = time.perf_counter()
+    manager.refresh()
+    swapped = time.perf_counter()
+    app.processEvents()
+    swap_ms, swap_paint_ms = (swapped - start) * 1000, (time.perf_counter() - swapped) * 1000
+    matches = cells(manager) == expected
+
+    print(f"{args.staff} staff, search {args.search!r}")
+    print(f"rebuild at midnight:    {rebuild_ms:7.1f} ms + paint {rebuild_paint_ms:.1f} ms")
+    print(f"prefetched at midnight: {swap_ms:7.1f} ms + paint {swap_paint_ms:.1f} ms")
+    print(f"prefetched table matches the rebuilt one: {matches}")
+    return 0 if matches else 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--search", default="", help="Search text active over the rollover")
+    args = parser.parse_args()
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
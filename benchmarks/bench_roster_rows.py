@@ -0,0 +1,136 @@
+"""
+Roster row memory and render cost: plain 10-tuples vs RosterRow.
+
+Fetches the roster of a synthetic database (10k staff by default) both ways
+and reports the memory held per row, the cost of the display values a table
+rebuild needs (name, four formatted times, hours), and, when PyQt5 is
+installed, a full offscreen TableManager rebuild.
+
+    python benchmarks/bench_roster_rows.py --staff 10000
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import bench_utils
+import generate_data
+
+def held_bytes(build):
+    """Bytes still allocated by build()'s result while it is alive"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+def legacy_display_values(rows, format_time):
+    """What _rebuild_table derived from each tuple before RosterRow"""
+    for (staff_id, first_name, last_name, sched_in, sched_out,
+         work_in, work_off, hours_worked, *_) in rows:
+        f"{first_name} {last_name[0]}."
+        format_time(sched_in)
+        format_time(sched_out)
+        format_time(work_in)
+        format_time(work_off)
+        f"{hours_worked:.2f}" if hours_worked is not None else ""
+
+def row_display_values(rows):
+    for row in rows:
+        row.display_name
+        row.sched_in_display
+        row.sched_out_display
+        row.work_in_display
+        row.work_off_display
+        row.hours_display
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), statistics.median(timings)
+
+def qt_rebuild(rows, repeat):
+    """Offscreen TableManager rebuild in ms, or None without PyQt5"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication, QTableView
+    except ImportError:
+        return None
+    from table_manager import TableManager
+
+    app = QApplication.instance() or QApplication([])
+    view = QTableView()
+    view.resize(1200, 800)
+    view.show()
+    manager = TableManager(view, datetime.now(), None)
+
+    def rebuild():
+        manager.staff_data = rows
+        manager._rebuild_table()
+        app.processEvents()
+    return best_of(rebuild, repeat)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with bench_utils.work_dir():
+        generate_data.generate(args.staff, 1)
+        import db_functions
+        from db_manager import DB_FILE
+        from roster_row import _formatted_times
+        from utilities import format_time
+
+        # Yesterday has punches for most staff
+        yesterday = date.today() - timedelta(days=1)
+        day = yesterday.strftime("%Y-%m-%d")
+
+        def fetch_tuples():
+            conn = sqlite3.connect(DB_FILE)
+            rows = conn.execute(db_functions.ROSTER_QUERY.format(where=""), (yesterday.weekday(), day)).fetchall()
+            conn.close()
+            return rows
+
+        tuples, tuple_bytes = held_bytes(fetch_tuples)
+        rows, row_bytes = held_bytes(lambda: db_functions.fetch_all_staff(day))
+        assert [tuple(row) for row in rows] == tuples
+
+        tuple_fetch = best_of(fetch_tuples, args.repeat)
+        row_fetch = best_of(lambda: db_functions.fetch_all_staff(day), args.repeat)
+
+        legacy = best_of(lambda: legacy_display_values(tuples, format_time), args.repeat)
+        _formatted_times.clear()
+        fresh_rows = db_functions.fetch_all_staff(day)
+        start = time.perf_counter()
+        row_display_values(fresh_rows)
+        cold_ms = (time.perf_counter() - start) * 1000
+        # A refresh fetches new rows, but the formatted times are already known
+        refetched = db_functions.fetch_all_staff(day)
+        warm = best_of(lambda: row_display_values(refetched), args.repeat)
+        gc.collect()
+
+        render = qt_rebuild(rows, args.repeat)
+
+    count = len(tuples)
+    print(f"{count} roster rows")
+    print(f"memory per row: tuples {tuple_bytes / count:.0f} B, RosterRow {row_bytes / count:.0f} B")
+    print(f"fetch: tuples {tuple_fetch[1]:.1f} ms, RosterRow {row_fetch[1]:.1f} ms (median)")
+    print(f"display values per rebuild: legacy {legacy[1]:.1f} ms, RosterRow first day {cold_ms:.1f} ms, "
+          f"times already formatted {warm[1]:.1f} ms")
+    if render is None:
+        print("full TableManager rebuild: skipped, PyQt5 is not installed")
+    else:
+        print(f"full TableManager rebuild: {render[1]:.0f} ms (median)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Per-keystroke latency of the staff search index, and of the whole keystroke.
+
+Indexes N synthetic staff names, then types a set of queries one character at
+a time and reports the mean and p99 search time per keystroke, plus the cost of
+an incremental rename. When PyQt5 is installed, types the same keystrokes into
+TableManager.apply_search over an offscreen 1200x800 roster view, clearing the
+box after each query, and reports the model update and the repaint after it.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_staff_search.py --staff 10000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+import bench_utils  # noqa: F401  (puts the application modules on sys.path)
+from bench_utils import percentile, synthetic_roster
+from staff_search import StaffSearchIndex
+
+FIRST_NAMES = ["Ali", "Hassan", "Hussein", "Mohammad", "Fatima", "Zeinab", "Maryam", "Rami",
+               "Nour", "Layla", "Karim", "Samir", "Rania", "Jad", "Maya", "Omar", "Sara", "Tarek"]
+LAST_NAMES = ["Haddad", "Khoury", "Nasser", "Saad", "Hamdan", "Fakih", "Zein", "Alawiyeh",
+              "Mansour", "Sleiman", "Jaber", "Issa", "Hijazi", "Salameh", "Daher", "Awada"]
+
+def synthetic_names(count, seed=1):
+    rng = random.Random(seed)
+    return [(staff_id, rng.choice(FIRST_NAMES) + str(rng.randint(1, 99)), rng.choice(LAST_NAMES))
+            for staff_id in range(1, count + 1)]
+
+class RosterStore:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch_all_staff(self, target_date=None):
+        return self.rows
+
+    def fetch_arrivals(self, start_date, end_date):
+        return []
+
+def view_keystrokes(names, queries):
+    """
+    (ms per keystroke in apply_search, ms of the repaint after it, ms of a repaint
+    with nothing changed) through TableManager and its view, or None without PyQt5
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication, QTableView
+    except ImportError:
+        return None
+    from table_manager import TableManager
+
+    # The synthetic roster's mix of cell states, under the names typed for, in roster order
+    rows = [row._replace(first_name=first_name, last_name=last_name)
+            for row, (_, first_name, last_name) in zip(synthetic_roster(len(names)), names)]
+    rows.sort(key=lambda row: (row.first_name, row.staff_id))
+
+    app = QApplication.instance() or QApplication([])
+    view = QTableView()
+    view.resize(1200, 800)
+    view.show()
+    manager = TableManager(view, datetime.now(), None, RosterStore(rows))
+    manager.set_callbacks(print, print, print)
+    manager.refresh(force=True)
+    app.processEvents()
+
+    updates, repaints, idle_repaints = [], [], []
+    for query in queries:
+        for text in [query[:length] for length in range(1, len(query) + 1)] + [""]:
+            start = time.perf_counter()
+            manager.apply_search(text)
+            updated = time.perf_counter()
+            app.processEvents()
+            updates.append((updated - start) * 1000)
+            repaints.append((time.perf_counter() - updated) * 1000)
+
+            view.viewport().update()
+            start = time.perf_counter()
+            app.processEvents()
+            idle_repaints.append((time.perf_counter() - start) * 1000)
+    return updates, repaints, idle_repaints
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=10000)
+    args = parser.parse_args()
+
+    rows = synthetic_names(args.staff)
+    index = StaffSearchIndex()
+    start = time.perf_counter()
+    index.rebuild(rows)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    queries = ["hassan", "khoury", "fatima hamdan", "ali7", "adda", "z", "mo sa"]
+    timings = []
+    for query in queries:
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:length])
+            timings.append((time.perf_counter() - start) * 1e6)
+
+    renames = []
+    for staff_id in range(1, 101):
+        start = time.perf_counter()
+        index.add(staff_id, "Renamed", "Person")
+        renames.append((time.perf_counter() - start) * 1e6)
+
+    print(f"staff:             {args.staff}")
+    print(f"index build:       {build_ms:.1f} ms")
+    print(f"keystroke mean:    {sum(timings) / len(timings):.0f} us")
+    print(f"keystroke p99:     {percentile(timings, 99):.0f} us")
+    print(f"incremental add:   {sum(renames) / len(renames):.0f} us mean")
+
+    keystrokes = view_keystrokes(rows, queries)
+    if keystrokes is None:
+        print("view keystrokes:   skipped, PyQt5 is not installed")
+        return
+    updates, repaints, idle_repaints = keystrokes
+    wholes = [update + repaint for update, repaint in zip(updates, repaints)]
+    print(f"view keystrokes:   {len(updates)}, each query typed then cleared")
+    print(f"apply_search:      {sum(updates) / len(updates):.2f} ms mean, {percentile(updates, 99):.2f} ms p99")
+    print(f"repaint after it:  {sum(repaints) / len(repaints):.2f} ms mean, {percentile(repaints, 99):.2f} ms p99")
+    print(f"whole keystroke:   {sum(wholes) / len(wholes):.2f} ms mean, {percentile(wholes, 99):.2f} ms p99")
+    print(f"unchanged repaint: {sum(idle_repaints) / len(idle_repaints):.2f} ms mean")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Startup import-time regression benchmark.
+
+Imports the UI entry module in fresh interpreters and reports the median wall
+time, the slowest modules according to -X importtime, and whether any of the
+deferred network modules leaked back onto the startup path.
+
+    python benchmarks/bench_startup.py                  # compare with the saved baseline
+    python benchmarks/bench_startup.py --save-baseline  # record a new baseline
+
+Exits with status 1 on a regression beyond --tolerance, a leaked module or a
+missing baseline.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import bench_utils
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+ENTRY_MODULE = "ui_components"
+# Modules that must only load on first use, never at startup
+DEFERRED_MODULES = ("requests", "ntplib", "db_sync")
+
+def run_python(code, *flags):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, "-c", code], cwd=bench_utils.REPO_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    return result, (time.perf_counter() - start) * 1000
+
+def slowest_imports(stderr, top):
+    """Parse -X importtime output into (cumulative_us, module) pairs"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, fields = line.split(":", 1)
+        self_us, cumulative_us, module = fields.split("|")
+        entries.append((int(cumulative_us), module.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # Warm the filesystem and bytecode caches once
+    run_python(f"import {ENTRY_MODULE}")
+    timings = [run_python(f"import {ENTRY_MODULE}")[1] for _ in range(args.runs)]
+    median_ms = statistics.median(timings)
+
+    leak_check = (f"import sys, {ENTRY_MODULE}; "
+                  f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    leaked = [m for m in run_python(leak_check)[0].stdout.strip().split(",") if m]
+
+    importtime, _ = run_python(f"import {ENTRY_MODULE}", "-X", "importtime")
+
+    print(f"import {ENTRY_MODULE}: median {median_ms:.1f} ms over {args.runs} runs")
+    print("slowest imports (cumulative us):")
+    for cumulative_us, module in slowest_imports(importtime.stderr, 10):
+        print(f"  {cumulative_us:>10}  {module}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as baseline_file:
+            json.dump({"entry_module": ENTRY_MODULE, "median_ms": round(median_ms, 1)}, baseline_file, indent=2)
+        print(f"Baseline saved to {BASELINE_FILE}")
+        return 0
+
+    failed = False
+    if leaked:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(leaked)}")
+        failed = True
+
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as baseline_file:
+            baseline_ms = json.load(baseline_file)["median_ms"]
+        limit_ms = baseline_ms * (1 + args.tolerance)
+        print(f"baseline {baseline_ms:.1f} ms, limit {limit_ms:.1f} ms")
+        if median_ms > limit_ms:
+            print("FAIL: startup import time regressed")
+            failed = True
+    else:
+        # Passing without a baseline would let a regression through unnoticed
+        print(f"FAIL: no baseline at {BASELINE_FILE}; run with --save-baseline to record one")
+        failed = True
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Measure live widgets, Qt objects and memory of the attendance table.
+
+Builds the roster table for N synthetic staff twice, each in a fresh process:
+"legacy" recreates the old QTableWidget with per-row QPushButton + container
+widgets, "delegate" uses the current TableManager: a roster model whose
+buttons are painted by a delegate.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_table_widgets.py --staff 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import bench_utils
+from bench_utils import rss_kb, timed, synthetic_roster
+
+def build_legacy(table, rows):
+    """Old rendering: one stylesheet QPushButton and container widget per button cell"""
+    from PyQt5.QtWidgets import QPushButton, QTableWidgetItem
+    from ui_builders import create_centered_widget
+
+    table.setRowCount(0)
+    for row, data in enumerate(rows):
+        table.insertRow(row)
+        table.setRowHeight(row, 60)
+        table.setItem(row, 0, QTableWidgetItem(data[1]))
+        for column, visible in ((2, not data[5]), (4, data[5] and not data[6])):
+            if visible and not data[8]:
+                button = QPushButton("Work In" if column == 2 else "Work Off")
+                button.setStyleSheet("background-color: #2196F3; color: white; font-weight: bold;")
+                button.setFixedSize(120, 48)
+                table.setCellWidget(row, column, create_centered_widget(button))
+
+def build_delegate(table, rows):
+    """Current rendering through TableManager"""
+    from datetime import datetime
+    from table_manager import TableManager
+
+    manager = TableManager(table, datetime.now(), None)
+    manager.staff_data = rows
+    manager._rebuild_table()
+    return manager
+
+def measure(mode, staff):
+    from PyQt5.QtCore import QObject
+    from PyQt5.QtWidgets import QApplication, QTableView, QTableWidget
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    if mode == "legacy":
+        table = QTableWidget()
+        table.setColumnCount(6)
+    else:
+        table = QTableView()
+    table.resize(1200, 800)
+    table.show()
+    app.processEvents()
+
+    rows = synthetic_roster(staff)
+    # Both builders' modules are loaded before the baseline, so only the table is counted
+    import table_manager, ui_builders
+    rss_before = rss_kb()
+    builder = build_legacy if mode == "legacy" else build_delegate
+    keep, build_ms = timed(builder, table, rows)
+    app.processEvents()
+
+    return {
+        "mode": mode,
+        "staff": staff,
+        "build_ms": round(build_ms, 1),
+        "widgets": len(app.allWidgets()),
+        "qobjects": len(table.findChildren(QObject)),
+        "rss_delta_kb": rss_kb() - rss_before,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=2000)
+    parser.add_argument("--mode", choices=["legacy", "delegate"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.staff)))
+        return
+
+    # Run each mode in its own process so memory numbers don't mix
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    results = []
+    for mode in ("legacy", "delegate"):
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--staff", str(args.staff), "--mode", mode],
+            env=env, cwd=bench_utils.REPO_DIR)
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    print(f"{'mode':<10}{'build ms':>10}{'widgets':>10}{'qobjects':>10}{'rss kB':>10}")
+    for result in results:
+        print(f"{result['mode']:<10}{result['build_ms']:>10}{result['widgets']:>10}"
+              f"{result['qobjects']:>10}{result['rss_delta_kb']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_utils.py shared helpers for the benchmark scripts
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Benchmarks live one level below the application modules
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+def rss_kb():
+    """Resident set size of this process in KiB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Not Linux: fall back to the peak RSS
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def open_fd_count():
+    """Number of open file descriptors, or None where /proc is unavailable"""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+@contextmanager
+def work_dir(path=None):
+    """
+    Run inside path (created if missing), or a temporary directory removed
+    afterwards. The application opens attendance.db relative to the current
+    directory, so this is where the benchmark's database lands. Yields the
+    absolute path and always returns to the original directory.
+    """
+    original_dir = os.getcwd()
+    temporary = None
+    if path:
+        os.makedirs(path, exist_ok=True)
+        path = os.path.abspath(path)
+    else:
+        temporary = tempfile.TemporaryDirectory()
+        path = temporary.name
+    try:
+        os.chdir(path)
+        yield path
+    finally:
+        # Leave before removing it; Windows won't delete the current directory
+        os.chdir(original_dir)
+        if temporary is not None:
+            temporary.cleanup()
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def synthetic_roster(count):
+    """Roster rows shaped like fetch_all_staff() output, mixing every cell state"""
+    from roster_row import RosterRow
+    rows = []
+    for staff_id in range(1, count + 1):
+        state = staff_id % 4
+        work_in = "08:0%d:00" % (staff_id % 10) if state in (1, 2) else None
+        work_off = "16:30:00" if state == 2 else None
+        hours = 8.4 if state == 2 else None
+        rows.append(RosterRow(staff_id, f"First{staff_id:05d}", f"Last{staff_id:05d}",
+                              "08:00:00", "16:00:00", work_in, work_off, hours,
+                              1 if state == 3 else 0, 0))
+    return rows
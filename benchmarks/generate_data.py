@@ -0,0 +1,146 @@
+# generate_data.py fill an attendance database with synthetic staff, schedules and attendance
+#
+#   python benchmarks/generate_data.py --dir /tmp/bench --staff 2000 --days 60
+#
+# The same generators build API-shaped payloads for the db_sync reconcile benchmarks.
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from bench_utils import REPO_DIR  # noqa: F401  (puts the application modules on sys.path)
+import db_manager
+import effective_schedule
+
+FIRST_NAMES = ["Ali", "Sara", "Omar", "Lina", "Hadi", "Maya", "Karim", "Nour", "Rami", "Dana",
+               "Jad", "Rana", "Fadi", "Hiba", "Ziad", "Layal", "Samir", "Yara", "Tarek", "Reem"]
+LAST_NAMES = ["Haddad", "Khoury", "Saleh", "Nasser", "Aoun", "Farah", "Hamdan", "Karam",
+              "Rizk", "Sabbagh", "Chami", "Daher", "Ghanem", "Issa", "Mansour", "Zein"]
+SHIFTS = [("08:00:00", "16:00:00"), ("09:00:00", "17:00:00"), ("12:00:00", "20:00:00"),
+          ("14:00:00", "22:00:00"), ("07:30:00", "15:30:00")]
+
+def staff_records(count, seed=1):
+    """Staff rows as the sync_staff API returns them"""
+    rng = random.Random(seed)
+    return [{"staff_id": str(staff_id),
+             "first_name": f"{rng.choice(FIRST_NAMES)}{staff_id}",
+             "last_name": rng.choice(LAST_NAMES)}
+            for staff_id in range(1, count + 1)]
+
+def schedule_records(count, seed=2):
+    """Seven weekly schedule rows per staff member, as the sync_schedules API returns them"""
+    rng = random.Random(seed)
+    records = []
+    for staff_id in range(1, count + 1):
+        start, end = rng.choice(SHIFTS)
+        days_off = set(rng.sample(range(7), 2))
+        open_schedule = rng.random() < 0.05
+        for day in range(7):
+            records.append({"staff_id": str(staff_id), "work_day": str(day),
+                            "start_time": start, "end_time": end,
+                            "day_off": "1" if day in days_off else "0",
+                            "open_schedule": "1" if open_schedule else "0"})
+    return records
+
+def temp_schedule_records(count, share=0.05, seed=3):
+    """Temporary overrides for a share of the staff, as the sync_temp_schedules API returns them"""
+    rng = random.Random(seed)
+    records = []
+    for staff_id in rng.sample(range(1, count + 1), int(count * share)):
+        start, end = rng.choice(SHIFTS)
+        records.append({"staff_id": str(staff_id), "scheduled_in": start, "scheduled_out": end,
+                        "day_off": 0, "open_schedule": 0})
+    return records
+
+def mutate_records(records, field, value, share, seed=4):
+    """Copy of a payload with a share of the rows given a new field value and a share dropped, like a day of edits upstream"""
+    rng = random.Random(seed)
+    mutated = []
+    for record in records:
+        roll = rng.random()
+        if roll < share:
+            continue  # deleted upstream
+        if roll < share * 2:
+            record = dict(record, **{field: value})
+        mutated.append(record)
+    return mutated
+
+def attendance_punches(staff_count, days, end_date=None, seed=5):
+    """Punch log rows (staff_id, work_date, punch_type, punch_time) for the days before end_date"""
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    for offset in range(days, 0, -1):
+        work_date = (end_date - timedelta(days=offset)).strftime("%Y-%m-%d")
+        for staff_id in range(1, staff_count + 1):
+            if rng.random() < 0.25:
+                continue  # day off or absent
+            start = 7 * 3600 + rng.randrange(0, 5 * 3600)
+            end = start + rng.randrange(4 * 3600, 9 * 3600)
+            yield (staff_id, work_date, "in", _clock(start))
+            yield (staff_id, work_date, "off", _clock(end % 86400))
+
+def _clock(seconds):
+    return "%02d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def generate(staff_count, days, temp_share=0.05, seed=1):
+    """Create and fill DB_FILE in the current directory. Returns the number of punches written."""
+    db_manager.init_db()
+
+    conn = sqlite3.connect(db_manager.DB_FILE)
+    cursor = conn.cursor()
+    cursor.executemany('INSERT INTO staff_tbl (staff_id, first_name, last_name) VALUES (?, ?, ?)',
+                       [(int(r["staff_id"]), r["first_name"], r["last_name"]) for r in staff_records(staff_count, seed)])
+    cursor.executemany('''
+        INSERT INTO staff_schedule (staff_id, day_of_week, scheduled_in, scheduled_out, day_off, open_schedule)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(int(r["staff_id"]), int(r["work_day"]), r["start_time"], r["end_time"],
+           int(r["day_off"]), int(r["open_schedule"])) for r in schedule_records(staff_count, seed + 1)])
+    cursor.executemany('''
+        INSERT INTO temp_schedule (staff_id, scheduled_in, scheduled_out, day_off, open_schedule)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(int(r["staff_id"]), r["scheduled_in"], r["scheduled_out"], r["day_off"], r["open_schedule"])
+          for r in temp_schedule_records(staff_count, temp_share, seed + 2)])
+
+    # Through the punch log so the projection triggers build staff_attendance as the app would
+    punches = list(attendance_punches(staff_count, days, seed=seed + 3))
+    cursor.executemany('''
+        INSERT INTO punch_events (staff_id, work_date, punch_type, punch_time) VALUES (?, ?, ?, ?)
+    ''', punches)
+    conn.commit()
+    conn.close()
+
+    # Materialize the schedule window like the first sync would
+    effective_schedule.advance_window()
+    return len(punches)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill attendance.db with synthetic data")
+    parser.add_argument("--dir", required=True, help="directory to create attendance.db in")
+    parser.add_argument("--staff", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--temp-share", type=float, default=0.05, help="share of staff with a temp schedule")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="replace an existing attendance.db")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    os.chdir(args.dir)
+    if os.path.exists(db_manager.DB_FILE):
+        if not args.force:
+            print(f"{os.path.abspath(db_manager.DB_FILE)} already exists; pass --force to replace it")
+            sys.exit(1)
+        # WAL databases leave -wal and -shm files next to the main one
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_manager.DB_FILE + suffix):
+                os.remove(db_manager.DB_FILE + suffix)
+
+    start = time.perf_counter()
+    punches = generate(args.staff, args.days, args.temp_share, args.seed)
+    print(f"Wrote {args.staff} staff and {punches} punches over {args.days} days "
+          f"to {os.path.abspath(db_manager.DB_FILE)} in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
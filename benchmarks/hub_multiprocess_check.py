@@ -0,0 +1,167 @@
+"""
+Hub/terminal check with several processes on one machine.
+
+Starts a headless hub (hub_server.py) on a synthetic database and N terminal
+processes talking to it with HubClient. Each terminal punches its own staff
+in, then punches off the staff of the next terminal, like people leaving by a
+different entrance. Checks that every staff member ends up with one record
+on the hub, that every terminal saw the other terminals' punches as push
+invalidations, and that the terminals' cached rosters match the hub.
+
+    python benchmarks/hub_multiprocess_check.py --terminals 4 --staff-per-terminal 25
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+
+import bench_utils
+import generate_data
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def terminal(index, terminals, per_terminal, port, work_date, barrier, results):
+    sys.path.insert(0, bench_utils.REPO_DIR)
+    from hub_client import HubClient
+
+    pushed = set()
+    pushed_lock = threading.Lock()
+
+    def on_punched(staff_ids):
+        with pushed_lock:
+            pushed.update(staff_ids)
+
+    client = HubClient("127.0.0.1", port, on_punched=on_punched)
+    client.start()
+    client.fetch_all_staff(work_date)
+    time.sleep(0.2)  # let the subscription settle before anyone punches
+
+    own = list(range(index * per_terminal + 1, (index + 1) * per_terminal + 1))
+    following = (index + 1) % terminals
+    leaving = list(range(following * per_terminal + 1, (following + 1) * per_terminal + 1))
+    latencies = []
+
+    barrier.wait()
+    for staff_id in own:
+        start = time.perf_counter()
+        client.update_work_in(staff_id, "08:00:00", work_date)
+        latencies.append((time.perf_counter() - start) * 1000)
+    barrier.wait()
+    for staff_id in leaving:
+        start = time.perf_counter()
+        client.update_work_off(staff_id, "16:00:00", work_date)
+        latencies.append((time.perf_counter() - start) * 1000)
+    barrier.wait()
+    time.sleep(0.5)  # last pushes in flight
+
+    # Stale rows are refetched, the rest come from the cache
+    start = time.perf_counter()
+    roster = client.fetch_all_staff(work_date)
+    roster_ms = (time.perf_counter() - start) * 1000
+    client.stop()
+
+    others = set(range(1, terminals * per_terminal + 1)) - set(own) - set(leaving)
+    results.put({
+        "terminal": index,
+        "latencies": latencies,
+        "missed_pushes": sorted(others - pushed),
+        "roster": [list(row) for row in roster],
+        "roster_ms": roster_ms,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--terminals", type=int, default=4)
+    parser.add_argument("--staff-per-terminal", type=int, default=25)
+    parser.add_argument("--staff", type=int, default=500)
+    args = parser.parse_args()
+    per_terminal = args.staff_per_terminal
+    staff_count = max(args.staff, args.terminals * per_terminal)
+    work_date = date.today().strftime("%Y-%m-%d")
+    failures = []
+
+    with bench_utils.work_dir() as work_dir:
+        generate_data.generate(staff_count, 0)
+
+        port = free_port()
+        env = dict(os.environ, ATTENDANCE_HUB=f"127.0.0.1:{port}")
+        hub = subprocess.Popen([sys.executable, os.path.join(bench_utils.REPO_DIR, "hub_server.py")],
+                               cwd=work_dir, env=env)
+        try:
+            if not wait_for_port(port):
+                print("Hub did not start")
+                sys.exit(1)
+
+            context = multiprocessing.get_context("spawn")
+            barrier = context.Barrier(args.terminals)
+            results = context.Queue()
+            processes = [context.Process(target=terminal, args=(i, args.terminals, per_terminal, port,
+                                                                work_date, barrier, results))
+                         for i in range(args.terminals)]
+            for process in processes:
+                process.start()
+            reports = sorted((results.get(timeout=60) for _ in processes), key=lambda r: r["terminal"])
+            for process in processes:
+                process.join()
+        finally:
+            hub.terminate()
+            hub.wait()
+
+        conn = sqlite3.connect(os.path.join(work_dir, "attendance.db"))
+        hub_rows = conn.execute(ROSTER_CHECK_QUERY, (work_date,)).fetchall()
+        hub_roster = conn.execute("SELECT COUNT(*) FROM staff_tbl").fetchone()[0]
+        conn.close()
+
+    punched = args.terminals * per_terminal
+    split = [row for row in hub_rows if row[1:] != ("08:00:00", "16:00:00", 8.0, 1)]
+    if len(hub_rows) != punched or split:
+        failures.append(f"expected {punched} complete records on the hub, got {len(hub_rows)} ({len(split)} wrong)")
+
+    latencies = [ms for report in reports for ms in report["latencies"]]
+    for report in reports:
+        if report["missed_pushes"]:
+            failures.append(f"terminal {report['terminal']} missed pushes for {len(report['missed_pushes'])} staff")
+        finished = {row[0]: row for row in report["roster"] if row[6]}
+        if len(report["roster"]) != hub_roster or len(finished) != punched:
+            failures.append(f"terminal {report['terminal']} roster out of date "
+                            f"({len(finished)}/{punched} punched off)")
+
+    print(f"{args.terminals} terminals, {punched} staff punched in and off across terminals")
+    print(f"punch round trip: mean {sum(latencies) / len(latencies):.2f} ms, "
+          f"p99 {bench_utils.percentile(latencies, 99):.2f} ms")
+    print("roster read after invalidations: " +
+          ", ".join(f"{report['roster_ms']:.1f} ms" for report in reports))
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+ROSTER_CHECK_QUERY = '''
+    SELECT staff_id, work_in, work_off, hours_worked, session_count
+    FROM staff_attendance WHERE work_date = ?
+'''
+
+if __name__ == "__main__":
+    main()
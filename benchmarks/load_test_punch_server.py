@@ -0,0 +1,88 @@
+"""
+Load test for the punch ingestion server.
+
+Starts a PunchServer on a throwaway database in a temporary directory and
+fires punches from concurrent keep-alive HTTP clients, like a queue of badge
+readers at shift change. Reports punches per second and latency percentiles.
+
+    python benchmarks/load_test_punch_server.py --clients 20 --punches 5000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import bench_utils  # noqa: F401  (puts the application modules on sys.path)
+from bench_utils import percentile
+
+def prepare_database(staff_count):
+    from db_manager import init_db, DB_FILE
+    init_db()
+    conn = sqlite3.connect(DB_FILE)
+    conn.executemany("INSERT INTO staff_tbl (staff_id, first_name, last_name) VALUES (?, ?, ?)",
+                     [(staff_id, f"First{staff_id}", f"Last{staff_id}") for staff_id in range(1, staff_count + 1)])
+    conn.commit()
+    conn.close()
+
+def client(port, staff_count, count, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for _ in range(count):
+        body = json.dumps({"staff_id": rng.randint(1, staff_count)})
+        start = time.perf_counter()
+        conn.request("POST", "/punch", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status != 200:
+            errors.append(response.status)
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--punches", type=int, default=4000, help="total punches across all clients")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # DB_FILE is relative to the working directory
+        prepare_database(args.staff)
+
+        from punch_server import PunchServer
+        from work_time_manager import WorkTimeManager
+        server = PunchServer(WorkTimeManager(datetime.now(), None), port=0)
+        server.start()
+
+        latencies, errors = [], []
+        per_client = args.punches // args.clients
+        threads = [threading.Thread(target=client, args=(server.port, args.staff, per_client, latencies, errors, seed))
+                   for seed in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.stop()
+
+        conn = sqlite3.connect("attendance.db")
+        logged = conn.execute("SELECT COUNT(*) FROM punch_events").fetchone()[0]
+        conn.close()
+
+    total = per_client * args.clients
+    print(f"punches:      {total} from {args.clients} clients ({len(errors)} errors, {logged} logged)")
+    print(f"throughput:   {total / elapsed:.0f} punches/s")
+    print(f"batches:      {server.batches_committed} ({total / max(server.batches_committed, 1):.1f} punches/batch)")
+    print(f"latency p50:  {percentile(latencies, 50):.1f} ms")
+    print(f"latency p99:  {percentile(latencies, 99):.1f} ms")
+    return 1 if errors or logged != total else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
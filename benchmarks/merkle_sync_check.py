@@ -0,0 +1,175 @@
+"""
+Hash tree sync check against a local stand-in server.
+
+Builds a synthetic database and serves the same staff, schedule and
+temporary schedule records from a localhost HTTP server that answers
+merkle_sync requests with merkle_sync.handle_request(). Then:
+
+  1. syncs with nothing changed upstream: one request per table, no rows
+  2. edits every record of --edited-staff random staff upstream and syncs
+     again: only the differing staff_id ranges are downloaded, and the
+     local tables end up hashing the same as the server's
+  3. changes one attendance row on the server and checks that
+     verify_attendance() reports exactly its range
+
+Prints requests and bytes for each phase next to a full download.
+Exits with status 1 if any check fails.
+
+    python benchmarks/merkle_sync_check.py --staff 5000
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bench_utils
+import generate_data
+
+class StandInServer:
+    """The server side of merkle_sync over in-memory records"""
+    def __init__(self, records):
+        import merkle_sync
+
+        self.records = records
+        self.requests = 0
+        self.bytes_sent = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                message = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.send(self, merkle_sync.handle_request(message, server.records))
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/merkle_sync.php"
+        threading.Thread(target=self.httpd.serve_forever, name="stand-in-server", daemon=True).start()
+
+    def send(self, handler, payload):
+        body = json.dumps(payload).encode()
+        self.requests += 1
+        self.bytes_sent += len(body)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def reset_counters(self):
+        requests, sent = self.requests, self.bytes_sent
+        self.requests = self.bytes_sent = 0
+        return requests, sent
+
+    def full_download_bytes(self):
+        """What the full-table endpoints would send for the three tables"""
+        return sum(len(json.dumps({"status": "success", "data": self.records[table]}).encode())
+                   for table in ("staff", "schedule", "temp_schedule"))
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def local_matches(server, tables):
+    import merkle_sync
+    return {table: merkle_sync.HashTree(table, merkle_sync.local_records(table)).levels[-1] ==
+                   merkle_sync.HashTree(table, server.records[table]).levels[-1]
+            for table in tables}
+
+def edit_staff(records, staff_ids, field, value):
+    """Copy of a payload with field set to value on every record of staff_ids"""
+    return [dict(record, **{field: value}) if int(record["staff_id"]) in staff_ids else record
+            for record in records]
+
+def sync_all():
+    import merkle_sync
+    from db_sync import SyncReport
+    report = SyncReport()
+    results = [merkle_sync.sync_table(table, report) for table in ("staff", "schedule", "temp_schedule")]
+    return results, report
+
+def run(args):
+    import db_sync
+    import merkle_sync
+
+    generate_data.generate(args.staff, args.days)
+    start = (date.today() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+    end = date.today().strftime("%Y-%m-%d")
+    tables = ("staff", "schedule", "temp_schedule")
+    server = StandInServer({
+        "staff": generate_data.staff_records(args.staff),
+        "schedule": generate_data.schedule_records(args.staff),
+        "temp_schedule": generate_data.temp_schedule_records(args.staff),
+        # The server's copy of the uploaded attendance starts out identical
+        "attendance": merkle_sync.local_records("attendance", start, end),
+    })
+    # The first full sync stores the records the way the app does
+    db_sync.apply_staff_data(server.records["staff"])
+    db_sync.apply_schedule_data(server.records["schedule"])
+    db_sync.apply_temp_schedule_data(server.records["temp_schedule"])
+    merkle_sync.MERKLE_API_URL = server.url
+    full_bytes = server.full_download_bytes()
+    failures = []
+
+    try:
+        results, report = sync_all()
+        requests, sent = server.reset_counters()
+        print(f"unchanged: {requests} requests, {sent} B (full download {full_bytes} B), "
+              f"{len(report.changed_staff_ids)} staff changed")
+        if results != [True] * 3 or report.changed or requests != len(tables):
+            failures.append("unchanged sync did more than compare the top level")
+
+        edited = set(random.Random(11).sample(range(1, args.staff + 1), args.edited_staff))
+        server.records["staff"] = edit_staff(server.records["staff"], edited, "last_name", "Renamed")
+        server.records["schedule"] = edit_staff(server.records["schedule"], edited, "start_time", "10:00:00")
+        # One of them leaves for good
+        gone = min(edited)
+        for table in tables:
+            server.records[table] = [record for record in server.records[table] if int(record["staff_id"]) != gone]
+        results, report = sync_all()
+        requests, sent = server.reset_counters()
+        matches = local_matches(server, tables)
+        print(f"{len(edited)} staff edited: {requests} requests, {sent} B (full download "
+              f"{server.full_download_bytes()} B), {len(report.changed_staff_ids)} staff changed")
+        if results != [True] * 3 or not all(matches.values()):
+            failures.append(f"tables differ from the server after sync: {matches}")
+
+        results, report = sync_all()
+        server.reset_counters()
+        if report.changed:
+            failures.append("second sync after the edits changed data again")
+
+        row = next(row for row in server.records["attendance"] if row["work_off"])
+        server.records["attendance"] = [dict(r, work_off="23:59:00") if r is row else r
+                                        for r in server.records["attendance"]]
+        ranges = merkle_sync.verify_attendance(start, end)
+        requests, sent = server.reset_counters()
+        print(f"attendance check: {requests} requests, {sent} B, differing ranges {ranges}")
+        first, last = ranges[0] if ranges else (None, None)
+        if len(ranges or ()) != 1 or not first <= row["staff_id"] <= last:
+            failures.append(f"attendance check did not isolate staff {row['staff_id']}")
+    finally:
+        server.stop()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--staff", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--edited-staff", type=int, default=20, help="staff whose records change upstream")
+    args = parser.parse_args()
+
+    with bench_utils.work_dir():
+        failures = run(args)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("All checks passed" if not failures else f"{len(failures)} checks failed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
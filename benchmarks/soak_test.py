@@ -0,0 +1,350 @@
+"""
+Soak test: weeks of kiosk uptime in minutes, failing on leaks and slowdowns.
+
+Runs the real MainWindow offscreen against a synthetic database. The app
+clock is a fake that advances --step seconds per tick instead of one, a
+local HTTP server stands in for the sync API (its payload changes every
+night like upstream edits do), syncs are triggered every --sync-minutes of
+simulated time and staff punch in and off on a daily script. Midnight
+rollovers, prefetches, syncs and punches all go through the app's own code.
+
+Every simulated hour it samples RSS, open file descriptors, live QObjects
+and threads; every operation's latency is kept per day. After --warmup-days
+a least-squares trend is fitted to each series, and the run fails (exit
+status 1) if it projects growth beyond the limits over the simulated span,
+or if more than --max-punch-errors punches or --max-sync-failures data syncs
+failed.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/soak_test.py --days 30 --staff 500
+
+Use --output to keep the samples as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import time as clock_time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bench_utils
+import generate_data
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+class FakeSyncServer:
+    """Serves the three sync endpoints from generate_data payloads on localhost"""
+    PATHS = {"/sync_staff.php": "staff",
+             "/sync_schedules.php": "schedules",
+             "/sync_temp_schedules.php": "temp_schedules"}
+
+    def __init__(self, staff_count):
+        self.original = {"staff": generate_data.staff_records(staff_count),
+                         "schedules": generate_data.schedule_records(staff_count),
+                         "temp_schedules": generate_data.temp_schedule_records(staff_count)}
+        self.payloads = self.original
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = FakeSyncServer.PATHS.get(self.path)
+                if name is None:
+                    self.send_error(404)
+                    return
+                server.requests += 1
+                body = json.dumps({"status": "success", "data": server.payloads[name]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-sync-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def edit_upstream(self, day):
+        """A night of upstream edits: a few renames, moved shifts and dropped temp schedules"""
+        self.payloads = {
+            "staff": generate_data.mutate_records(self.original["staff"], "last_name", f"Renamed{day}", 0.01, seed=day),
+            "schedules": generate_data.mutate_records(self.original["schedules"], "start_time",
+                                                      "%02d:00:00" % (7 + day % 3), 0.02, seed=day),
+            "temp_schedules": generate_data.mutate_records(self.original["temp_schedules"], "scheduled_in",
+                                                           "10:00:00", 0.1, seed=day),
+        }
+
+def fake_time_sync_class(start, step):
+    """A TimeSync whose clock starts at start, advances step per tick and never drifts"""
+    from sync_core import TimeSync
+
+    class FakeTimeSync(TimeSync):
+        def __init__(self):
+            super().__init__()
+            self.current_datetime = self.beirut_tz.localize(start)
+
+        def increment_time(self):
+            self.current_datetime = self.beirut_tz.normalize(self.current_datetime + step)
+            return self.current_datetime
+
+        def sync_with_ntp(self):
+            return self.current_datetime
+
+        def sync_with_system_time(self):
+            return self.current_datetime
+
+        def fallback_to_system_time(self):
+            pass
+
+    return FakeTimeSync
+
+class Recorder:
+    """Per-day operation latencies and hourly resource samples"""
+    def __init__(self):
+        self.latencies = defaultdict(lambda: defaultdict(list))  # operation -> day -> ms
+        self.samples = []
+
+    def timed(self, operation, day, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.latencies[operation][day].append((time.perf_counter() - start) * 1000)
+        return result
+
+    def wrap(self, owner, name, operation, day_of):
+        """Time every call of owner.name, including the ones the app makes itself"""
+        original = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.latencies[operation][day_of()].append((time.perf_counter() - start) * 1000)
+
+        setattr(owner, name, wrapper)
+
+    def sample(self, day, main_window):
+        from PyQt5.QtCore import QObject
+        from PyQt5.QtWidgets import QApplication
+
+        self.samples.append({
+            "day": day,
+            "rss_mb": bench_utils.rss_kb() / 1024,
+            "fds": bench_utils.open_fd_count() or 0,
+            "qobjects": len(main_window.findChildren(QObject)) + len(QApplication.allWidgets()),
+            "threads": threading.active_count(),
+        })
+
+    def daily_medians(self, operation):
+        return [(day, statistics.median(values)) for day, values in sorted(self.latencies[operation].items())]
+
+def slope(points):
+    """Least-squares slope of (x, y) points, in y per x"""
+    if len(points) < 2:
+        return 0.0
+    mean_x = statistics.fmean(x for x, _ in points)
+    mean_y = statistics.fmean(y for _, y in points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+def punch_script(staff_ids, day, step_minutes):
+    """minute of the day -> [(staff_id, 'in' or 'off')], in around 8:00 and off around 16:30"""
+    import random
+    rng = random.Random(day)
+    script = defaultdict(list)
+    for staff_id in staff_ids:
+        start = 7 * 60 + 30 + rng.randrange(60)
+        end = 16 * 60 + rng.randrange(60)
+        script[start - start % step_minutes].append((staff_id, "in"))
+        script[end - end % step_minutes].append((staff_id, "off"))
+    return script
+
+def simulate(args, server):
+    from PyQt5.QtWidgets import QApplication
+    import db_sync
+    import internet_conn
+    import metrics
+    import ui_components
+    from db_manager import init_db
+
+    # Point the app's sync and connectivity probe at the fake server
+    db_sync.API_URL = server.url("/sync_staff.php")
+    db_sync.SCHEDULES_API_URL = server.url("/sync_schedules.php")
+    db_sync.TEMP_SCHEDULES_API_URL = server.url("/sync_temp_schedules.php")
+    internet_conn.PROBE_HOSTS = [("127.0.0.1", server.port)]
+    internet_conn.PROBE_DOMAIN = "localhost"
+
+    step = timedelta(seconds=args.step)
+    start = datetime.combine(datetime.now().date(), clock_time(6, 0))
+    ui_components.TimeSync = fake_time_sync_class(start, step)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    init_db()
+    main_window = ui_components.MainWindow()
+
+    # Run the loading sequence, including the first sync
+    deadline = time.monotonic() + 30
+    while not hasattr(main_window, "table_manager") and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    if not hasattr(main_window, "table_manager"):
+        raise RuntimeError("the window did not finish loading in 30 s")
+
+    # The harness drives the clock; the real one-second timer would add wall-clock ticks
+    main_window.sync_manager.clock_timer.stop()
+
+    recorder = Recorder()
+    # A modal error box would stall the run; count the errors instead
+    errors = []
+    main_window.show_error_message = errors.append
+    day = [0]
+    recorder.wrap(main_window.table_manager, "refresh", "roster_refresh", lambda: day[0])
+    recorder.wrap(main_window, "prefetch_next_day", "prefetch_check", lambda: day[0])
+
+    staff_ids = list(range(1, min(args.punching_staff, args.staff) + 1))
+    step_minutes = max(1, args.step // 60)
+    ticks_per_day = 86400 // args.step
+    sync_every = max(1, args.sync_minutes * 60 // args.step)
+    tick = 0
+    print(f"Simulating {args.days} days of {ticks_per_day} ticks, {len(staff_ids)} staff punching")
+    run_start = time.perf_counter()
+
+    for day[0] in range(args.days):
+        script = punch_script(staff_ids, day[0], step_minutes)
+        for _ in range(ticks_per_day):
+            main_window.sync_manager.update_time()
+            now = main_window.current_datetime
+            minute = now.hour * 60 + now.minute
+
+            for staff_id, punch_type in script.get(minute, ()):
+                if punch_type == "in":
+                    recorder.timed("punch_in", day[0], main_window.handle_work_in, 0, staff_id)
+                else:
+                    recorder.timed("punch_off", day[0], main_window.handle_work_off, 0, staff_id, "in")
+
+            if minute == 3 * 60:
+                server.edit_upstream(day[0])
+            if tick % sync_every == 0:
+                main_window.sync_manager.periodic_sync_attempt()
+            if minute % 60 == 0:
+                recorder.timed("search", day[0], main_window.table_manager.apply_search, "First1")
+                recorder.timed("search", day[0], main_window.table_manager.apply_search, "")
+                recorder.timed("internet_check", day[0], internet_conn.is_internet_available)
+                recorder.sample(day[0] + minute / 1440, main_window)
+
+            app.processEvents()
+            tick += 1
+
+        last = recorder.samples[-1]
+        print(f"day {day[0] + 1:3}: rss {last['rss_mb']:.1f} MB, {last['fds']} fds, "
+              f"{last['qobjects']} qobjects, {last['threads']} threads, "
+              f"{time.perf_counter() - run_start:.0f} s elapsed")
+
+    main_window.sync_manager.stop_timers()
+    sync_failures = metrics.counter("sync.data_failed").value
+    print(f"{server.requests} sync requests served, {sync_failures} failed syncs, {len(errors)} punch errors")
+    return recorder, errors, sync_failures
+
+def check_trends(recorder, args):
+    """Print each series' projected growth over the run. Returns the names that grew too much."""
+    span = args.days - args.warmup_days
+    limits = {"rss_mb": args.max_rss_growth_mb, "fds": args.max_fd_growth,
+              "qobjects": args.max_qobject_growth, "threads": args.max_thread_growth}
+    failures = []
+    print(f"\n{'series':20} {'start':>10} {'end':>10} {'trend/run':>10} {'limit':>10}")
+    for name, limit in limits.items():
+        points = [(s["day"], s[name]) for s in recorder.samples if s["day"] >= args.warmup_days]
+        if not points:
+            continue
+        growth = slope(points) * span
+        flag = " FAIL" if growth > limit else ""
+        print(f"{name:20} {points[0][1]:>10.1f} {points[-1][1]:>10.1f} {growth:>10.2f} {limit:>10.2f}{flag}")
+        if flag:
+            failures.append(name)
+
+    for operation in sorted(recorder.latencies):
+        medians = [(day, ms) for day, ms in recorder.daily_medians(operation) if day >= args.warmup_days]
+        if len(medians) < 2:
+            continue
+        baseline = medians[0][1]
+        growth = slope(medians) * span
+        # Relative to the first day after warmup, ignoring sub-millisecond noise
+        limit = max(baseline * args.max_latency_growth, args.min_latency_growth_ms)
+        flag = " FAIL" if growth > limit else ""
+        print(f"{operation + ' ms':20} {baseline:>10.2f} {medians[-1][1]:>10.2f} {growth:>10.2f} {limit:>10.2f}{flag}")
+        if flag:
+            failures.append(operation)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--staff", type=int, default=500)
+    parser.add_argument("--punching-staff", type=int, default=200, help="staff who punch in and off every day")
+    parser.add_argument("--history-days", type=int, default=30, help="attendance history in the database")
+    parser.add_argument("--step", type=int, default=60, help="simulated seconds per tick")
+    parser.add_argument("--sync-minutes", type=int, default=30, help="simulated minutes between syncs")
+    parser.add_argument("--warmup-days", type=int, default=2)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=20)
+    parser.add_argument("--max-fd-growth", type=float, default=2)
+    parser.add_argument("--max-qobject-growth", type=float, default=10)
+    parser.add_argument("--max-thread-growth", type=float, default=2)
+    parser.add_argument("--max-latency-growth", type=float, default=0.5, help="0.5 = 50%% slower by the end")
+    parser.add_argument("--min-latency-growth-ms", type=float, default=1.0)
+    parser.add_argument("--max-punch-errors", type=int, default=0)
+    parser.add_argument("--max-sync-failures", type=int, default=0)
+    parser.add_argument("--output", help="write the samples and latencies to this JSON file")
+    args = parser.parse_args()
+    if args.days <= args.warmup_days + 1:
+        parser.error("--days must leave at least two days after --warmup-days")
+
+    output = os.path.abspath(args.output) if args.output else None
+    server = FakeSyncServer(args.staff)
+    server.start()
+    try:
+        with bench_utils.work_dir():
+            generate_data.generate(args.staff, args.history_days)
+            recorder, errors, sync_failures = simulate(args, server)
+    finally:
+        server.stop()
+
+    failures = check_trends(recorder, args)
+    if len(errors) > args.max_punch_errors:
+        print(f"\n{len(errors)} punch errors, more than {args.max_punch_errors}; the first: {errors[0]}")
+        failures.append("punch errors")
+    if sync_failures > args.max_sync_failures:
+        print(f"\n{sync_failures} data syncs failed, more than {args.max_sync_failures}")
+        failures.append("sync failures")
+    if output:
+        with open(output, "w") as results:
+            json.dump({"args": vars(args), "samples": recorder.samples, "punch_errors": errors,
+                       "sync_failures": sync_failures,
+                       "latencies": {operation: dict(days) for operation, days in recorder.latencies.items()}},
+                      results, indent=2)
+    if failures:
+        print(f"\nBeyond the limits: {', '.join(failures)}")
+        return 1
+    print("\nNo growth beyond the limits")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
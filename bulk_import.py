@@ -0,0 +1,219 @@
+# bulk_import.py historical attendance from CSV, for migrating a site onto the app
+#
+# The CSV has a header row and one row per staff member and day:
+#   staff_id,work_date,work_in,work_off
+#   17,2023-03-01,08:02:00,16:31:00
+# work_off may be empty for a day that was never punched off. Times may be
+# HH:MM or HH:MM:SS. Other columns (an old hours column, say) are ignored:
+# hours are recomputed the way the punch triggers compute them.
+#
+# Every day becomes its punches in punch_events plus the matching
+# staff_attendance row, so imported days look exactly like punched ones.
+import csv
+import sqlite3
+import time
+from datetime import date
+from datetime import time as clock_time
+
+from db_manager import get_connection, create_punch_log
+import metrics
+
+BATCH_SIZE = 50000          # rows validated and staged per executemany
+MAX_PRINTED_ERRORS = 20     # invalid rows printed; the rest are only counted (and written to rejects)
+REQUIRED_COLUMNS = ("staff_id", "work_date", "work_in")
+
+# Rebuilt from db_manager.create_punch_log once the rows are in
+DEFERRED_TRIGGERS = ("punch_events_project_in", "punch_events_project_off")
+DEFERRED_INDEXES = ("idx_punch_events_time", "idx_punch_events_staff")
+
+class ImportResult:
+    """Counts of one import"""
+    def __init__(self):
+        self.rows_read = 0
+        self.imported = 0
+        self.invalid = 0
+        self.duplicates = 0      # a second row for the same staff member and day in the file
+        self.existing = 0        # days already in staff_attendance, left as they are
+        self.unknown_staff = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.imported} days imported from {self.rows_read} rows in {self.seconds:.1f} s "
+                f"({self.rows_per_second:,.0f} rows/s); skipped {self.invalid} invalid, "
+                f"{self.duplicates} duplicate, {self.existing} already recorded, "
+                f"{self.unknown_staff} unknown staff")
+
+def _clock(value):
+    """Normalize HH:MM or HH:MM:SS to HH:MM:SS and return it with its seconds since midnight"""
+    parsed = clock_time.fromisoformat(value.strip())
+    return parsed.strftime("%H:%M:%S"), parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+def parse_row(row, columns):
+    """
+    Validate one CSV row. Returns the staging tuple
+    (staff_id, work_date, work_in, work_off, hours_worked); raises ValueError.
+    """
+    staff_id = int(row[columns["staff_id"]])
+    if staff_id <= 0:
+        raise ValueError(f"staff_id {staff_id} is not positive")
+    work_date = date.fromisoformat(row[columns["work_date"]].strip()).isoformat()
+    work_in, in_seconds = _clock(row[columns["work_in"]])
+
+    work_off_text = row[columns["work_off"]].strip() if "work_off" in columns else ""
+    if not work_off_text:
+        return (staff_id, work_date, work_in, None, None)
+    work_off, off_seconds = _clock(work_off_text)
+    # Past midnight, like the punch_events_project_off trigger
+    hours_worked = ((off_seconds - in_seconds) % 86400) / 3600.0
+    return (staff_id, work_date, work_in, work_off, hours_worked)
+
+def _header_columns(header):
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing {', '.join(missing)}")
+    return columns
+
+def import_attendance(path, batch_size=BATCH_SIZE, allow_unknown_staff=False, rejects_path=None):
+    """
+    Import a CSV of historical attendance in one transaction. Returns an
+    ImportResult, or None if nothing was imported (the database is unchanged).
+
+    Rows are validated and staged into a temporary table batch_size at a time
+    with executemany. Then, with the projection triggers and the punch_events
+    indexes dropped, the staged days go into punch_events and staff_attendance
+    with two INSERT ... SELECT statements, and the triggers and indexes are
+    created again. The app should be closed: the import holds the write lock
+    throughout.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    conn = get_connection()
+    conn.isolation_level = None
+    conn.execute('PRAGMA busy_timeout = 5000')
+    # Staging table and sort space in memory, and a large page cache for the index rebuilds
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -262144')
+    cursor = conn.cursor()
+    rejects_file = open(rejects_path, "w", newline="") if rejects_path else None
+    rejects = csv.writer(rejects_file) if rejects_file else None
+
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as csv_file:
+            reader = csv.reader(csv_file)
+            columns = _header_columns(next(reader))
+            if rejects:
+                rejects.writerow(["line", "error"] + list(columns))
+
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                CREATE TEMP TABLE import_days (
+                    staff_id INTEGER NOT NULL,
+                    work_date TEXT NOT NULL,
+                    work_in TEXT NOT NULL,
+                    work_off TEXT,
+                    hours_worked REAL
+                )
+            ''')
+
+            batch = []
+            for line, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                result.rows_read += 1
+                try:
+                    batch.append(parse_row(row, columns))
+                except (ValueError, IndexError) as e:
+                    result.invalid += 1
+                    if result.invalid <= MAX_PRINTED_ERRORS:
+                        print(f"Line {line}: {str(e)}")
+                    if rejects:
+                        rejects.writerow([line, str(e)] + row)
+                    continue
+                if len(batch) >= batch_size:
+                    cursor.executemany('INSERT INTO import_days VALUES (?, ?, ?, ?, ?)', batch)
+                    batch = []
+            if batch:
+                cursor.executemany('INSERT INTO import_days VALUES (?, ?, ?, ?, ?)', batch)
+
+        _drop_rows(cursor, result, allow_unknown_staff)
+        cursor.execute('SELECT COUNT(*) FROM import_days')
+        result.imported = cursor.fetchone()[0]
+
+        # Row-at-a-time triggers and index upkeep would dominate; rebuild them once instead
+        for trigger in DEFERRED_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        for index in DEFERRED_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
+        # Each day's punch in, then its punch off, so the log reads in punch order
+        cursor.execute('''
+            INSERT INTO punch_events (staff_id, work_date, punch_type, punch_time)
+            SELECT staff_id, work_date, punch_type, punch_time FROM (
+                SELECT staff_id, work_date, 'in' AS punch_type, work_in AS punch_time, 0 AS step FROM import_days
+                UNION ALL
+                SELECT staff_id, work_date, 'off', work_off, 1 FROM import_days WHERE work_off IS NOT NULL
+            )
+            ORDER BY work_date, staff_id, step
+        ''')
+
+        # The rows the projection triggers would have built
+        cursor.execute('''
+            INSERT INTO staff_attendance (staff_id, work_date, work_in, work_off, hours_worked, open_in, session_count)
+            SELECT staff_id, work_date, work_in, work_off, hours_worked,
+                   CASE WHEN work_off IS NULL THEN work_in END, 1
+            FROM import_days
+        ''')
+
+        create_punch_log(cursor)
+        cursor.execute('DROP TABLE import_days')
+        cursor.execute('COMMIT')
+
+    except (OSError, ValueError, StopIteration, sqlite3.Error) as e:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        if isinstance(e, StopIteration):
+            e = "the file is empty"
+        print(f"Import failed, nothing was imported: {str(e)}")
+        metrics.counter("import.failed", "Attendance imports that failed").inc()
+        return None
+
+    finally:
+        conn.close()
+        if rejects_file:
+            rejects_file.close()
+
+    result.seconds = time.perf_counter() - start
+    metrics.counter("import.days", "Attendance days imported from CSV").inc(result.imported)
+    return result
+
+def _drop_rows(cursor, result, allow_unknown_staff):
+    """Remove staged rows that must not be imported, counting why"""
+    # Keep the first row of a staff member and day
+    cursor.execute('''
+        DELETE FROM import_days WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM import_days GROUP BY staff_id, work_date
+        )
+    ''')
+    result.duplicates = cursor.rowcount
+
+    # Never overwrite days the app already recorded
+    cursor.execute('''
+        DELETE FROM import_days WHERE EXISTS (
+            SELECT 1 FROM staff_attendance
+            WHERE staff_attendance.staff_id = import_days.staff_id
+              AND staff_attendance.work_date = import_days.work_date
+        )
+    ''')
+    result.existing = cursor.rowcount
+
+    if not allow_unknown_staff:
+        cursor.execute('''
+            DELETE FROM import_days
+            WHERE staff_id NOT IN (SELECT staff_id FROM staff_tbl)
+        ''')
+        result.unknown_staff = cursor.rowcount
@@ -0,0 +1,99 @@
+from PyQt5.QtWidgets import QStyledItemDelegate, QToolTip
+from PyQt5.QtCore import Qt, QEvent, QRect, pyqtSignal
+from PyQt5.QtGui import QPainter
+from ui_builders import (BUTTON_ROLE, STAFF_ID_ROLE, BUTTON_LABELS, BUTTON_COLOR,
+                         BUTTON_PRESSED_COLOR, bold_font, shared_brush)
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    Paints Work In / Work Off buttons straight into table cells.
+
+    Cells carrying BUTTON_ROLE data are drawn as buttons and report clicks
+    through editorEvent, so no QPushButton or container widget is created
+    per row. All other cells are painted by the default delegate.
+
+    tooltip_provider, if set, is called with the index under the mouse and
+    returns tooltip text (or None for the item's own), so tooltips that
+    change often don't have to be written into every item.
+    """
+    clicked = pyqtSignal(int, str)  # staff_id, WORK_IN or WORK_OFF
+
+    BUTTON_WIDTH = 120
+    BUTTON_HEIGHT_RATIO = 0.8
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pressed_cell = None  # (row, column) while the mouse is held on a button
+        self.tooltip_provider = None
+
+    def button_rect(self, cell_rect):
+        """Rectangle of the button centered in its cell"""
+        width = min(self.BUTTON_WIDTH, cell_rect.width())
+        height = int(cell_rect.height() * self.BUTTON_HEIGHT_RATIO)
+        rect = QRect(0, 0, width, height)
+        rect.moveCenter(cell_rect.center())
+        return rect
+
+    def paint(self, painter, option, index):
+        button = index.data(BUTTON_ROLE)
+        if not button:
+            super().paint(painter, option, index)
+            return
+
+        pressed = self.pressed_cell == (index.row(), index.column())
+        rect = self.button_rect(option.rect)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(shared_brush(BUTTON_PRESSED_COLOR if pressed else BUTTON_COLOR))
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.setPen(Qt.white)
+        painter.setFont(bold_font())
+        painter.drawText(rect, Qt.AlignCenter, BUTTON_LABELS[button])
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        button = index.data(BUTTON_ROLE)
+        if not button:
+            return super().editorEvent(event, model, option, index)
+
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease,
+                                QEvent.MouseButtonDblClick):
+            return False
+        if event.button() != Qt.LeftButton:
+            return False
+
+        cell = (index.row(), index.column())
+        inside = self.button_rect(option.rect).contains(event.pos())
+
+        if event.type() == QEvent.MouseButtonPress:
+            self.pressed_cell = cell if inside else None
+            self._repaint(option.rect)
+            return inside
+
+        if event.type() == QEvent.MouseButtonRelease:
+            was_pressed = self.pressed_cell == cell
+            self.pressed_cell = None
+            self._repaint(option.rect)
+            if was_pressed and inside:
+                self.clicked.emit(index.data(STAFF_ID_ROLE), button)
+                return True
+            return False
+
+        # Swallow double clicks so a fast second click doesn't punch twice
+        return inside
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip and self.tooltip_provider is not None:
+            text = self.tooltip_provider(index)
+            if text:
+                QToolTip.showText(event.globalPos(), text, view)
+                return True
+        return super().helpEvent(event, view, option, index)
+
+    def _repaint(self, rect):
+        """Repaint a cell of the owning view after the pressed state changed"""
+        view = self.parent()
+        if view is not None:
+            view.viewport().update(rect)
@@ -0,0 +1,182 @@
+# db_backup.py online snapshots of attendance.db while the app keeps punching
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from db_manager import DB_FILE
+
+BACKUP_DIR = "backups"
+BACKUP_KEEP = 7                 # snapshots kept, newest first
+BACKUP_INTERVAL = 24 * 3600     # seconds between scheduled snapshots
+BACKUP_CHECK_INTERVAL = 10 * 60 # how often the GUI asks whether one is due
+PAGES_PER_STEP = 256            # 1 MB per step with the default 4 KB pages
+STEP_PAUSE = 0.005              # seconds between steps, so the copy never hogs the disk
+
+SNAPSHOT_PREFIX = "attendance-"
+SNAPSHOT_SUFFIX = ".db"
+PARTIAL_SUFFIX = ".partial"
+
+class BackupCancelled(Exception):
+    pass
+
+class BackupManager:
+    """
+    Copies the live database into rotated snapshots in backup_dir.
+
+    Uses SQLite's online backup API a few pages at a time. The source is
+    held in one read transaction for the whole copy: in WAL mode that is a
+    consistent snapshot which punches can keep writing past, and the copy
+    never restarts because of them (without it, every write to the source
+    makes the backup start over, and a busy day never finishes). The copy is
+    written as a .partial file, checked with PRAGMA integrity_check and only
+    then renamed into place, so a snapshot on disk is always a good one.
+    """
+    def __init__(self, db_file=DB_FILE, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP,
+                 pages_per_step=PAGES_PER_STEP, step_pause=STEP_PAUSE):
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.thread = None
+        self.cancel_event = threading.Event()
+        self.last_backup = None   # path of the last snapshot this process made
+
+    def snapshots(self):
+        """Snapshot paths, newest first"""
+        try:
+            names = os.listdir(self.backup_dir)
+        except OSError:
+            return []
+        names = [name for name in names if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)]
+        # The timestamp in the name sorts chronologically
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def is_due(self, interval=BACKUP_INTERVAL):
+        """True when the newest snapshot is older than interval, or there is none"""
+        snapshots = self.snapshots()
+        if not snapshots:
+            return True
+        try:
+            return time.time() - os.path.getmtime(snapshots[0]) >= interval
+        except OSError:
+            return True
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start_backup(self, on_finished=None):
+        """
+        Run backup() on a background thread. Returns False if one is already running.
+        on_finished(path or None) is called from that thread.
+        """
+        if self.is_running():
+            return False
+        self.cancel_event.clear()
+
+        def run():
+            path = self.backup()
+            if on_finished:
+                on_finished(path)
+
+        self.thread = threading.Thread(target=run, name="db-backup", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self, timeout=5):
+        """Cancel a running backup and wait for it to clean up"""
+        self.cancel_event.set()
+        if self.is_running():
+            self.thread.join(timeout)
+
+    def backup(self):
+        """Make one verified snapshot and rotate the old ones. Returns its path, or None on failure."""
+        if not os.path.exists(self.db_file):
+            print(f"Backup skipped, {self.db_file} does not exist")
+            return None
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating backup directory: {str(e)}")
+            metrics.counter("backup.failed", "Backups that failed or did not verify").inc()
+            return None
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.backup_dir, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+        partial = path + PARTIAL_SUFFIX
+        start = time.perf_counter()
+        try:
+            with metrics.timed("backup.run", "Online backup including the integrity check"):
+                pages = self._copy(partial)
+                self._verify(partial)
+            os.replace(partial, path)
+        except BackupCancelled:
+            print("Backup cancelled")
+            self._remove(partial)
+            return None
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error backing up database: {str(e)}")
+            metrics.counter("backup.failed", "Backups that failed or did not verify").inc()
+            self._remove(partial)
+            return None
+
+        print(f"Backed up {pages} pages to {path} in {time.perf_counter() - start:.1f} s")
+        self.last_backup = path
+        self.rotate()
+        return path
+
+    def _copy(self, partial):
+        """Copy the database into partial in small steps. Returns the page count."""
+        self._remove(partial)
+        source = sqlite3.connect(self.db_file, isolation_level=None)
+        target = sqlite3.connect(partial)
+        total_pages = [0]
+
+        def progress(status, remaining, total):
+            total_pages[0] = total
+            if self.cancel_event.is_set():
+                raise BackupCancelled()
+            # sqlite3 only sleeps between steps when the source is busy; pause anyway
+            time.sleep(self.step_pause)
+
+        try:
+            # Pin a snapshot of the source for the whole copy
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(target, pages=self.pages_per_step, progress=progress)
+            source.execute("COMMIT")
+            # The copy inherits WAL from the source; a snapshot should be one self-contained file
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        return total_pages[0]
+
+    def _verify(self, partial):
+        conn = sqlite3.connect(partial)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchall()
+        finally:
+            conn.close()
+        if result != [("ok",)]:
+            problems = "; ".join(row[0] for row in result[:5])
+            raise sqlite3.DatabaseError(f"integrity check failed on the copy: {problems}")
+
+    def rotate(self):
+        """Delete all but the newest keep snapshots, and copies left unfinished by a shutdown"""
+        for old in self.snapshots()[self.keep:]:
+            self._remove(old)
+        for name in os.listdir(self.backup_dir):
+            if name.startswith(SNAPSHOT_PREFIX) and name.endswith(PARTIAL_SUFFIX):
+                self._remove(os.path.join(self.backup_dir, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {path}: {str(e)}")
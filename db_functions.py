@@ -1,64 +1,284 @@
 # db_functions.py
 import sqlite3
 from datetime import datetime, date
-from db_manager import DB_FILE
+from db_manager import get_connection
+from metrics import timed
+from roster_row import RosterRow, minutes_after
+import effective_schedule
 
+def _minutes_after_sql(actual, scheduled):
+    """roster_row.minutes_after() in SQL, for two 'HH:MM:SS' columns"""
+    return (f"CASE WHEN COALESCE({actual}, '') = '' OR COALESCE({scheduled}, '') = '' THEN NULL "
+            f"ELSE CAST(substr({actual}, 1, 2) AS INTEGER) * 60 + CAST(substr({actual}, 4, 2) AS INTEGER) "
+            f"- CAST(substr({scheduled}, 1, 2) AS INTEGER) * 60 - CAST(substr({scheduled}, 4, 2) AS INTEGER) END")
+
+# RosterRow's minutes_late and minutes_early, selected around the roster subquery so they can
+# use its columns. SQLite flattens the subquery, so the plan is the same as without them
+LATE_EARLY_COLUMNS = '''
+           CASE WHEN roster.day_off OR roster.open_schedule THEN NULL ELSE {late} END AS minutes_late,
+           CASE WHEN roster.day_off OR roster.open_schedule THEN NULL ELSE {early} END AS minutes_early
+'''.format(late=_minutes_after_sql("roster.work_in", "roster.scheduled_in"),
+           early=_minutes_after_sql("roster.scheduled_out", "roster.work_off"))
+
+ROSTER_QUERY = '''
+    SELECT roster.*, {late_early} FROM (
+    SELECT staff_tbl.staff_id, staff_tbl.first_name, staff_tbl.last_name, 
+           COALESCE(temp_schedule.scheduled_in, staff_schedule.scheduled_in, '') as scheduled_in,
+           COALESCE(temp_schedule.scheduled_out, staff_schedule.scheduled_out, '') as scheduled_out,
+           staff_attendance.work_in, staff_attendance.work_off, 
+           staff_attendance.hours_worked, 
+           COALESCE(temp_schedule.day_off, staff_schedule.day_off, 0) as day_off,
+           COALESCE(temp_schedule.open_schedule, staff_schedule.open_schedule, 0) as open_schedule,
+           staff_attendance.open_in
+    FROM staff_tbl
+    LEFT JOIN staff_schedule ON staff_tbl.staff_id = staff_schedule.staff_id
+        AND staff_schedule.day_of_week = ?
+    LEFT JOIN temp_schedule ON staff_tbl.staff_id = temp_schedule.staff_id
+    LEFT JOIN staff_attendance ON staff_tbl.staff_id = staff_attendance.staff_id
+        AND staff_attendance.work_date = ?
+    {{where}}
+    ) AS roster
+    ORDER BY roster.first_name ASC, roster.staff_id ASC
+'''.format(late_early=LATE_EARLY_COLUMNS)
+
+# Same columns for dates effective_schedule has materialized: one primary key lookup per staff member
+EFFECTIVE_ROSTER_QUERY = '''
+    SELECT roster.*, {late_early} FROM (
+    SELECT staff_tbl.staff_id, staff_tbl.first_name, staff_tbl.last_name,
+           COALESCE(effective_schedule.scheduled_in, '') as scheduled_in,
+           COALESCE(effective_schedule.scheduled_out, '') as scheduled_out,
+           staff_attendance.work_in, staff_attendance.work_off,
+           staff_attendance.hours_worked,
+           COALESCE(effective_schedule.day_off, 0) as day_off,
+           COALESCE(effective_schedule.open_schedule, 0) as open_schedule,
+           staff_attendance.open_in
+    FROM staff_tbl
+    LEFT JOIN effective_schedule ON staff_tbl.staff_id = effective_schedule.staff_id
+        AND effective_schedule.schedule_date = ?
+    LEFT JOIN staff_attendance ON staff_tbl.staff_id = staff_attendance.staff_id
+        AND staff_attendance.work_date = ?
+    {{where}}
+    ) AS roster
+    ORDER BY roster.first_name ASC, roster.staff_id ASC
+'''.format(late_early=LATE_EARLY_COLUMNS)
+
+def _roster_query(conn, target_date):
+    """The roster query for a date and its leading parameters"""
+    if effective_schedule.is_materialized(conn.cursor(), target_date):
+        return EFFECTIVE_ROSTER_QUERY, (target_date, target_date)
+    # Outside the materialized window, resolve the schedule for the weekday on the fly
+    day_of_week = datetime.strptime(target_date, "%Y-%m-%d").weekday()
+    return ROSTER_QUERY, (day_of_week, target_date)
+
+@timed("db.fetch_all_staff", "Roster query for a day")
 def fetch_all_staff(target_date=None):
-    """Fetch all staff and their attendance data for a specific date."""
-    conn = sqlite3.connect(DB_FILE)
+    """Fetch all staff and their attendance data for a specific date, as RosterRow objects."""
+    conn = get_connection()
+    
+    if target_date is None:
+        target_date = date.today().strftime("%Y-%m-%d")
+
+    query, params = _roster_query(conn, target_date)
     cursor = conn.cursor()
+    cursor.execute(query.format(where=''), params)
     
+    rows = RosterRow.from_rows(cursor.fetchall())
+    conn.close()
+    return rows
+
+@timed("db.fetch_staff", "Single staff row query")
+def fetch_staff(staff_id, target_date=None):
+    """Fetch a single staff row for a specific date, or None if the staff member no longer exists."""
+    conn = get_connection()
+
     if target_date is None:
         target_date = date.today().strftime("%Y-%m-%d")
 
-    day_of_week = datetime.strptime(target_date, "%Y-%m-%d").weekday()
+    query, params = _roster_query(conn, target_date)
+    cursor = conn.cursor()
+    cursor.execute(query.format(where='WHERE staff_tbl.staff_id = ?'), (*params, staff_id))
+
+    row = cursor.fetchone()
+    conn.close()
+    return RosterRow(*row) if row is not None else None
+
+def fetch_staff_rows(staff_ids, target_date=None):
+    """Fetch the rows of several staff members for a date in one query. Returns {staff_id: row}."""
+    conn = get_connection()
+
+    if target_date is None:
+        target_date = date.today().strftime("%Y-%m-%d")
+
+    query, params = _roster_query(conn, target_date)
+    cursor = conn.cursor()
+
+    rows = {}
+    staff_ids = list(staff_ids)
+    # Stay under SQLite's bound parameter limit
+    for start in range(0, len(staff_ids), 500):
+        chunk = staff_ids[start:start + 500]
+        where = 'WHERE staff_tbl.staff_id IN ({})'.format(', '.join('?' * len(chunk)))
+        cursor.execute(query.format(where=where), (*params, *chunk))
+        rows.update((row[0], row) for row in RosterRow.from_rows(cursor.fetchall()))
+
+    conn.close()
+    return rows
+
+@timed("db.record_punch", "Single punch insert")
+def record_punch(staff_id, punch_type, punch_time, work_date):
+    """
+    Append a punch ('in' or 'off') to the punch_events log.
+    The log triggers keep the day's staff_attendance row up to date, so this is a single insert.
+    """
+    conn = get_connection()
+
+    try:
+        conn.execute('''
+            INSERT INTO punch_events (staff_id, work_date, punch_type, punch_time)
+            VALUES (?, ?, ?, ?)
+        ''', (staff_id, work_date, punch_type, punch_time))
+        conn.commit()
+    finally:
+        conn.close()
+
+def update_work_in(staff_id, work_in_time, current_date):
+    record_punch(staff_id, 'in', work_in_time, current_date)
+
+def update_work_off(staff_id, work_off_time, current_date):
+    record_punch(staff_id, 'off', work_off_time, current_date)
+
+@timed("db.record_punches", "Punch burst transaction")
+def record_punches(staff_ids, punch_time, work_date):
+    """
+    Record a burst of punches in a single transaction, toggling each staff member
+    between in and off. Returns a list of (staff_id, punch_type) in input order,
+    with punch_type None for staff that don't exist.
+    """
+    conn = get_connection()
+    conn.execute('PRAGMA busy_timeout = 5000')
+    cursor = conn.cursor()
+    results = []
+
+    try:
+        for staff_id in staff_ids:
+            cursor.execute('SELECT 1 FROM staff_tbl WHERE staff_id = ?', (staff_id,))
+            if cursor.fetchone() is None:
+                results.append((staff_id, None))
+                continue
+
+            # Earlier punches of the same burst are already projected, so repeats toggle correctly
+            cursor.execute('''
+                SELECT open_in FROM staff_attendance WHERE staff_id = ? AND work_date = ?
+            ''', (staff_id, work_date))
+            row = cursor.fetchone()
+            punch_type = 'off' if row is not None and row[0] is not None else 'in'
+
+            cursor.execute('''
+                INSERT INTO punch_events (staff_id, work_date, punch_type, punch_time)
+                VALUES (?, ?, ?, ?)
+            ''', (staff_id, work_date, punch_type, punch_time))
+            results.append((staff_id, punch_type))
+
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return results
+
+def fetch_sessions(staff_id, work_date):
+    """
+    Derive the work sessions of a staff member for a day from the punch log.
+    Returns a list of (work_in, work_off) pairs; work_off is None for an open session.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
 
     cursor.execute('''
-        SELECT staff_tbl.staff_id, staff_tbl.first_name, staff_tbl.last_name, 
-               COALESCE(temp_schedule.scheduled_in, staff_schedule.scheduled_in, '') as scheduled_in,
-               COALESCE(temp_schedule.scheduled_out, staff_schedule.scheduled_out, '') as scheduled_out,
-               staff_attendance.work_in, staff_attendance.work_off, 
-               staff_attendance.hours_worked, 
-               COALESCE(temp_schedule.day_off, staff_schedule.day_off, 0) as day_off,
-               COALESCE(temp_schedule.open_schedule, staff_schedule.open_schedule, 0) as open_schedule
-        FROM staff_tbl
-        LEFT JOIN staff_schedule ON staff_tbl.staff_id = staff_schedule.staff_id
-            AND staff_schedule.day_of_week = ?
-        LEFT JOIN temp_schedule ON staff_tbl.staff_id = temp_schedule.staff_id
-        LEFT JOIN staff_attendance ON staff_tbl.staff_id = staff_attendance.staff_id
-            AND staff_attendance.work_date = ?
-        ORDER BY staff_tbl.first_name ASC
-    ''', (day_of_week, target_date))
-    
+        SELECT punch_type, punch_time FROM punch_events
+        WHERE staff_id = ? AND work_date = ?
+        ORDER BY id
+    ''', (staff_id, work_date))
+
+    punches = cursor.fetchall()
+    conn.close()
+
+    # Same pairing rules as the projection triggers
+    sessions = []
+    open_in = None
+    for punch_type, punch_time in punches:
+        if punch_type == 'in' and open_in is None:
+            open_in = punch_time
+        elif punch_type == 'off' and open_in is not None:
+            sessions.append((open_in, punch_time))
+            open_in = None
+    if open_in is not None:
+        sessions.append((open_in, None))
+    return sessions
+
+def fetch_grid_staff():
+    """(staff_id, first_name, last_name) of every staff member, in roster order"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT staff_id, first_name, last_name FROM staff_tbl
+        ORDER BY first_name ASC, staff_id ASC
+    ''')
     rows = cursor.fetchall()
     conn.close()
     return rows
 
-def update_work_in(staff_id, work_in_time, current_date):
-    conn = sqlite3.connect(DB_FILE)
+@timed("db.fetch_attendance_range", "Attendance of a date range, for the grid")
+def fetch_attendance_range(start_date, end_date):
+    """
+    (staff_id, work_date, work_in, work_off, hours_worked) of every attendance
+    row from start_date to end_date inclusive. Served by idx_staff_attendance_date.
+    """
+    conn = get_connection()
     cursor = conn.cursor()
-    
     cursor.execute('''
-        INSERT INTO staff_attendance (staff_id, work_date, work_in)
-        VALUES (?, ?, ?)
-        ON CONFLICT(staff_id, work_date) DO UPDATE SET work_in = ?
-    ''', (staff_id, current_date, work_in_time, work_in_time))
-    
-    conn.commit()
+        SELECT staff_id, work_date, work_in, work_off, hours_worked FROM staff_attendance
+        WHERE work_date BETWEEN ? AND ?
+    ''', (start_date, end_date))
+    rows = cursor.fetchall()
     conn.close()
+    return rows
 
-def update_work_off(staff_id, work_off_time, hours_worked, current_date):
-    conn = sqlite3.connect(DB_FILE)
+# The schedule in force on each attendance day: materialized where effective_schedule has the
+# date, else the weekly schedule for its weekday. temp_schedule has no date and holds today's
+# override, so it would score past days against a shift they weren't on
+ARRIVALS_QUERY = '''
+    SELECT staff_attendance.staff_id, staff_attendance.work_date, staff_attendance.work_in,
+           COALESCE(effective_schedule.scheduled_in, staff_schedule.scheduled_in, ''),
+           COALESCE(effective_schedule.day_off, staff_schedule.day_off, 0),
+           COALESCE(effective_schedule.open_schedule, staff_schedule.open_schedule, 0)
+    FROM staff_attendance
+    JOIN staff_tbl ON staff_tbl.staff_id = staff_attendance.staff_id
+    LEFT JOIN effective_schedule ON effective_schedule.staff_id = staff_attendance.staff_id
+        AND effective_schedule.schedule_date = staff_attendance.work_date
+    LEFT JOIN staff_schedule ON staff_schedule.staff_id = staff_attendance.staff_id
+        AND staff_schedule.day_of_week = (CAST(strftime('%w', staff_attendance.work_date) AS INTEGER) + 6) % 7
+    WHERE staff_attendance.work_date BETWEEN ? AND ? AND staff_attendance.work_in IS NOT NULL
+'''
+
+@timed("db.fetch_arrivals", "Punches in against the schedule over a date range")
+def fetch_arrivals(start_date, end_date):
+    """
+    (staff_id, work_date, minutes_late) of every day punched in from
+    start_date to end_date inclusive, minutes_late as the roster query works it out.
+    Days with nothing to compare against (day off, open schedule) are left out.
+    """
+    conn = get_connection()
     cursor = conn.cursor()
+    cursor.execute(ARRIVALS_QUERY, (start_date, end_date))
+    rows = cursor.fetchall()
+    conn.close()
 
-    try:
-        cursor.execute('''
-            UPDATE staff_attendance
-            SET work_off = ?, hours_worked = ?
-            WHERE staff_id = ? AND work_date = ?
-        ''', (work_off_time, hours_worked, staff_id, current_date))
-        conn.commit()
-    except Exception as e:
-        print(f"Error in update_work_off: {e}")
-    finally:
-        conn.close()
\ No newline at end of file
+    arrivals = []
+    for staff_id, work_date, work_in, scheduled_in, day_off, open_schedule in rows:
+        late = None if day_off or open_schedule else minutes_after(work_in, scheduled_in)
+        if late is not None:
+            arrivals.append((staff_id, work_date, late))
+    return arrivals
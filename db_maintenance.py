@@ -0,0 +1,252 @@
+# db_maintenance.py idle-time upkeep of attendance.db: statistics, free pages and orphaned rows
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import metrics
+from db_manager import DB_FILE
+
+MAINTENANCE_CHECK_INTERVAL = 60  # how often the GUI asks whether a task is due
+
+# Orphans are rows of staff that sync removed from staff_tbl. Deleting staff doesn't
+# cascade (there is no ON DELETE and foreign keys are off), so their rows stay behind.
+# effective_schedule is keyed without a rowid; its orphans are cleaned per staff member.
+ORPHAN_TABLES = ("staff_schedule", "temp_schedule", "staff_attendance")
+
+class MaintenancePolicy:
+    """
+    When and how hard maintenance runs. Intervals are in seconds; None turns a task off.
+
+    idle_seconds          no punch for this long before anything starts
+    analyze_interval      ANALYZE every table, sampling analysis_limit rows per index
+    optimize_interval     PRAGMA optimize, which re-analyzes only what changed a lot
+    vacuum_interval       hand free pages back to the file system with incremental_vacuum
+    orphan_interval       delete schedules and attendance of staff no longer in staff_tbl
+    orphan_attendance_days  attendance of removed staff is kept this many days (None keeps it)
+    batch_size            rows deleted per write transaction
+    vacuum_pages          pages freed per write transaction
+    step_pause            seconds between write transactions, so punches get the lock
+    """
+    def __init__(self, idle_seconds=300, analyze_interval=7 * 24 * 3600,
+                 optimize_interval=24 * 3600, vacuum_interval=24 * 3600,
+                 orphan_interval=24 * 3600, orphan_attendance_days=365,
+                 analysis_limit=1000, batch_size=200, vacuum_pages=128, step_pause=0.02):
+        self.idle_seconds = idle_seconds
+        self.analyze_interval = analyze_interval
+        self.optimize_interval = optimize_interval
+        self.vacuum_interval = vacuum_interval
+        self.orphan_interval = orphan_interval
+        self.orphan_attendance_days = orphan_attendance_days
+        self.analysis_limit = analysis_limit
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.step_pause = step_pause
+
+    def intervals(self):
+        """Task name -> interval, in the order the tasks run"""
+        # Orphans first so the vacuum frees their pages and the statistics skip them
+        return {
+            "orphans": self.orphan_interval,
+            "vacuum": self.vacuum_interval,
+            "analyze": self.analyze_interval,
+            "optimize": self.optimize_interval,
+        }
+
+class MaintenanceCancelled(Exception):
+    pass
+
+class MaintenanceManager:
+    """
+    Runs the due maintenance tasks on a background thread while the
+    terminal is idle. Every write is a short transaction of its own
+    (batch_size deletes, vacuum_pages pages, one table's ANALYZE) followed
+    by step_pause, so a punch never waits on maintenance for more than a
+    few milliseconds. The slow parts, like finding orphaned rows, are reads,
+    which WAL runs alongside punches. Last run times are kept in the
+    maintenance_runs table, so a restart doesn't repeat the day's work.
+    """
+    def __init__(self, db_file=DB_FILE, policy=None):
+        self.db_file = db_file
+        self.policy = policy or MaintenancePolicy()
+        self.thread = None
+        self.cancel_event = threading.Event()
+        self.last_punch_id = None
+        self.last_activity = time.monotonic()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def is_idle(self):
+        """True when no punch has been recorded, by any process, for idle_seconds"""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            punch_id = conn.execute('SELECT MAX(id) FROM punch_events').fetchone()[0]
+        except sqlite3.Error:
+            return False
+        finally:
+            conn.close()
+        if punch_id != self.last_punch_id:
+            self.last_punch_id = punch_id
+            self.last_activity = time.monotonic()
+        return time.monotonic() - self.last_activity >= self.policy.idle_seconds
+
+    def due_tasks(self):
+        """Names of the tasks whose interval has passed since they last ran"""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            last_runs = dict(conn.execute('SELECT task, last_run FROM maintenance_runs').fetchall())
+        except sqlite3.Error as e:
+            print(f"Error reading maintenance runs: {str(e)}")
+            return []
+        finally:
+            conn.close()
+        now = time.time()
+        return [task for task, interval in self.policy.intervals().items()
+                if interval is not None and now - last_runs.get(task, 0) >= interval]
+
+    def start_if_due(self):
+        """
+        Run the due tasks on a background thread if the terminal is idle.
+        Returns True if it started.
+        """
+        if self.is_running() or not self.is_idle():
+            return False
+        tasks = self.due_tasks()
+        if not tasks:
+            return False
+        self.cancel_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(tasks,), name="db-maintenance", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self, timeout=5):
+        """Cancel running maintenance after its current step"""
+        self.cancel_event.set()
+        if self.is_running():
+            self.thread.join(timeout)
+
+    def run(self, tasks=None):
+        """Run tasks (default: every enabled one) now. Returns True if all completed."""
+        if tasks is None:
+            tasks = [task for task, interval in self.policy.intervals().items() if interval is not None]
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout = 5000')
+        completed = True
+        try:
+            for task in tasks:
+                start = time.perf_counter()
+                with metrics.timed(f"maintenance.{task}", f"Database maintenance: {task}"):
+                    result = getattr(self, f"_{task}")(conn)
+                conn.execute('INSERT OR REPLACE INTO maintenance_runs (task, last_run) VALUES (?, ?)',
+                             (task, time.time()))
+                print(f"Maintenance {task}: {result} in {time.perf_counter() - start:.1f} s")
+        except MaintenanceCancelled:
+            print("Maintenance cancelled")
+            completed = False
+        except sqlite3.Error as e:
+            print(f"Error during database maintenance: {str(e)}")
+            metrics.counter("maintenance.failed", "Maintenance runs that hit a database error").inc()
+            completed = False
+        finally:
+            conn.close()
+        return completed
+
+    def _step(self):
+        """Give punches the write lock between transactions, and honour stop()"""
+        if self.cancel_event.is_set():
+            raise MaintenanceCancelled()
+        time.sleep(self.policy.step_pause)
+
+    def _delete_in_batches(self, conn, keys, delete_query):
+        """Run delete_query for each key, batch_size keys per write transaction. Returns rows deleted."""
+        before = conn.total_changes
+        for start in range(0, len(keys), self.policy.batch_size):
+            self._step()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(delete_query, keys[start:start + self.policy.batch_size])
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        return conn.total_changes - before
+
+    def _orphans(self, conn):
+        """Delete rows of staff no longer in staff_tbl. Returns a summary."""
+        # Finding the rows is a plain read; only the deletes take the write lock
+        orphan = 'NOT EXISTS (SELECT 1 FROM staff_tbl WHERE staff_tbl.staff_id = {table}.staff_id)'
+        deleted = {}
+        for table in ORPHAN_TABLES:
+            where = orphan.format(table=table)
+            params = ()
+            if table == "staff_attendance":
+                if self.policy.orphan_attendance_days is None:
+                    continue
+                cutoff = date.today() - timedelta(days=self.policy.orphan_attendance_days)
+                where += ' AND work_date < ?'
+                params = (cutoff.strftime("%Y-%m-%d"),)
+            keys = conn.execute(f'SELECT rowid FROM {table} WHERE {where}', params).fetchall()
+            # The condition is checked again inside the write transaction: a sync may have
+            # brought the staff member back since the read, and their rows must stay
+            deleted[table] = self._delete_in_batches(
+                conn, keys, f'DELETE FROM {table} WHERE rowid = ? AND {orphan.format(table=table)}')
+
+        where = orphan.format(table="effective_schedule")
+        keys = conn.execute(f'SELECT schedule_date, staff_id FROM effective_schedule WHERE {where}').fetchall()
+        deleted["effective_schedule"] = self._delete_in_batches(
+            conn, keys,
+            f'DELETE FROM effective_schedule WHERE schedule_date = ? AND staff_id = ? AND {where}')
+
+        total = sum(deleted.values())
+        metrics.counter("maintenance.orphans_deleted", "Orphaned rows deleted").inc(total)
+        return ", ".join(f"{count} from {table}" for table, count in deleted.items()) + " deleted"
+
+    def _vacuum(self, conn):
+        """Return free pages to the file system a few at a time. Returns a summary."""
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # Needs a one-off full VACUUM: python -m attendance maintain --enable-vacuum
+            return "skipped, incremental vacuum is not enabled on this database"
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        remaining = free_pages
+        while remaining > 0:
+            self._step()
+            # incremental_vacuum frees one page per step of the statement, and execute()
+            # only steps once; executescript() runs it to the end, in its own transaction
+            conn.executescript(f'PRAGMA incremental_vacuum({int(self.policy.vacuum_pages)});')
+            remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return f"{free_pages} pages freed"
+
+    def _analyze(self, conn):
+        """ANALYZE each table in its own transaction. Returns a summary."""
+        conn.execute(f'PRAGMA analysis_limit = {int(self.policy.analysis_limit)}')
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            self._step()
+            conn.execute(f'ANALYZE "{table}"')
+        return f"{len(tables)} tables analyzed"
+
+    def _optimize(self, conn):
+        """PRAGMA optimize with the same sampling limit as _analyze"""
+        conn.execute(f'PRAGMA analysis_limit = {int(self.policy.analysis_limit)}')
+        self._step()
+        conn.execute('PRAGMA optimize')
+        return "done"
+
+def enable_incremental_vacuum(db_file=DB_FILE):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL. This needs a full
+    VACUUM, which locks and rewrites the whole file, so run it with the app
+    closed. New databases get the setting from init_db.
+    """
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+    finally:
+        conn.close()
@@ -1,13 +1,27 @@
 # db_manager.py
 import sqlite3
+import db_trace
 
 DB_FILE = "attendance.db"
 
+def get_connection():
+    """Open a connection to the attendance database, traced when ATTENDANCE_SQL_TRACE=1"""
+    return db_trace.connect(DB_FILE)
+
 def init_db():
     """Initialize the database and create all tables if not exists."""
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
+    # Lets db_maintenance.py return free pages a few at a time. Only takes effect
+    # before the first table is created; older databases are converted with
+    # python -m attendance maintain --enable-vacuum
+    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+
+    # WAL lets readers (the roster, online backups) run alongside a punch being written.
+    # The setting is stored in the database file, so every later connection uses it.
+    cursor.execute('PRAGMA journal_mode=WAL')
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS staff_tbl (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -52,10 +66,164 @@ def init_db():
             work_in TEXT,
             work_off TEXT,
             hours_worked REAL,
+            open_in TEXT,                           -- start of the open session, NULL when punched off
+            session_count INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (staff_id) REFERENCES staff_tbl(staff_id),
             UNIQUE(staff_id, work_date)
         )
     ''')
 
+    # Databases created before the punch log need the projection columns
+    if _add_column_if_missing(cursor, 'staff_attendance', 'open_in', 'TEXT'):
+        cursor.execute('''
+            UPDATE staff_attendance SET open_in = work_in
+            WHERE work_in IS NOT NULL AND work_off IS NULL
+        ''')
+    if _add_column_if_missing(cursor, 'staff_attendance', 'session_count', 'INTEGER NOT NULL DEFAULT 0'):
+        cursor.execute('UPDATE staff_attendance SET session_count = 1 WHERE work_in IS NOT NULL')
+
+    # The attendance grid reads whole date ranges; UNIQUE(staff_id, work_date) can't serve those
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_staff_attendance_date
+        ON staff_attendance (work_date)
+    ''')
+
+    create_punch_log(cursor)
+    create_effective_schedule(cursor)
+
+    # When each db_maintenance.py task last ran, as a Unix time
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            last_run REAL NOT NULL
+        )
+    ''')
+
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def _add_column_if_missing(cursor, table, column, definition):
+    """Add a column to an existing table. Returns True if it was added."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column in {row[1] for row in cursor.fetchall()}:
+        return False
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+def create_effective_schedule(cursor):
+    """
+    Create the materialized schedule calendar kept by effective_schedule.py:
+    one row per staff member and date with the schedule resolved from
+    temp_schedule and staff_schedule, for the dates in effective_schedule_days.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS effective_schedule_days (
+            schedule_date TEXT PRIMARY KEY
+        )
+    ''')
+
+    # Keyed by date first, so a day's roster is one range of the primary key
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS effective_schedule (
+            schedule_date TEXT NOT NULL,
+            staff_id INTEGER NOT NULL,
+            scheduled_in TEXT NOT NULL,
+            scheduled_out TEXT NOT NULL,
+            day_off INTEGER NOT NULL,
+            open_schedule INTEGER NOT NULL,
+            PRIMARY KEY (schedule_date, staff_id)
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_effective_schedule_staff
+        ON effective_schedule (staff_id)
+    ''')
+
+def create_punch_log(cursor):
+    """
+    Create the append-only punch_events log and the triggers that project it
+    into staff_attendance.
+
+    A punch is a single INSERT into punch_events. The AFTER INSERT triggers
+    keep the per-day staff_attendance row up to date incrementally:
+    work_in is the first punch in of the day, work_off the last punch off
+    (NULL while a session is open) and hours_worked the sum of all closed
+    sessions. A punch in while a session is open, or a punch off with no
+    open session, is kept in the log but does not change the projection.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS punch_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            staff_id INTEGER NOT NULL,
+            work_date TEXT NOT NULL,
+            punch_type TEXT NOT NULL CHECK (punch_type IN ('in', 'off')),
+            punch_time TEXT NOT NULL,
+            recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (staff_id) REFERENCES staff_tbl(staff_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_punch_events_time
+        ON punch_events (work_date, punch_time)
+    ''')
+
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_punch_events_staff
+        ON punch_events (staff_id, work_date, id)
+    ''')
+
+    # The log is insert-only
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS punch_events_no_update
+        BEFORE UPDATE ON punch_events
+        BEGIN
+            SELECT RAISE(ABORT, 'punch_events is append-only');
+        END
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS punch_events_no_delete
+        BEFORE DELETE ON punch_events
+        BEGIN
+            SELECT RAISE(ABORT, 'punch_events is append-only');
+        END
+    ''')
+
+    # Punch in: open a session, creating the day row on the first punch
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS punch_events_project_in
+        AFTER INSERT ON punch_events
+        WHEN NEW.punch_type = 'in'
+        BEGIN
+            INSERT INTO staff_attendance (staff_id, work_date, work_in, open_in, session_count)
+            VALUES (NEW.staff_id, NEW.work_date, NEW.punch_time, NEW.punch_time, 1)
+            ON CONFLICT(staff_id, work_date) DO UPDATE SET
+                work_in = COALESCE(work_in, excluded.work_in),
+                work_off = NULL,
+                open_in = excluded.open_in,
+                session_count = session_count + 1
+            WHERE open_in IS NULL;
+        END
+    ''')
+
+    # Punch off: close the open session and add its length, wrapping past midnight
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS punch_events_project_off
+        AFTER INSERT ON punch_events
+        WHEN NEW.punch_type = 'off'
+        BEGIN
+            UPDATE staff_attendance
+            SET work_off = NEW.punch_time,
+                hours_worked = COALESCE(hours_worked, 0) + (
+                    CASE WHEN strftime('%s', NEW.punch_time) >= strftime('%s', open_in)
+                         THEN strftime('%s', NEW.punch_time) - strftime('%s', open_in)
+                         ELSE strftime('%s', NEW.punch_time) - strftime('%s', open_in) + 86400
+                    END) / 3600.0,
+                open_in = NULL
+            WHERE staff_id = NEW.staff_id
+              AND work_date = NEW.work_date
+              AND open_in IS NOT NULL;
+        END
+    ''')
\ No newline at end of file
@@ -1,104 +1,160 @@
 # db_sync.py
 import sqlite3
-import requests
 import json
+# requests is imported inside the sync_* functions; the apply_* reconcilers don't need it
 from internet_conn import is_internet_available
-from db_manager import DB_FILE
+from db_manager import get_connection
+from metrics import timed
+import effective_schedule
 API_URL = "http://silverstage.alawiyeh.com/sync_staff.php"
 SCHEDULES_API_URL = "http://silverstage.alawiyeh.com/sync_schedules.php"
 TEMP_SCHEDULES_API_URL = "http://silverstage.alawiyeh.com/sync_temp_schedules.php"
 # SYNC_STATUS_API_URL = ""
 
-def sync_staff_data():
+class SyncReport:
+    """What one data sync changed locally, and when the server asked to be polled next"""
+    def __init__(self):
+        self.changed_staff_ids = set()
+        self.next_poll = None  # seconds, the smallest next_poll any endpoint sent
+
+    @property
+    def changed(self):
+        return bool(self.changed_staff_ids)
+
+    def note_response(self, data):
+        """Keep the optional next_poll hint (seconds) of an API response"""
+        try:
+            next_poll = float(data['next_poll'])
+        except (KeyError, TypeError, ValueError):
+            return
+        if next_poll > 0 and (self.next_poll is None or next_poll < self.next_poll):
+            self.next_poll = next_poll
+
+@timed("sync.staff", "Staff table sync")
+def sync_staff_data(report=None):
     """Sync staff data from the remote API to the local database."""
+    import requests
     if not is_internet_available():
         print("No internet connection. Skipping staff data sync.")
         return False
 
+    # Only the staff_id ranges that differ, when the server keeps hash trees
+    import merkle_sync
+    result = merkle_sync.sync_table("staff", report)
+    if result is not None:
+        return result
+
     try:
         response = requests.get(API_URL, timeout=10)
         response.raise_for_status()
         data = response.json()
 
         if data['status'] == 'success':
-            conn = sqlite3.connect(DB_FILE)
-
-            # Increase timeout to handle potential lock issues
-            conn.execute('PRAGMA busy_timeout = 5000')
-
-            cursor = conn.cursor()
-
-            try:
-                # Begin a transaction
-                conn.execute('BEGIN TRANSACTION')
-
-                # Fetch all local staff_ids
-                cursor.execute('SELECT staff_id, first_name, last_name FROM staff_tbl')
-                local_staff = cursor.fetchall()
-
-                local_staff_dict = {row[0]: (row[1], row[2]) for row in local_staff}
-                remote_staff_dict = {staff['staff_id']: (staff['first_name'], staff['last_name']) for staff in data['data']}
-
-                # Convert remote staff IDs to integers for consistency with local IDs
-                remote_staff_dict = {int(staff['staff_id']): (staff['first_name'], staff['last_name']) for staff in data['data']}
+            if report is not None:
+                report.note_response(data)
+            return apply_staff_data(data['data'], report)
 
-                # Insert or update staff from remote API
-                for staff_id, (first_name, last_name) in remote_staff_dict.items():
-                    cursor.execute('''
-                        INSERT INTO staff_tbl (staff_id, first_name, last_name)
-                        VALUES (?, ?, ?)
-                        ON CONFLICT(staff_id) 
-                        DO UPDATE SET first_name = excluded.first_name, last_name = excluded.last_name
-                        WHERE first_name != excluded.first_name OR last_name != excluded.last_name
-                    ''', (staff_id, first_name, last_name))
-
-                # Identify records that are in the local database but not in the remote data
-                local_staff_ids = set(local_staff_dict.keys())
-                remote_staff_ids = set(remote_staff_dict.keys())
-
-                # Calculate the difference between local and remote staff_ids
-                staff_ids_to_delete = local_staff_ids - remote_staff_ids
-
-                # Delete staff that are in local but not in remote
-                for staff_id in staff_ids_to_delete:
-                    cursor.execute('DELETE FROM staff_tbl WHERE staff_id = ?', (staff_id,))
+    except requests.RequestException as e:
+        print(f"Error syncing staff data: {str(e)}")
+    except sqlite3.Error as e:
+        print(f"Database error: {str(e)}")
+    except json.JSONDecodeError as e:
+        print(f"JSON decoding error: {str(e)}")
 
-                # Commit the transaction
-                conn.commit()
+    return False
 
-            except sqlite3.IntegrityError as e:
-                # Handle unique constraint failure or other integrity errors
-                print(f"Integrity error: {str(e)}")
-                conn.rollback()
-                return False
+def apply_staff_data(records, report=None, scope=None):
+    """
+    Reconcile the local staff table with the staff records returned by the API.
+    Added, renamed and deleted staff are noted in report, if given.
+    For a partial sync, scope(staff_id) tells which local staff the records
+    cover; staff outside it are never deleted.
+    """
+    conn = get_connection()
 
-            except sqlite3.Error as e:
-                # Rollback the transaction if any other database error occurs
-                conn.rollback()
-                print(f"Database error: {str(e)}")
-                return False
+    # Increase timeout to handle potential lock issues
+    conn.execute('PRAGMA busy_timeout = 5000')
 
-            finally:
-                # Always close the connection
-                conn.close()
+    cursor = conn.cursor()
 
-            return True
+    try:
+        # Take the write lock up front: a deferred transaction that reads first can't
+        # upgrade once a punch has committed meanwhile, and fails without waiting
+        conn.execute('BEGIN IMMEDIATE')
+
+        # Fetch all local staff_ids
+        cursor.execute('SELECT staff_id, first_name, last_name FROM staff_tbl')
+        local_staff = cursor.fetchall()
+
+        local_staff_dict = {row[0]: (row[1], row[2]) for row in local_staff}
+
+        # Convert remote staff IDs to integers for consistency with local IDs
+        remote_staff_dict = {int(staff['staff_id']): (staff['first_name'], staff['last_name']) for staff in records}
+
+        # Insert or update staff from remote API
+        for staff_id, (first_name, last_name) in remote_staff_dict.items():
+            cursor.execute('''
+                INSERT INTO staff_tbl (staff_id, first_name, last_name)
+                VALUES (?, ?, ?)
+                ON CONFLICT(staff_id) 
+                DO UPDATE SET first_name = excluded.first_name, last_name = excluded.last_name
+                WHERE first_name != excluded.first_name OR last_name != excluded.last_name
+            ''', (staff_id, first_name, last_name))
+            if cursor.rowcount and report is not None:
+                report.changed_staff_ids.add(staff_id)
+
+        # Identify records that are in the local database but not in the remote data
+        local_staff_ids = set(local_staff_dict.keys())
+        remote_staff_ids = set(remote_staff_dict.keys())
+
+        # Calculate the difference between local and remote staff_ids
+        staff_ids_to_delete = local_staff_ids - remote_staff_ids
+        if scope is not None:
+            staff_ids_to_delete = {staff_id for staff_id in staff_ids_to_delete if scope(staff_id)}
+
+        # Delete staff that are in local but not in remote
+        for staff_id in staff_ids_to_delete:
+            cursor.execute('DELETE FROM staff_tbl WHERE staff_id = ?', (staff_id,))
+
+        # New staff need materialized schedules, deleted staff lose theirs; renames don't matter
+        effective_schedule.rebuild_staff(cursor, (remote_staff_ids - local_staff_ids) | staff_ids_to_delete)
+        if report is not None:
+            report.changed_staff_ids.update(staff_ids_to_delete)
+
+        # Commit the transaction
+        conn.commit()
+
+    except sqlite3.IntegrityError as e:
+        # Handle unique constraint failure or other integrity errors
+        print(f"Integrity error: {str(e)}")
+        conn.rollback()
+        return False
 
-    except requests.RequestException as e:
-        print(f"Error syncing staff data: {str(e)}")
     except sqlite3.Error as e:
+        # Rollback the transaction if any other database error occurs
+        conn.rollback()
         print(f"Database error: {str(e)}")
-    except json.JSONDecodeError as e:
-        print(f"JSON decoding error: {str(e)}")
+        return False
 
-    return False
+    finally:
+        # Always close the connection
+        conn.close()
+
+    return True
 
-def sync_schedule_data():
+@timed("sync.schedule", "Weekly schedule sync")
+def sync_schedule_data(report=None):
     """Sync all schedule data from the remote API to the local database."""
+    import requests
     if not is_internet_available():
         print("No internet connection. Skipping schedule data sync.")
         return False
 
+    import merkle_sync
+    result = merkle_sync.sync_table("schedule", report)
+    if result is not None:
+        return result
+
     try:
         # Fetch all schedule records from the remote API
         response = requests.get(SCHEDULES_API_URL, timeout=10)
@@ -106,66 +162,9 @@ def sync_schedule_data():
         data = response.json()
 
         if data['status'] == 'success':
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-
-            # Step 1: Fetch all local schedule data
-            cursor.execute('SELECT staff_id, day_of_week FROM staff_schedule')
-            local_schedule_data = cursor.fetchall()
-            local_schedule_dict = {(int(staff_id), int(day_of_week)) for staff_id, day_of_week in local_schedule_data}
-
-            # Step 2: Prepare remote schedule data and track keys
-            remote_schedule_dict = set()
-
-            for schedule in data['data']:
-                staff_id = int(schedule['staff_id'])
-                day_of_week = int(schedule['work_day'])
-
-                remote_schedule_dict.add((staff_id, day_of_week))
-
-                # Check if the staff_id and day_of_week exists in the local schedule
-                cursor.execute('SELECT COUNT(1) FROM staff_schedule WHERE staff_id = ? AND day_of_week = ?', (staff_id, day_of_week))
-                exists = cursor.fetchone()[0]
-
-                if exists:
-                    # Update the existing record
-                    cursor.execute('''
-                        UPDATE staff_schedule
-                        SET scheduled_in = ?, scheduled_out = ?, day_off = ?, open_schedule = ?
-                        WHERE staff_id = ? AND day_of_week = ?
-                    ''', (
-                        schedule['start_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
-                        schedule['end_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
-                        int(schedule['day_off']),
-                        int(schedule['open_schedule']),
-                        staff_id,
-                        day_of_week
-                    ))
-                else:
-                    # Insert new record if staff_id and day_of_week combination does not exist
-                    cursor.execute('''
-                        INSERT INTO staff_schedule (staff_id, day_of_week, scheduled_in, scheduled_out, day_off, open_schedule)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        staff_id,
-                        day_of_week,
-                        schedule['start_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
-                        schedule['end_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
-                        int(schedule['day_off']),
-                        int(schedule['open_schedule'])
-                    ))
-
-            # Step 3: Identify records that are in the local database but not in the remote data
-            records_to_delete = local_schedule_dict - remote_schedule_dict
-
-            # Step 4: Delete records that are in local but not in remote
-            for staff_id, day_of_week in records_to_delete:
-                cursor.execute('DELETE FROM staff_schedule WHERE staff_id = ? AND day_of_week = ?', (staff_id, day_of_week))
-
-            # Commit the changes to the local database
-            conn.commit()
-            conn.close()
-            return True
+            if report is not None:
+                report.note_response(data)
+            return apply_schedule_data(data['data'], report)
 
     except requests.RequestException as e:
         print(f"Error syncing schedule data: {str(e)}")
@@ -180,87 +179,192 @@ def sync_schedule_data():
 
     return False
 
+def apply_schedule_data(records, report=None, scope=None):
+    """
+    Reconcile the local weekly schedules with the schedule records returned by the API.
+    Staff whose week changed are noted in report, if given. With scope, only
+    local schedules of the staff it accepts are deleted (see apply_staff_data).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
 
-def sync_temp_schedule_data():
+    try:
+        # Step 1: Fetch all local schedule data
+        cursor.execute('SELECT staff_id, day_of_week, scheduled_in, scheduled_out, day_off, open_schedule FROM staff_schedule')
+        local_schedule_data = cursor.fetchall()
+        local_schedule_dict = {(int(row[0]), int(row[1])) for row in local_schedule_data}
+        local_schedule_values = {(int(row[0]), int(row[1])): tuple(row[2:]) for row in local_schedule_data}
+
+        # Step 2: Prepare remote schedule data and track keys
+        remote_schedule_dict = set()
+        changed_days = {}  # day_of_week -> staff whose materialized schedules must be rebuilt
+
+        for schedule in records:
+            staff_id = int(schedule['staff_id'])
+            day_of_week = int(schedule['work_day'])
+
+            remote_schedule_dict.add((staff_id, day_of_week))
+
+            # Times are only kept for regular working days
+            values = (
+                schedule['start_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
+                schedule['end_time'] if not int(schedule['day_off']) and not int(schedule['open_schedule']) else None,
+                int(schedule['day_off']),
+                int(schedule['open_schedule'])
+            )
+            if local_schedule_values.get((staff_id, day_of_week)) != values:
+                changed_days.setdefault(day_of_week, set()).add(staff_id)
+
+            # Check if the staff_id and day_of_week exists in the local schedule
+            cursor.execute('SELECT COUNT(1) FROM staff_schedule WHERE staff_id = ? AND day_of_week = ?', (staff_id, day_of_week))
+            exists = cursor.fetchone()[0]
+
+            if exists:
+                # Update the existing record
+                cursor.execute('''
+                    UPDATE staff_schedule
+                    SET scheduled_in = ?, scheduled_out = ?, day_off = ?, open_schedule = ?
+                    WHERE staff_id = ? AND day_of_week = ?
+                ''', (*values, staff_id, day_of_week))
+            else:
+                # Insert new record if staff_id and day_of_week combination does not exist
+                cursor.execute('''
+                    INSERT INTO staff_schedule (staff_id, day_of_week, scheduled_in, scheduled_out, day_off, open_schedule)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (staff_id, day_of_week, *values))
+
+        # Step 3: Identify records that are in the local database but not in the remote data
+        records_to_delete = local_schedule_dict - remote_schedule_dict
+        if scope is not None:
+            records_to_delete = {key for key in records_to_delete if scope(key[0])}
+
+        # Step 4: Delete records that are in local but not in remote
+        for staff_id, day_of_week in records_to_delete:
+            cursor.execute('DELETE FROM staff_schedule WHERE staff_id = ? AND day_of_week = ?', (staff_id, day_of_week))
+            changed_days.setdefault(day_of_week, set()).add(staff_id)
+
+        # Step 5: Re-resolve the materialized schedules only on the weekdays that changed
+        for day_of_week, staff_ids in changed_days.items():
+            effective_schedule.rebuild_staff(cursor, staff_ids, day_of_week)
+            if report is not None:
+                report.changed_staff_ids.update(staff_ids)
+
+        # Commit the changes to the local database
+        conn.commit()
+    finally:
+        conn.close()
+
+    return True
+
+
+@timed("sync.temp_schedule", "Temporary schedule sync")
+def sync_temp_schedule_data(report=None):
     """Sync staff data from the remote API to the local database."""
+    import requests
     if not is_internet_available():
         print("No internet connection. Skipping staff data sync.")
         return False
 
+    import merkle_sync
+    result = merkle_sync.sync_table("temp_schedule", report)
+    if result is not None:
+        return result
+
     try:
         response = requests.get(TEMP_SCHEDULES_API_URL, timeout=5000)
         response.raise_for_status()
         data = response.json()
 
         if data['status'] == 'success':
-            conn = sqlite3.connect(DB_FILE)
-
-            # Increase timeout to handle potential lock issues
-            conn.execute('PRAGMA busy_timeout = 5000')
-
-            cursor = conn.cursor()
-
-            try:
-                # Begin a transaction
-                conn.execute('BEGIN TRANSACTION')
-
-                # Fetch all local temp schedule
-                cursor.execute('SELECT staff_id, scheduled_in, scheduled_out, day_off, open_schedule FROM temp_schedule')
-                local_temp_schedule = cursor.fetchall()
-
-                local_temp_schedule_dict = {row[0]: (row[1], row[2], row[3], row[4]) for row in local_temp_schedule}
-                remote_temp_schedule_dict = {staff['staff_id']: (staff['scheduled_in'], staff['scheduled_out'], staff['day_off'], staff['open_schedule']) for staff in data['data']}
+            if report is not None:
+                report.note_response(data)
+            return apply_temp_schedule_data(data['data'], report)
 
-                # Convert remote staff IDs to integers for consistency with local IDs
-                remote_temp_schedule_dict = {int(staff['staff_id']): (staff['scheduled_in'], staff['scheduled_out'], staff['day_off'], staff['open_schedule']) for staff in data['data']}
-
-                # Insert or update staff from remote API
-                for staff_id, (scheduled_in, scheduled_out, day_off, open_schedule) in remote_temp_schedule_dict.items():
-                    cursor.execute('''
-                        INSERT INTO temp_schedule (staff_id, scheduled_in, scheduled_out, day_off, open_schedule)
-                        VALUES (?, ?, ?, ?, ?)
-                        ON CONFLICT(staff_id) 
-                        DO UPDATE SET scheduled_in = excluded.scheduled_in, scheduled_out = excluded.scheduled_out, day_off = excluded.day_off, open_schedule = excluded.open_schedule
-                        WHERE scheduled_in != excluded.scheduled_in OR scheduled_out != excluded.scheduled_out OR day_off != excluded.day_off OR open_schedule != excluded.open_schedule
-                    ''', (staff_id, scheduled_in, scheduled_out, day_off, open_schedule))
-
-                # Identify records that are in the local database but not in the remote data
-                local_staff_ids = set(local_temp_schedule_dict.keys())
-                remote_staff_ids = set(remote_temp_schedule_dict.keys())
-
-                # Calculate the difference between local and remote staff_ids
-                staff_ids_to_delete = local_staff_ids - remote_staff_ids
-
-                # Delete staff that are in local but not in remote
-                for staff_id in staff_ids_to_delete:
-                    cursor.execute('DELETE FROM temp_schedule WHERE staff_id = ?', (staff_id,))
+    except requests.RequestException as e:
+        print(f"Error syncing staff data: {str(e)}")
+    except sqlite3.Error as e:
+        print(f"Database error: {str(e)}")
+    except json.JSONDecodeError as e:
+        print(f"JSON decoding error: {str(e)}")
 
-                # Commit the transaction
-                conn.commit()
+    return False
 
-            except sqlite3.IntegrityError as e:
-                # Handle unique constraint failure or other integrity errors
-                print(f"Integrity error: {str(e)}")
-                conn.rollback()
-                return False
+def apply_temp_schedule_data(records, report=None, scope=None):
+    """
+    Reconcile the local temporary schedules with the records returned by the API.
+    Staff whose temporary schedule changed are noted in report, if given. With
+    scope, only local rows of the staff it accepts are deleted (see apply_staff_data).
+    """
+    conn = get_connection()
 
-            except sqlite3.Error as e:
-                # Rollback the transaction if any other database error occurs
-                conn.rollback()
-                print(f"Database error: {str(e)}")
-                return False
+    # Increase timeout to handle potential lock issues
+    conn.execute('PRAGMA busy_timeout = 5000')
 
-            finally:
-                # Always close the connection
-                conn.close()
+    cursor = conn.cursor()
 
-            return True
+    try:
+        # Take the write lock up front: a deferred transaction that reads first can't
+        # upgrade once a punch has committed meanwhile, and fails without waiting
+        conn.execute('BEGIN IMMEDIATE')
+
+        # Fetch all local temp schedule
+        cursor.execute('SELECT staff_id, scheduled_in, scheduled_out, day_off, open_schedule FROM temp_schedule')
+        local_temp_schedule = cursor.fetchall()
+
+        local_temp_schedule_dict = {row[0]: (row[1], row[2], row[3], row[4]) for row in local_temp_schedule}
+
+        # Convert remote staff IDs to integers for consistency with local IDs
+        remote_temp_schedule_dict = {int(staff['staff_id']): (staff['scheduled_in'], staff['scheduled_out'], staff['day_off'], staff['open_schedule']) for staff in records}
+
+        changed_staff_ids = set()  # Staff whose materialized schedules must be rebuilt
+
+        # Insert or update staff from remote API
+        for staff_id, (scheduled_in, scheduled_out, day_off, open_schedule) in remote_temp_schedule_dict.items():
+            cursor.execute('''
+                INSERT INTO temp_schedule (staff_id, scheduled_in, scheduled_out, day_off, open_schedule)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(staff_id) 
+                DO UPDATE SET scheduled_in = excluded.scheduled_in, scheduled_out = excluded.scheduled_out, day_off = excluded.day_off, open_schedule = excluded.open_schedule
+                WHERE scheduled_in != excluded.scheduled_in OR scheduled_out != excluded.scheduled_out OR day_off != excluded.day_off OR open_schedule != excluded.open_schedule
+            ''', (staff_id, scheduled_in, scheduled_out, day_off, open_schedule))
+            # Nothing is written when the row is unchanged
+            if cursor.rowcount:
+                changed_staff_ids.add(staff_id)
+
+        # Identify records that are in the local database but not in the remote data
+        local_staff_ids = set(local_temp_schedule_dict.keys())
+        remote_staff_ids = set(remote_temp_schedule_dict.keys())
+
+        # Calculate the difference between local and remote staff_ids
+        staff_ids_to_delete = local_staff_ids - remote_staff_ids
+        if scope is not None:
+            staff_ids_to_delete = {staff_id for staff_id in staff_ids_to_delete if scope(staff_id)}
+
+        # Delete staff that are in local but not in remote
+        for staff_id in staff_ids_to_delete:
+            cursor.execute('DELETE FROM temp_schedule WHERE staff_id = ?', (staff_id,))
+
+        effective_schedule.rebuild_staff(cursor, changed_staff_ids | staff_ids_to_delete)
+        if report is not None:
+            report.changed_staff_ids.update(changed_staff_ids | staff_ids_to_delete)
+
+        # Commit the transaction
+        conn.commit()
+
+    except sqlite3.IntegrityError as e:
+        # Handle unique constraint failure or other integrity errors
+        print(f"Integrity error: {str(e)}")
+        conn.rollback()
+        return False
 
-    except requests.RequestException as e:
-        print(f"Error syncing staff data: {str(e)}")
     except sqlite3.Error as e:
+        # Rollback the transaction if any other database error occurs
+        conn.rollback()
         print(f"Database error: {str(e)}")
-    except json.JSONDecodeError as e:
-        print(f"JSON decoding error: {str(e)}")
+        return False
+
+    finally:
+        # Always close the connection
+        conn.close()
 
-    return False
\ No newline at end of file
+    return True
\ No newline at end of file
@@ -0,0 +1,192 @@
+# db_trace.py opt-in slow query tracing for the SQLite connections
+#
+# Enable with ATTENDANCE_SQL_TRACE=1. Statements slower than ATTENDANCE_SQL_TRACE_MS
+# (default 50) are written to sql_trace.log with their parameters, the statements the
+# engine actually ran (trigger bodies included), EXPLAIN QUERY PLAN and an estimate of
+# the time spent waiting for the database lock. For SELECTs the timing covers execute(),
+# which runs up to the first row (the whole sort for ORDER BY), not the later fetches.
+import os
+import sqlite3
+import threading
+import time
+
+ENV_FLAG = "ATTENDANCE_SQL_TRACE"
+ENV_THRESHOLD = "ATTENDANCE_SQL_TRACE_MS"
+TRACE_LOG_FILE = "sql_trace.log"
+TRACE_LOG_MAX_BYTES = 2 * 1024 * 1024
+TRACE_LOG_BACKUPS = 3
+DEFAULT_THRESHOLD_MS = 50.0
+PROGRESS_STEPS = 1000  # VM instructions between progress callbacks
+LOCK_GAP_MS = 5.0      # callback gaps longer than this are counted as lock wait
+MAX_TRACED_STATEMENTS = 20
+
+# Statements that have no query plan worth logging
+_NO_PLAN_PREFIXES = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "CREATE", "DROP", "ALTER", "ANALYZE", "VACUUM")
+
+_enabled = os.environ.get(ENV_FLAG) == "1"
+_threshold_ms = float(os.environ.get(ENV_THRESHOLD, DEFAULT_THRESHOLD_MS))
+_logger = None
+_logger_lock = threading.Lock()
+
+def enable(threshold_ms=DEFAULT_THRESHOLD_MS, log_file=TRACE_LOG_FILE):
+    """Turn tracing on for connections opened from now on"""
+    global _enabled, _threshold_ms
+    _enabled = True
+    _threshold_ms = threshold_ms
+    _get_logger(log_file)
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def connect(database, **kwargs):
+    """sqlite3.connect, returning a TracingConnection when tracing is on"""
+    if not _enabled:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=TracingConnection, **kwargs)
+    conn.start_tracing()
+    return conn
+
+def _get_logger(log_file=TRACE_LOG_FILE):
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                # Imported here, so the tracing that is off by default costs nothing at startup
+                import logging
+                from logging.handlers import RotatingFileHandler
+
+                logger = logging.getLogger("attendance.sql")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(log_file, maxBytes=TRACE_LOG_MAX_BYTES,
+                                              backupCount=TRACE_LOG_BACKUPS)
+                handler.setFormatter(logging.Formatter("%(asctime)s [%(threadName)s] %(message)s"))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+class TracingConnection(sqlite3.Connection):
+    """Connection whose cursors time every statement and log the slow ones"""
+    def start_tracing(self):
+        self.traced_statements = []
+        self.traced_count = 0
+        self.last_traced = None
+        self.last_progress = None
+        self.lock_wait = 0.0
+        # Every statement the engine runs, with bound values expanded, including trigger bodies
+        self.set_trace_callback(self._on_trace)
+        # No VM instructions run while SQLite sleeps in the busy handler, so long gaps
+        # between progress callbacks are time spent waiting for the lock
+        self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracingCursor)
+
+    # The C shortcuts create plain cursors, so route them through ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        self._begin_measure()
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            self._finish_measure("COMMIT", (), start)
+
+    def _on_trace(self, statement):
+        # Trigger steps report the statement that fired them; log it once
+        if statement == self.last_traced:
+            return
+        self.last_traced = statement
+        # Bulk statements can run thousands of trigger bodies; keep only the first few
+        self.traced_count += 1
+        if len(self.traced_statements) < MAX_TRACED_STATEMENTS:
+            self.traced_statements.append(statement)
+
+    def _on_progress(self):
+        now = time.perf_counter()
+        if self.last_progress is not None and (now - self.last_progress) * 1000 > LOCK_GAP_MS:
+            self.lock_wait += now - self.last_progress
+        self.last_progress = now
+        return 0  # Never interrupt the statement
+
+    def _begin_measure(self):
+        self.traced_statements.clear()
+        self.traced_count = 0
+        self.last_traced = None
+        self.lock_wait = 0.0
+        self.last_progress = time.perf_counter()
+
+    def _finish_measure(self, sql, parameters, start, many=False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms < _threshold_ms:
+            return
+        # The gap from the last callback to the end counts too: COMMIT and
+        # lock acquisition at the start of a statement run few instructions
+        tail_gap_ms = (time.perf_counter() - self.last_progress) * 1000
+        lock_wait_ms = self.lock_wait * 1000 + (tail_gap_ms if tail_gap_ms > LOCK_GAP_MS else 0.0)
+
+        lines = [f"SLOW {elapsed_ms:.1f} ms (lock wait ~{min(lock_wait_ms, elapsed_ms):.1f} ms): {_compact(sql)}"]
+        if parameters:
+            shown = parameters[:5] if many else parameters
+            lines.append(f"  params{' (first 5 rows)' if many else ''}: {shown!r}")
+        for statement in self.traced_statements:
+            lines.append(f"  ran: {_compact(statement)}")
+        if self.traced_count > len(self.traced_statements):
+            lines.append(f"  ... {self.traced_count - len(self.traced_statements)} more statements")
+        lines.extend(f"  plan: {line}" for line in self._query_plan(sql, parameters[0] if many and parameters else parameters))
+        _get_logger().info("\n".join(lines))
+
+    def _query_plan(self, sql, parameters):
+        if sql.lstrip().upper().startswith(_NO_PLAN_PREFIXES):
+            return []
+        # A plain cursor so the EXPLAIN itself is neither timed nor traced
+        self.set_trace_callback(None)
+        try:
+            rows = sqlite3.Cursor(self).execute("EXPLAIN QUERY PLAN " + sql, parameters or ()).fetchall()
+            return [f"{'  ' * _plan_depth(rows, row)}{row[-1]}" for row in rows]
+        except sqlite3.Error as e:
+            return [f"unavailable ({str(e)})"]
+        finally:
+            self.set_trace_callback(self._on_trace)
+
+class TracingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        conn = self.connection
+        conn._begin_measure()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            conn._finish_measure(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        conn = self.connection
+        seq_of_parameters = list(seq_of_parameters)
+        conn._begin_measure()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            conn._finish_measure(sql, seq_of_parameters, start, many=True)
+
+def _compact(sql):
+    return " ".join(sql.split())
+
+def _plan_depth(rows, row):
+    """Nesting level of an EXPLAIN QUERY PLAN row from its parent links"""
+    parents = {r[0]: r[1] for r in rows}
+    depth = 0
+    parent = row[1]
+    while parent in parents and depth < 10:
+        depth += 1
+        parent = parents[parent]
+    return depth
@@ -0,0 +1,59 @@
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton
+from PyQt5.QtCore import Qt, QTimer
+import metrics
+
+class DiagnosticsDialog(QDialog):
+    """Live view of the metrics registry, opened from the tray menu"""
+    COLUMNS = ["Metric", "Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"]
+    REFRESH_INTERVAL = 2000  # milliseconds
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Silver Attendance - Diagnostics")
+        self.resize(800, 400)
+
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        export_button = QPushButton("Export now")
+        # clicked(bool) would pass checked in as json_path
+        export_button.clicked.connect(lambda: metrics.registry.export())
+        buttons.addWidget(export_button)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        # Keep the numbers live while the dialog is open
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(self.REFRESH_INTERVAL)
+        self.refresh()
+
+    def refresh(self):
+        """Reload all metrics into the table"""
+        snapshot = metrics.registry.snapshot()
+        self.table.setRowCount(len(snapshot))
+        for row, (name, values) in enumerate(snapshot.items()):
+            if values["type"] == "counter":
+                cells = [name, values["value"], "", "", "", "", ""]
+            else:
+                cells = [name, values["count"], values["mean_ms"], values["p50_ms"],
+                         values["p95_ms"], values["p99_ms"], values["max_ms"]]
+            for column, value in enumerate(cells):
+                item = QTableWidgetItem(f"{value:.1f}" if isinstance(value, float) else str(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        super().closeEvent(event)
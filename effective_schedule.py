@@ -0,0 +1,108 @@
+# effective_schedule.py materialized per-day schedules for a rolling window of dates
+#
+# The schedule in force for a staff member on a date is the temporary schedule
+# if there is one, else the weekly schedule for that weekday. Resolving that in
+# every roster query costs two joins and four COALESCEs, so sync writes the
+# result to effective_schedule for every date listed in effective_schedule_days.
+# Dates outside the window fall back to resolving the schedule on the fly.
+import sqlite3
+from datetime import date, timedelta
+from db_manager import get_connection
+from metrics import timed
+
+PAST_DAYS = 7       # materialized days before today, for recent reports
+FUTURE_DAYS = 14    # and after, which covers tomorrow's prefetched roster
+
+# SQLite's %w counts from Sunday; day_of_week counts from Monday like datetime.weekday()
+WEEKDAY = "(CAST(strftime('%w', days.schedule_date) AS INTEGER) + 6) % 7"
+
+MATERIALIZE_QUERY = '''
+    INSERT INTO effective_schedule (schedule_date, staff_id, scheduled_in, scheduled_out, day_off, open_schedule)
+    SELECT days.schedule_date, staff_tbl.staff_id,
+           COALESCE(temp_schedule.scheduled_in, staff_schedule.scheduled_in, ''),
+           COALESCE(temp_schedule.scheduled_out, staff_schedule.scheduled_out, ''),
+           COALESCE(temp_schedule.day_off, staff_schedule.day_off, 0),
+           COALESCE(temp_schedule.open_schedule, staff_schedule.open_schedule, 0)
+    FROM effective_schedule_days AS days
+    CROSS JOIN staff_tbl
+    LEFT JOIN staff_schedule ON staff_tbl.staff_id = staff_schedule.staff_id
+        AND staff_schedule.day_of_week = {weekday}
+    LEFT JOIN temp_schedule ON staff_tbl.staff_id = temp_schedule.staff_id
+    {{where}}
+'''.format(weekday=WEEKDAY)
+
+CHUNK_SIZE = 500  # Stay under SQLite's bound parameter limit
+
+def is_materialized(cursor, target_date):
+    """True if effective_schedule holds target_date"""
+    cursor.execute('SELECT 1 FROM effective_schedule_days WHERE schedule_date = ?', (target_date,))
+    return cursor.fetchone() is not None
+
+def rebuild_staff(cursor, staff_ids, day_of_week=None):
+    """
+    Re-resolve the schedules of the given staff for every materialized date,
+    or only the dates falling on day_of_week (0 is Monday) when given.
+    Runs on the caller's cursor so it commits with the sync that changed them.
+    Staff that no longer exist just lose their rows.
+    """
+    staff_ids = list(staff_ids)
+    if day_of_week is None:
+        dates, date_params = '', ()
+    else:
+        dates, date_params = f' AND {WEEKDAY} = ?', (day_of_week,)
+
+    for start in range(0, len(staff_ids), CHUNK_SIZE):
+        chunk = staff_ids[start:start + CHUNK_SIZE]
+        marks = ', '.join('?' * len(chunk))
+        cursor.execute(f'''
+            DELETE FROM effective_schedule WHERE staff_id IN ({marks})
+            AND schedule_date IN (SELECT schedule_date FROM effective_schedule_days AS days WHERE 1{dates})
+        ''', (*chunk, *date_params))
+        cursor.execute(MATERIALIZE_QUERY.format(where=f'WHERE staff_tbl.staff_id IN ({marks}){dates}'),
+                       (*chunk, *date_params))
+
+@timed("sync.effective_schedule", "Effective schedule window upkeep")
+def advance_window(today=None):
+    """
+    Materialize every date from PAST_DAYS before today to FUTURE_DAYS after it
+    and drop dates that fell out of the window. Only dates not already
+    materialized are computed, so this is cheap to call on every sync.
+    Returns the number of dates added.
+    """
+    if today is None:
+        today = date.today()
+    wanted = {(today + timedelta(days=offset)).strftime("%Y-%m-%d")
+              for offset in range(-PAST_DAYS, FUTURE_DAYS + 1)}
+
+    conn = get_connection()
+    conn.execute('PRAGMA busy_timeout = 5000')
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('SELECT schedule_date FROM effective_schedule_days')
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = sorted(wanted - existing)
+        expired = sorted(existing - wanted)
+        if not missing and not expired:
+            return 0
+
+        for schedule_date in expired:
+            cursor.execute('DELETE FROM effective_schedule WHERE schedule_date = ?', (schedule_date,))
+            cursor.execute('DELETE FROM effective_schedule_days WHERE schedule_date = ?', (schedule_date,))
+
+        if missing:
+            cursor.executemany('INSERT INTO effective_schedule_days (schedule_date) VALUES (?)',
+                               [(schedule_date,) for schedule_date in missing])
+            marks = ', '.join('?' * len(missing))
+            cursor.execute(MATERIALIZE_QUERY.format(where=f'WHERE days.schedule_date IN ({marks})'), missing)
+        conn.commit()
+        return len(missing)
+
+    except sqlite3.Error as e:
+        # The roster falls back to resolving schedules on the fly
+        conn.rollback()
+        print(f"Error materializing schedules: {str(e)}")
+        return 0
+
+    finally:
+        conn.close()
@@ -0,0 +1,253 @@
+# hub_client.py terminal side of the hub protocol
+import socket
+import threading
+import time
+from datetime import date
+
+import hub_protocol
+from hub_protocol import HubError
+from roster_row import RosterRow
+
+REQUEST_TIMEOUT = 5       # seconds
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)  # seconds between subscriber reconnect attempts
+
+class HubConnection:
+    """One authenticated request/response connection to the hub"""
+    def __init__(self, host, port, token="", timeout=REQUEST_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.next_id = 0
+        self.request("hello", token=token)
+
+    def request(self, op, **fields):
+        self.next_id += 1
+        self.sock.sendall(hub_protocol.encode({"id": self.next_id, "op": op, **fields}))
+        response = self.read()
+        if response.get("id") != self.next_id:
+            raise ConnectionError("Out of order response from the hub")
+        if not response.get("ok"):
+            raise HubError(response.get("error", "Hub request failed"))
+        return response
+
+    def read(self):
+        line = self.rfile.readline(hub_protocol.MAX_LINE)
+        if not line:
+            raise ConnectionError("Hub closed the connection")
+        return hub_protocol.decode(line)
+
+    def close(self):
+        try:
+            self.rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class HubClient:
+    """
+    Attendance store backed by a hub, for terminals.
+
+    Has the same roster and punch functions as db_functions so TableManager and
+    WorkTimeManager can use it in place of the local database. The roster of
+    each day is cached; pushes from the hub mark single rows stale (refetched
+    on the next read) or drop the whole cache. on_punched(staff_ids) and
+    on_reload() are called from the subscriber thread after the cache is updated.
+    """
+    def __init__(self, host, port=hub_protocol.HUB_PORT, token="", on_punched=None, on_reload=None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.on_punched = on_punched
+        self.on_reload = on_reload
+        self.connection = None
+        self.request_lock = threading.Lock()
+        # work_date -> {"order": [staff_id, ...], "rows": {staff_id: row}, "stale": set()}
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.subscriber_thread = None
+        self.subscriber_connection = None
+        self.running = False
+
+    def _request(self, op, **fields):
+        with self.request_lock:
+            # One retry on a fresh connection covers a hub restart between requests
+            for attempt in (1, 2):
+                try:
+                    if self.connection is None:
+                        self.connection = HubConnection(self.host, self.port, self.token)
+                    return self.connection.request(op, **fields)
+                except (OSError, ValueError) as e:
+                    if self.connection is not None:
+                        self.connection.close()
+                        self.connection = None
+                    if attempt == 2:
+                        raise ConnectionError(f"Hub {self.host}:{self.port} unreachable: {str(e)}")
+
+    def ping(self):
+        try:
+            self._request("ping")
+            return True
+        except (ConnectionError, HubError):
+            return False
+
+    def fetch_all_staff(self, target_date=None):
+        """Roster of a day, from the cache when the hub has not invalidated it"""
+        target_date = target_date or date.today().strftime("%Y-%m-%d")
+        with self.cache_lock:
+            entry = self.cache.get(target_date)
+            stale = set(entry["stale"]) if entry else None
+
+        if entry is None:
+            return self._fetch_roster(target_date)
+
+        if stale:
+            try:
+                rows = self._request("rows", staff_ids=sorted(stale), date=target_date)["rows"]
+                for staff_id, row in zip(sorted(stale), rows):
+                    self._store_row(target_date, staff_id, RosterRow(*row) if row is not None else None)
+            except ConnectionError as e:
+                print(f"Showing cached roster: {str(e)}")
+        with self.cache_lock:
+            entry = self.cache.get(target_date)
+            if entry is not None:
+                return [entry["rows"][staff_id] for staff_id in entry["order"] if staff_id in entry["rows"]]
+
+        # Someone was added or renamed, which changes the order: read the day whole, once
+        return self._fetch_roster(target_date)
+
+    def _fetch_roster(self, target_date):
+        rows = [RosterRow(*row) for row in self._request("roster", date=target_date)["rows"]]
+        with self.cache_lock:
+            self.cache[target_date] = {"order": [row[0] for row in rows],
+                                       "rows": {row[0]: row for row in rows}, "stale": set()}
+        return rows
+
+    def fetch_staff(self, staff_id, target_date=None):
+        target_date = target_date or date.today().strftime("%Y-%m-%d")
+        with self.cache_lock:
+            entry = self.cache.get(target_date)
+            if entry and staff_id in entry["rows"] and staff_id not in entry["stale"]:
+                return entry["rows"][staff_id]
+
+        row = self._request("row", staff_id=staff_id, date=target_date)["row"]
+        row = RosterRow(*row) if row is not None else None
+        self._store_row(target_date, staff_id, row)
+        return row
+
+    def _store_row(self, target_date, staff_id, row):
+        with self.cache_lock:
+            entry = self.cache.get(target_date)
+            if entry:
+                entry["stale"].discard(staff_id)
+                if row is None:
+                    entry["rows"].pop(staff_id, None)
+                elif row[1:3] != entry["rows"].get(staff_id, (None,) * 3)[1:3]:
+                    # New or renamed staff change the order; refetch the day on the next read
+                    del self.cache[target_date]
+                else:
+                    entry["rows"][staff_id] = row
+
+    def update_work_in(self, staff_id, work_in_time, current_date):
+        self._request("punch", staff_id=staff_id, punch_type="in", time=work_in_time, date=current_date)
+        self._mark_stale([staff_id], current_date)
+
+    def update_work_off(self, staff_id, work_off_time, current_date):
+        self._request("punch", staff_id=staff_id, punch_type="off", time=work_off_time, date=current_date)
+        self._mark_stale([staff_id], current_date)
+
+    def record_punches(self, staff_ids, punch_time, work_date):
+        results = self._request("punches", staff_ids=list(staff_ids), time=punch_time, date=work_date)["results"]
+        self._mark_stale([staff_id for staff_id, punch_type in results if punch_type], work_date)
+        return [tuple(result) for result in results]
+
+    def fetch_grid_staff(self):
+        return [tuple(row) for row in self._request("grid_staff")["rows"]]
+
+    def fetch_attendance_range(self, start_date, end_date):
+        """Not cached: the attendance grid keeps its own blocks"""
+        return [tuple(row) for row in self._request("attendance_range", start=start_date, end=end_date)["rows"]]
+
+    def fetch_arrivals(self, start_date, end_date):
+        return [tuple(row) for row in self._request("arrivals", start=start_date, end=end_date)["rows"]]
+
+    def sync_data(self, app_time):
+        """
+        Terminals don't talk to the remote API; the hub syncs for everyone.
+        A periodic sync drops the cache so the roster is re-read from the hub,
+        in case a push was lost. Returns False if the hub is unreachable.
+        """
+        if not self.ping():
+            return False
+        self._drop_cache()
+        return True
+
+    def _mark_stale(self, staff_ids, work_date):
+        with self.cache_lock:
+            entry = self.cache.get(work_date)
+            if entry:
+                entry["stale"].update(staff_ids)
+
+    def _drop_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+    def start(self):
+        """Subscribe to the hub's invalidations in the background"""
+        self.running = True
+        self.subscriber_thread = threading.Thread(target=self._subscriber_loop, name="hub-subscriber", daemon=True)
+        self.subscriber_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.subscriber_connection is not None:
+            try:
+                self.subscriber_connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self.request_lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+        if self.subscriber_thread is not None:
+            self.subscriber_thread.join(timeout=REQUEST_TIMEOUT)
+
+    def _subscriber_loop(self):
+        failures = 0
+        while self.running:
+            try:
+                connection = HubConnection(self.host, self.port, self.token)
+                self.subscriber_connection = connection
+                connection.request("subscribe")
+                connection.sock.settimeout(None)  # Pushes can be hours apart
+                if failures:
+                    # Pushes may have been missed while disconnected
+                    print("Reconnected to the hub")
+                    self._handle_push({"push": "reload"})
+                failures = 0
+                while self.running:
+                    self._handle_push(connection.read())
+            except (OSError, ValueError, HubError) as e:
+                if not self.running:
+                    break
+                delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+                failures += 1
+                print(f"Hub subscription lost ({str(e)}), retrying in {delay} s")
+                time.sleep(delay)
+            finally:
+                if self.subscriber_connection is not None:
+                    self.subscriber_connection.close()
+                    self.subscriber_connection = None
+
+    def _handle_push(self, message):
+        push = message.get("push")
+        try:
+            if push == "punched":
+                self._mark_stale(message["staff_ids"], message["date"])
+                if self.on_punched:
+                    self.on_punched(message["staff_ids"])
+            elif push == "reload":
+                self._drop_cache()
+                if self.on_reload:
+                    self.on_reload()
+        except Exception as e:
+            print(f"Error handling hub push: {str(e)}")
@@ -0,0 +1,87 @@
+# hub_protocol.py wire format and settings shared by the hub and its terminals
+#
+# One JSON object per line over TCP. Requests carry an "op" and an "id" that the
+# response echoes; subscribed connections also receive "push" messages.
+#
+#   {"id": 1, "op": "hello", "token": "..."}               -> {"id": 1, "ok": true}
+#   {"id": 2, "op": "roster", "date": "2024-05-01"}        -> {"id": 2, "ok": true, "rows": [[...], ...]}
+#   {"id": 3, "op": "row", "staff_id": 12, "date": "..."}  -> {"id": 3, "ok": true, "row": [...] or null}
+#   {"id": 3, "op": "rows", "staff_ids": [12, 40], "date": "..."} -> {"id": 3, "ok": true, "rows": [[...], null]}
+#   {"id": 3, "op": "grid_staff"}                          -> {"id": 3, "ok": true, "rows": [[12, "first", "last"], ...]}
+#   {"id": 3, "op": "attendance_range", "start": "...", "end": "..."}
+#                                                          -> {"id": 3, "ok": true, "rows": [[12, date, in, off, hours], ...]}
+#   {"id": 3, "op": "arrivals", "start": "...", "end": "..."}
+#                                                          -> {"id": 3, "ok": true, "rows": [[12, date, minutes late], ...]}
+#   {"id": 4, "op": "punch", "staff_id": 12, "punch_type": "in", "time": "08:00:00", "date": "..."}
+#   {"id": 5, "op": "punches", "staff_ids": [12, 40], "time": "...", "date": "..."}
+#                                                          -> {"id": 5, "ok": true, "results": [[12, "in"], ...]}
+#   {"id": 6, "op": "subscribe"}                           -> {"id": 6, "ok": true}, then pushes:
+#       {"push": "punched", "date": "...", "staff_ids": [12]}   rows of that day changed
+#       {"push": "reload"}                                      staff or schedules changed, drop everything
+#
+# Errors are {"id": n, "ok": false, "error": "message"}.
+import hmac
+import ipaddress
+import json
+import os
+import sqlite3
+
+HUB_PORT = 8766
+MODE_ENV = "ATTENDANCE_MODE"     # standalone (default), hub or terminal
+HUB_ENV = "ATTENDANCE_HUB"       # host:port the hub listens on (default loopback only), or that terminals connect to
+TOKEN_ENV = "ATTENDANCE_HUB_TOKEN"  # shared secret checked on hello; required for a hub listening beyond loopback
+
+STANDALONE = "standalone"
+HUB = "hub"
+TERMINAL = "terminal"
+MODES = (STANDALONE, HUB, TERMINAL)
+
+MAX_LINE = 4 * 1024 * 1024  # A full roster fits comfortably
+
+class HubError(Exception):
+    """The hub rejected a request"""
+
+# What reading a store can raise, whether it is the local database or the hub
+LOAD_ERRORS = (sqlite3.Error, ConnectionError, OSError, HubError)
+
+def encode(message):
+    """Serialize a message as one compact JSON line"""
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+def decode(line):
+    return json.loads(line)
+
+def get_mode():
+    mode = os.environ.get(MODE_ENV, STANDALONE).strip().lower()
+    if mode not in MODES:
+        print(f"Unknown {MODE_ENV} '{mode}', running standalone")
+        return STANDALONE
+    return mode
+
+def hub_address(default_host="127.0.0.1"):
+    """(host, port) from ATTENDANCE_HUB, which may omit either part"""
+    value = os.environ.get(HUB_ENV, "").strip()
+    host, _, port = value.rpartition(":") if ":" in value else (value, "", "")
+    try:
+        return host or default_host, int(port) if port else HUB_PORT
+    except ValueError:
+        print(f"Invalid {HUB_ENV} '{value}', using {default_host}:{HUB_PORT}")
+        return default_host, HUB_PORT
+
+def hub_token():
+    return os.environ.get(TOKEN_ENV, "")
+
+def is_loopback(host):
+    """True for addresses only this machine can reach; hostnames other than localhost count as remote"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def token_matches(expected, given):
+    """Constant-time token check"""
+    if not isinstance(given, str):
+        return False
+    return hmac.compare_digest(expected.encode(), given.encode())
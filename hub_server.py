@@ -0,0 +1,252 @@
+# hub_server.py serves the authoritative attendance database to LAN terminals
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import db_functions
+import hub_protocol
+
+SUBSCRIBER_SEND_TIMEOUT = 2  # seconds before a stuck terminal is dropped
+LISTEN_BACKLOG = 64
+
+class HubTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+class Subscriber:
+    """A terminal connection that receives push messages"""
+    def __init__(self, connection, address):
+        self.connection = connection
+        self.address = address
+        self.lock = threading.Lock()
+
+    def send(self, data):
+        with self.lock:
+            self.connection.sendall(data)
+
+class HubServer:
+    """
+    Owns attendance.db for a group of terminals.
+
+    Terminals read the roster and write punches through the hub, so a staff
+    member can punch in at one entrance and off at another and still end up
+    with one record. After every change the hub pushes an invalidation to the
+    subscribed terminals, which refetch only the affected rows.
+
+    Punches from terminals are reported through on_recorded(staff_ids), called
+    from a connection thread, so the hub's own window can refresh those rows.
+    Changes made on the hub itself are announced with notify_punches() and
+    notify_reload().
+
+    Without a token the hub only listens on loopback: anyone who can reach
+    it may read the roster and record punches.
+    """
+    def __init__(self, on_recorded=None, host="127.0.0.1", port=hub_protocol.HUB_PORT, token=""):
+        self.on_recorded = on_recorded
+        self.host = host
+        self.port = port
+        self.token = token
+        self.server = None
+        self.thread = None
+        self.subscribers = set()
+        self.subscribers_lock = threading.Lock()
+        # One writer at a time; concurrent SQLite writers back off in the busy handler for tens of ms
+        self.write_lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        """Start listening. Returns False if the port is unavailable or the hub would be open to the LAN."""
+        if not self.token and not hub_protocol.is_loopback(self.host):
+            print(f"Hub not started: listening on {self.host} needs {hub_protocol.TOKEN_ENV} set")
+            return False
+        try:
+            self.server = HubTCPServer((self.host, self.port), self._handler_class())
+        except OSError as e:
+            print(f"Hub could not listen on {self.host}:{self.port}: {str(e)}")
+            return False
+
+        self.port = self.server.server_address[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="hub-server", daemon=True)
+        self.thread.start()
+        print(f"Hub serving terminals on {self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.server.shutdown()
+        self.server.server_close()
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+        for subscriber in subscribers:
+            try:
+                subscriber.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.thread.join(timeout=5)
+
+    def notify_punches(self, staff_ids, work_date):
+        """Tell the terminals that these rows of work_date changed"""
+        self._broadcast({"push": "punched", "date": work_date, "staff_ids": list(dict.fromkeys(staff_ids))})
+
+    def notify_reload(self):
+        """Tell the terminals to drop their cached roster, e.g. after a data sync"""
+        self._broadcast({"push": "reload"})
+
+    def _broadcast(self, message):
+        data = hub_protocol.encode(message)
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.send(data)
+            except OSError as e:
+                # The terminal resubscribes and reloads when it reconnects
+                print(f"Dropping hub subscriber {subscriber.address}: {str(e)}")
+                self._remove_subscriber(subscriber)
+                try:
+                    subscriber.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _remove_subscriber(self, subscriber):
+        with self.subscribers_lock:
+            self.subscribers.discard(subscriber)
+
+    def _recorded(self, staff_ids, work_date):
+        self.notify_punches(staff_ids, work_date)
+        if self.on_recorded:
+            try:
+                self.on_recorded(staff_ids)
+            except Exception as e:
+                print(f"Error notifying hub listeners: {str(e)}")
+
+    def handle_request(self, message):
+        """Run one request and return the response body"""
+        op = message.get("op")
+        if op == "ping":
+            return {}
+        if op == "roster":
+            return {"rows": [list(row) for row in db_functions.fetch_all_staff(message["date"])]}
+        if op == "row":
+            row = db_functions.fetch_staff(int(message["staff_id"]), message["date"])
+            return {"row": list(row) if row is not None else None}
+        if op == "rows":
+            staff_ids = [int(staff_id) for staff_id in message["staff_ids"]]
+            rows = db_functions.fetch_staff_rows(staff_ids, message["date"])
+            return {"rows": [list(rows[staff_id]) if staff_id in rows else None for staff_id in staff_ids]}
+        if op == "grid_staff":
+            return {"rows": [list(row) for row in db_functions.fetch_grid_staff()]}
+        if op == "attendance_range":
+            return {"rows": [list(row) for row in db_functions.fetch_attendance_range(message["start"], message["end"])]}
+        if op == "arrivals":
+            return {"rows": [list(row) for row in db_functions.fetch_arrivals(message["start"], message["end"])]}
+        if op == "punch":
+            staff_id = int(message["staff_id"])
+            with self.write_lock:
+                if message["punch_type"] == "in":
+                    db_functions.update_work_in(staff_id, message["time"], message["date"])
+                elif message["punch_type"] == "off":
+                    db_functions.update_work_off(staff_id, message["time"], message["date"])
+                else:
+                    raise ValueError(f"Unknown punch type {message['punch_type']!r}")
+            self._recorded([staff_id], message["date"])
+            return {}
+        if op == "punches":
+            with self.write_lock:
+                results = db_functions.record_punches([int(staff_id) for staff_id in message["staff_ids"]],
+                                                      message["time"], message["date"])
+            recorded = [staff_id for staff_id, punch_type in results if punch_type]
+            if recorded:
+                self._recorded(recorded, message["date"])
+            return {"results": results}
+        raise ValueError(f"Unknown op {op!r}")
+
+    def _handler_class(self):
+        hub = self
+
+        class HubRequestHandler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                subscriber = None
+                authenticated = not hub.token
+                try:
+                    while hub.running:
+                        line = self.rfile.readline(hub_protocol.MAX_LINE)
+                        if not line:
+                            break
+                        try:
+                            message = hub_protocol.decode(line)
+                            request_id = message.get("id")
+                        except (ValueError, AttributeError) as e:
+                            self._reply({"ok": False, "error": f"Invalid message: {str(e)}"})
+                            continue
+
+                        if message.get("op") == "hello":
+                            authenticated = not hub.token or hub_protocol.token_matches(hub.token, message.get("token"))
+                            self._reply({"id": request_id, "ok": authenticated,
+                                         **({} if authenticated else {"error": "Invalid token"})})
+                            continue
+                        if not authenticated:
+                            self._reply({"id": request_id, "ok": False, "error": "Not authenticated"})
+                            break
+
+                        if message.get("op") == "subscribe":
+                            # Replies and pushes share the socket from here on
+                            subscriber = Subscriber(self.connection, self.client_address)
+                            self.connection.settimeout(SUBSCRIBER_SEND_TIMEOUT)
+                            subscriber.send(hub_protocol.encode({"id": request_id, "ok": True}))
+                            with hub.subscribers_lock:
+                                hub.subscribers.add(subscriber)
+                            self._wait_for_close()
+                            break
+
+                        try:
+                            response = {"id": request_id, "ok": True, **hub.handle_request(message)}
+                        except Exception as e:
+                            response = {"id": request_id, "ok": False, "error": str(e)}
+                        self._reply(response)
+                except OSError:
+                    pass
+                finally:
+                    if subscriber is not None:
+                        hub._remove_subscriber(subscriber)
+
+            def _wait_for_close(self):
+                # Subscribers don't send anything else; block until they hang up
+                while hub.running:
+                    try:
+                        if not self.connection.recv(1024):
+                            return
+                    except socket.timeout:
+                        continue
+
+            def _reply(self, message):
+                self.wfile.write(hub_protocol.encode(message))
+                self.wfile.flush()
+
+        return HubRequestHandler
+
+def main():
+    """Run a hub without a window, serving attendance.db in the current directory"""
+    import db_manager
+    db_manager.init_db()
+    host, port = hub_protocol.hub_address()
+    hub = HubServer(host=host, port=port, token=hub_protocol.hub_token())
+    if not hub.start():
+        sys.exit(1)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        hub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# import_profiler.py per-stage import timing, similar to python -X importtime
+import atexit
+import builtins
+import os
+import sys
+import threading
+import time
+
+ENV_FLAG = "ATTENDANCE_PROFILE_IMPORTS"
+ARG_FLAG = "--profile-imports"
+
+class ImportProfiler:
+    """
+    Times every first-time import and attributes it to the current loading stage.
+
+    Wraps builtins.__import__, so only imports that actually load a module are
+    timed. Self time excludes nested imports, cumulative time includes them.
+    Imports done later from worker threads are attributed to whatever stage is
+    current at that moment.
+    """
+    def __init__(self):
+        self.stage = "app-imports"
+        self.records = []  # (stage, module, self_ms, cumulative_ms)
+        self._original_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def set_stage(self, name):
+        self.stage = name
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level == 0 and name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        start = time.perf_counter()
+        stack.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            module = name
+            if level and globals:
+                # Relative import: report the absolute module name
+                package = globals.get("__package__") or ""
+                module = f"{package}.{name}" if name else package
+            with self._lock:
+                self.records.append((self.stage, module, (elapsed - children) * 1000, elapsed * 1000))
+
+    def stage_totals(self):
+        """Self time of all imports per stage, in milliseconds"""
+        totals = {}
+        for stage, _, self_ms, _ in self.records:
+            totals[stage] = totals.get(stage, 0.0) + self_ms
+        return totals
+
+    def report(self, top=10):
+        """Return a printable per-stage report with the slowest modules of each stage"""
+        lines = ["Import profile (self ms / cumulative ms):"]
+        for stage, total in self.stage_totals().items():
+            lines.append(f"  {stage}: {total:.1f} ms")
+            records = sorted((r for r in self.records if r[0] == stage), key=lambda r: r[2], reverse=True)
+            for _, module, self_ms, cumulative_ms in records[:top]:
+                lines.append(f"      {self_ms:8.1f} {cumulative_ms:8.1f}  {module}")
+        return "\n".join(lines)
+
+_profiler = None
+
+def enabled_from_environment(argv=None):
+    argv = sys.argv if argv is None else argv
+    return os.environ.get(ENV_FLAG) == "1" or ARG_FLAG in argv
+
+def start():
+    """Install the profiler if it was requested; call before the heavy imports"""
+    global _profiler
+    if _profiler is None and enabled_from_environment():
+        _profiler = ImportProfiler()
+        _profiler.install()
+        # Background imports happen after the first frame, so report again at exit
+        atexit.register(print_report)
+    return _profiler
+
+def set_stage(name):
+    if _profiler is not None:
+        _profiler.set_stage(name)
+
+def print_report():
+    if _profiler is not None:
+        print(_profiler.report())
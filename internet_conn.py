@@ -1,23 +1,27 @@
 # functions.py
 import socket
+from metrics import timed
 
+PROBE_HOSTS = [
+    ("8.8.8.8", 53),        # Google DNS
+    ("1.1.1.1", 53),        # Cloudflare DNS
+    ("208.67.222.222", 53), # OpenDNS
+]
+PROBE_DOMAIN = "google.com"
+
+@timed("net.internet_check", "Connectivity probe")
 def is_internet_available():
-    hosts = [
-            ("8.8.8.8", 53),        # Google DNS
-            ("1.1.1.1", 53),        # Cloudflare DNS
-            ("208.67.222.222", 53), # OpenDNS
-        ]
-        
-    for host, port in hosts:
+    for host, port in PROBE_HOSTS:
         try:
-            socket.create_connection((host, port), timeout=2)
-            return True
+            # Close the probe socket at once; the kiosk checks every few seconds for weeks
+            with socket.create_connection((host, port), timeout=2):
+                return True
         except OSError:
             continue
             
     try:
         # As a final fallback, try to resolve a reliable domain
-        socket.gethostbyname("google.com")
+        socket.gethostbyname(PROBE_DOMAIN)
         return True
     except OSError:
         return False
\ No newline at end of file
@@ -1,11 +1,16 @@
+import time
 from PyQt5.QtCore import QTimer
-from Classes import NTPSyncWorker 
+import import_profiler
 
 class LoadingManager:
-    def __init__(self, loading_screen, main_window):
+    def __init__(self, loading_screen, main_window, startup_time=None):
         self.loading_screen = loading_screen
         self.main_window = main_window
-        
+        # perf_counter() at process start, used to time the first interactive frame
+        self.startup_time = startup_time if startup_time is not None else time.perf_counter()
+        self.stage_times = {}
+        self.first_frame_ms = None
+
     def update_progress(self, value):
         """Update loading progress bar"""
         if self.loading_screen:
@@ -20,82 +25,66 @@ class LoadingManager:
         """Helper function to chain delayed actions"""
         QTimer.singleShot(delay, callback)
 
+    def mark_stage(self, name):
+        """Record the time since process start at which a stage began"""
+        self.stage_times[name] = (time.perf_counter() - self.startup_time) * 1000
+        import_profiler.set_stage(name)
+
     def start_loading_sequence(self):
         """Start the chain of loading stages"""
         self.stage1()
 
     def stage1(self):
         """Basic initialization (10%)"""
+        self.mark_stage("stage1")
         self.update_status("Initializing application...")
         self.update_progress(10)
         self.schedule_next_stage(0, self.stage2)
 
     def stage2(self):
-        """UI Setup (15%)"""
-        self.update_status("Setting up user interface...")
-        self.update_progress(15)
+        """UI Setup with the roster from the local database (40%)"""
+        self.mark_stage("stage2")
+        self.update_status("Loading staff roster...")
+        self.update_progress(40)
         self.main_window.initUI()
         self.schedule_next_stage(0, self.stage3)
 
     def stage3(self):
-        """System tray (20%)"""
+        """System tray (60%)"""
+        self.mark_stage("stage3")
         self.update_status("Configuring system tray...")
-        self.update_progress(20)
+        self.update_progress(60)
         self.main_window.setup_system_tray()
         self.schedule_next_stage(0, self.stage4)
 
     def stage4(self):
-        """Application services (25%)"""
-        self.update_status("Initializing application services...")
-        self.update_progress(25)
+        """Time from the system clock until NTP answers (80%)"""
+        self.mark_stage("stage4")
+        self.update_status("Updating time...")
+        self.update_progress(80)
+        self.main_window.current_datetime = self.main_window.time_sync.sync_with_system_time()
+        self.main_window.sync_manager.update_current_datetime(self.main_window.current_datetime)
+        self.main_window.work_time_manager.update_current_datetime(self.main_window.current_datetime)
         self.schedule_next_stage(0, self.stage5)
 
     def stage5(self):
-        """Start Data sync (30%)"""
-        self.update_status("Starting data synchronization...")
-        self.update_progress(30)
+        """Show the window with the cached roster (100%)"""
+        self.mark_stage("stage5")
+        self.update_status("Loading complete!")
+        self.update_progress(100)
+        self.main_window.loading_signals.finished.emit()
         self.schedule_next_stage(0, self.stage6)
 
     def stage6(self):
-        """Data sync progress (50%)"""
-        self.update_status("Syncing data...")
-        self.update_progress(50)
-        self.main_window.sync_data()
-        self.schedule_next_stage(0, self.stage7)
-
-    def stage7(self):
-        """Data sync completion (70%)"""
-        self.update_status("Completing data synchronization...")
-        self.update_progress(70)
-        self.schedule_next_stage(0, self.stage8)
-
-    def stage8(self):
-        """Time sync (75%)"""
-        self.update_status("Updating time...")
-        self.update_progress(75)
-        self.main_window.current_datetime = self.main_window.time_sync.sync_with_system_time()
-        self.main_window.sync_manager.update_current_datetime(self.main_window.current_datetime)
-        self.schedule_next_stage(0, self.stage9)
-
-    def stage9(self):
-        """NTP sync (85%)"""
-        self.main_window.loading_signals.status.emit("Preparing NTP sync...")
-        self.main_window.loading_signals.progress.emit(85)
-        
-        # Create and configure the NTP sync worker - fixed reference
-        self.main_window.ntp_worker = NTPSyncWorker(self.main_window.time_sync)
-        
-        # Connect worker signals
-        self.main_window.ntp_worker.finished.connect(self.main_window.handle_ntp_sync_complete)
-        self.main_window.ntp_worker.progress.connect(
-            lambda v: self.main_window.loading_signals.progress.emit(v)
-        )
-        self.main_window.ntp_worker.status.connect(
-            lambda s: self.main_window.loading_signals.status.emit(s)
-        )
-        
-        # Start the worker
-        self.main_window.ntp_worker.start()
+        """Data and NTP sync in the background, updating the visible window in place"""
+        self.mark_stage("stage6")
+
+        # The first sync runs on the scheduler thread, so it never blocks the UI thread
+        self.main_window.sync_manager.start()
+
+        # Accept punches from badge readers once the roster is on screen
+        self.main_window.start_punch_server()
+        self.main_window.start_hub()
 
     def finish_loading(self):
         """Clean up loading screen"""
@@ -107,4 +96,17 @@ class LoadingManager:
             self.main_window.show_window()
         except Exception as e:
             print(f"Error during finish loading: {str(e)}")
-            self.main_window.show_window()
\ No newline at end of file
+            self.main_window.show_window()
+
+        # Runs once the event loop has painted the shown window
+        QTimer.singleShot(0, self.report_first_frame)
+
+    def report_first_frame(self):
+        """Log the time from process start to the first interactive frame"""
+        if self.first_frame_ms is not None:
+            return
+        self.first_frame_ms = (time.perf_counter() - self.startup_time) * 1000
+        stages = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.stage_times.items())
+        print(f"Time to first interactive frame: {self.first_frame_ms:.0f} ms ({stages})")
+        import_profiler.print_report()
+        import_profiler.set_stage("after-first-frame")
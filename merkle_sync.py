@@ -0,0 +1,236 @@
+# merkle_sync.py hash tree reconciliation of the synced tables against the server
+#
+# Both sides hash their rows of a table into a tree over staff_id ranges: a
+# leaf covers LEAF_SPAN consecutive staff_ids, each node above it FANOUT
+# nodes below. A sync compares the top level, then only the children of the
+# nodes that differ, down to the leaves, and fetches just the rows of the
+# differing leaves. When nothing changed that is one small request per table
+# instead of the whole table.
+#
+# Wire format, POSTed as JSON to MERKLE_API_URL:
+#   {"op": "nodes", "table": t, "level": n, "parents": [index, ...] or null}
+#       -> {"status": "success", "nodes": {"index": "hash", ...}}
+#          the non-empty nodes of level n under the given parents (all of them for null)
+#   {"op": "rows", "table": t, "buckets": [leaf index, ...]}
+#       -> {"status": "success", "data": [record, ...]}
+#          records in the same format as the full sync endpoints
+# "attendance" requests also carry "start" and "end" dates. handle_request()
+# is the reference implementation of the server side.
+import hashlib
+import sqlite3
+
+import metrics
+from db_manager import get_connection
+# requests is imported on first use, like in db_sync
+
+MERKLE_API_URL = ""  # Empty until the server supports it; the sync_* functions then download everything
+
+LEAF_SPAN = 32    # staff_ids per leaf
+FANOUT = 16       # children per node
+TOP_LEVEL = 4     # leaves are level 0; one top node covers 32 * 16**4 = 2M staff_ids
+
+def _text(value):
+    return "" if value is None else str(value)
+
+def _flag(value):
+    return str(int(value or 0))
+
+# Each table's records (API format) reduce to the fields both sides store, as strings
+def _staff_fields(record):
+    return [record["first_name"], record["last_name"]]
+
+def _schedule_fields(record):
+    # Times are only kept for regular working days, as in db_sync.apply_schedule_data
+    regular = not int(record["day_off"]) and not int(record["open_schedule"])
+    return [_flag(record["work_day"]),
+            _text(record["start_time"]) if regular else "",
+            _text(record["end_time"]) if regular else "",
+            _flag(record["day_off"]), _flag(record["open_schedule"])]
+
+def _temp_schedule_fields(record):
+    return [_text(record["scheduled_in"]), _text(record["scheduled_out"]),
+            _flag(record["day_off"]), _flag(record["open_schedule"])]
+
+def _attendance_fields(record):
+    hours = record["hours_worked"]
+    return [record["work_date"], _text(record["work_in"]), _text(record["work_off"]),
+            "" if hours is None else f"{float(hours):.2f}"]
+
+# table -> (local query, local row to API record, record fields)
+TABLES = {
+    "staff": (
+        'SELECT staff_id, first_name, last_name FROM staff_tbl',
+        lambda row: {"staff_id": row[0], "first_name": row[1], "last_name": row[2]},
+        _staff_fields),
+    "schedule": (
+        'SELECT staff_id, day_of_week, scheduled_in, scheduled_out, day_off, open_schedule FROM staff_schedule',
+        lambda row: {"staff_id": row[0], "work_day": row[1], "start_time": row[2], "end_time": row[3],
+                     "day_off": row[4], "open_schedule": row[5]},
+        _schedule_fields),
+    "temp_schedule": (
+        'SELECT staff_id, scheduled_in, scheduled_out, day_off, open_schedule FROM temp_schedule',
+        lambda row: {"staff_id": row[0], "scheduled_in": row[1], "scheduled_out": row[2],
+                     "day_off": row[3], "open_schedule": row[4]},
+        _temp_schedule_fields),
+    "attendance": (
+        'SELECT staff_id, work_date, work_in, work_off, hours_worked FROM staff_attendance '
+        'WHERE work_date BETWEEN ? AND ?',
+        lambda row: {"staff_id": row[0], "work_date": row[1], "work_in": row[2], "work_off": row[3],
+                     "hours_worked": row[4]},
+        _attendance_fields),
+}
+
+def _digest(lines):
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:32]
+
+class HashTree:
+    """Hashes of the non-empty nodes of one table's tree, level 0 (leaves) to TOP_LEVEL"""
+    def __init__(self, table, records):
+        fields = TABLES[table][2]
+        buckets = {}
+        for record in records:
+            staff_id = int(record["staff_id"])
+            line = "\t".join([str(staff_id)] + fields(record))
+            buckets.setdefault(staff_id // LEAF_SPAN, []).append(line)
+
+        # Row order doesn't matter, so both sides sort before hashing
+        self.levels = [{index: _digest(sorted(lines)) for index, lines in buckets.items()}]
+        for _ in range(TOP_LEVEL):
+            children = {}
+            for index, digest in self.levels[-1].items():
+                children.setdefault(index // FANOUT, []).append(f"{index}:{digest}")
+            self.levels.append({index: _digest(sorted(lines)) for index, lines in children.items()})
+
+    def nodes(self, level, parents=None):
+        """{index: hash} of a level, only under the given parent indexes if any"""
+        if parents is None:
+            return dict(self.levels[level])
+        parents = set(parents)
+        return {index: digest for index, digest in self.levels[level].items() if index // FANOUT in parents}
+
+def local_records(table, start=None, end=None):
+    """The local rows of a table as API records"""
+    query, to_record, _ = TABLES[table]
+    conn = get_connection()
+    try:
+        rows = conn.execute(query, (start, end) if table == "attendance" else ()).fetchall()
+    finally:
+        conn.close()
+    return [to_record(row) for row in rows]
+
+def handle_request(message, records):
+    """
+    Answer one request from records, a dict of table -> API records as the
+    server holds them. Used by the stand-in server in benchmarks/.
+    """
+    table = message["table"]
+    rows = records[table]
+    if table == "attendance":
+        rows = [row for row in rows if message["start"] <= row["work_date"] <= message["end"]]
+    if message["op"] == "nodes":
+        nodes = HashTree(table, rows).nodes(message["level"], message.get("parents"))
+        return {"status": "success", "nodes": {str(index): digest for index, digest in nodes.items()}}
+    if message["op"] == "rows":
+        buckets = set(message["buckets"])
+        return {"status": "success", "data": [row for row in rows if int(row["staff_id"]) // LEAF_SPAN in buckets]}
+    return {"status": "error", "message": f"unknown op {message['op']}"}
+
+class _Client:
+    """The requests of one reconciliation over a kept-alive session"""
+    def __init__(self, session, table, extra=None, report=None):
+        self.session = session
+        self.table = table
+        self.extra = extra or {}
+        self.report = report
+
+    def post(self, message):
+        response = self.session.post(MERKLE_API_URL, json={"table": self.table, **self.extra, **message}, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") != "success":
+            raise ValueError(data.get("message", "request failed"))
+        metrics.counter("merkle.requests", "Hash tree sync requests").inc()
+        if self.report is not None:
+            self.report.note_response(data)
+        return data
+
+    def differing_buckets(self, tree):
+        """Walk down from the top level through the nodes that differ. Returns the leaf indexes."""
+        parents = None
+        for level in range(TOP_LEVEL, -1, -1):
+            remote = {int(index): digest for index, digest in
+                      self.post({"op": "nodes", "level": level, "parents": parents})["nodes"].items()}
+            local = tree.nodes(level, parents)
+            # A node missing on one side differs too
+            differing = sorted(index for index in remote.keys() | local.keys() if remote.get(index) != local.get(index))
+            if not differing:
+                return []
+            parents = differing
+        return parents
+
+def sync_table(table, report=None):
+    """
+    Reconcile a synced table ("staff", "schedule" or "temp_schedule") by hash tree.
+    Returns True or False like the db_sync sync_* functions, or None when
+    the server doesn't support it, so the caller downloads everything.
+    """
+    if not MERKLE_API_URL:
+        return None
+    import requests
+    import db_sync
+
+    apply = {"staff": db_sync.apply_staff_data,
+             "schedule": db_sync.apply_schedule_data,
+             "temp_schedule": db_sync.apply_temp_schedule_data}[table]
+    try:
+        tree = HashTree(table, local_records(table))
+        with requests.Session() as session:
+            client = _Client(session, table, report=report)
+            buckets = client.differing_buckets(tree)
+            if not buckets:
+                return True
+            records = client.post({"op": "rows", "buckets": buckets})["data"]
+
+        metrics.counter("merkle.buckets_fetched", "Staff_id ranges downloaded by hash tree syncs").inc(len(buckets))
+        leaves = set(buckets)
+        return apply(records, report, scope=lambda staff_id: staff_id // LEAF_SPAN in leaves)
+
+    except requests.HTTPError as e:
+        # No hash tree endpoint on this server
+        print(f"Hash tree sync of {table} unavailable, downloading everything: {str(e)}")
+        return None
+    except requests.RequestException as e:
+        print(f"Error syncing {table} by hash tree: {str(e)}")
+    except sqlite3.Error as e:
+        print(f"Database error: {str(e)}")
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Invalid hash tree response for {table}: {str(e)}")
+
+    return False
+
+def verify_attendance(start_date, end_date):
+    """
+    Compare the local attendance of a date range with the server's copy.
+    Returns the (first, last) staff_id ranges that differ, [] if all match,
+    or None if the check could not be made.
+    """
+    if not MERKLE_API_URL:
+        return None
+    import requests
+
+    try:
+        tree = HashTree("attendance", local_records("attendance", start_date, end_date))
+        with requests.Session() as session:
+            client = _Client(session, "attendance", {"start": start_date, "end": end_date})
+            buckets = client.differing_buckets(tree)
+    except requests.RequestException as e:
+        print(f"Error verifying attendance: {str(e)}")
+        return None
+    except sqlite3.Error as e:
+        print(f"Database error: {str(e)}")
+        return None
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"Invalid hash tree response for attendance: {str(e)}")
+        return None
+
+    return [(bucket * LEAF_SPAN, bucket * LEAF_SPAN + LEAF_SPAN - 1) for bucket in buckets]
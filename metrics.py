@@ -0,0 +1,177 @@
+# metrics.py counters and latency histograms for the hot paths
+import functools
+import json
+import os
+import threading
+import time
+
+METRICS_JSON_FILE = "metrics.jsonl"   # one snapshot per line
+METRICS_PROM_FILE = "metrics.prom"    # latest snapshot in Prometheus text format
+METRICS_JSON_MAX_BYTES = 5 * 1024 * 1024
+EXPORT_INTERVAL = 60  # seconds
+
+# Latency bucket upper bounds in milliseconds
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class Counter:
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"type": "counter", "value": self.value}
+
+class Histogram:
+    """Fixed-bucket latency histogram in milliseconds"""
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket holding it, capped at the maximum seen"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(float(self.buckets[i]), self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "type": "histogram",
+            "count": self.count,
+            "sum_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(name, Counter, help_text)
+
+    def histogram(self, name, help_text=""):
+        return self._get_or_create(name, Histogram, help_text)
+
+    def _get_or_create(self, name, metric_class, help_text):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = metric_class(name, help_text)
+                    self.metrics[name] = metric
+        return metric
+
+    def timed(self, name, help_text=""):
+        """Decorator and context manager recording the elapsed time into a histogram"""
+        return _Timer(self.histogram(name, help_text))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in sorted(self.metrics.items())}
+
+    def to_prometheus(self):
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            prom_name = "attendance_" + name.replace(".", "_").replace("-", "_")
+            if isinstance(metric, Counter):
+                prom_name += "_total"
+                if metric.help_text:
+                    lines.append(f"# HELP {prom_name} {metric.help_text}")
+                lines.append(f"# TYPE {prom_name} counter")
+                lines.append(f"{prom_name} {metric.value}")
+            else:
+                prom_name += "_ms"
+                if metric.help_text:
+                    lines.append(f"# HELP {prom_name} {metric.help_text}")
+                lines.append(f"# TYPE {prom_name} histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets, metric.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{prom_name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{prom_name}_bucket{{le="+Inf"}} {metric.count}')
+                lines.append(f"{prom_name}_sum {metric.total:.3f}")
+                lines.append(f"{prom_name}_count {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=METRICS_JSON_FILE, prom_path=METRICS_PROM_FILE):
+        """Append a JSON lines snapshot and rewrite the Prometheus text file"""
+        try:
+            if os.path.exists(json_path) and os.path.getsize(json_path) > METRICS_JSON_MAX_BYTES:
+                os.replace(json_path, json_path + ".1")
+            with open(json_path, "a") as json_file:
+                json_file.write(json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}) + "\n")
+
+            # Write then rename so scrapers never read a half-written file
+            with open(prom_path + ".tmp", "w") as prom_file:
+                prom_file.write(self.to_prometheus())
+            os.replace(prom_path + ".tmp", prom_path)
+        except OSError as e:
+            print(f"Error exporting metrics: {str(e)}")
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self._local = threading.local()
+
+    def __enter__(self):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        start = self._local.starts.pop()
+        self.histogram.observe((time.perf_counter() - start) * 1000)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+# Process-wide registry used by the instrumented modules
+registry = MetricsRegistry()
+
+def timed(name, help_text=""):
+    return registry.timed(name, help_text)
+
+def counter(name, help_text=""):
+    return registry.counter(name, help_text)
@@ -0,0 +1,196 @@
+# punch_server.py localhost HTTP endpoint for badge readers and secondary terminals
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PUNCH_SERVER_HOST = "127.0.0.1"
+PUNCH_SERVER_PORT = 8765
+BATCH_WINDOW = 0.002  # seconds to wait for stragglers once the queue is drained
+MAX_BATCH = 500
+LISTEN_BACKLOG = 256  # a shift change connects many readers at once
+REQUEST_TIMEOUT = 10  # seconds a request waits for its batch to commit
+
+class PendingPunch:
+    """A punch waiting in the queue for the writer thread"""
+    def __init__(self, staff_id):
+        self.staff_id = staff_id
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+class PunchHTTPServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+    daemon_threads = True
+
+class PunchServer:
+    """
+    Accepts punches by staff_id over HTTP on localhost.
+
+        POST /punch   {"staff_id": 12} or {"staff_ids": [12, 40]}
+        GET  /health
+
+    Request threads only enqueue punches. A single writer thread drains
+    everything queued, plus whatever arrives within BATCH_WINDOW, and records
+    it in one transaction through WorkTimeManager.handle_punches, the same toggle logic
+    and app clock the GUI uses. on_recorded(staff_ids) is called from the
+    writer thread after each commit so the GUI can refresh those rows.
+    """
+    def __init__(self, work_time_manager, on_recorded=None,
+                 host=PUNCH_SERVER_HOST, port=PUNCH_SERVER_PORT):
+        self.work_time_manager = work_time_manager
+        self.on_recorded = on_recorded
+        self.host = host
+        self.port = port
+        self.pending = queue.Queue()
+        self.httpd = None
+        self.threads = []
+        self.running = False
+        self.batches_committed = 0
+        self.punches_recorded = 0
+
+    def start(self):
+        """Bind the socket and start the HTTP and writer threads. Returns False if the port is unavailable."""
+        try:
+            self.httpd = PunchHTTPServer((self.host, self.port), self._handler_class())
+        except OSError as e:
+            print(f"Punch server could not listen on {self.host}:{self.port}: {str(e)}")
+            return False
+
+        # Port 0 picks a free port; report the real one
+        self.port = self.httpd.server_address[1]
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self.httpd.serve_forever, name="punch-http", daemon=True),
+            threading.Thread(target=self._writer_loop, name="punch-writer", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        print(f"Punch server listening on http://{self.host}:{self.port}/punch")
+        return True
+
+    def stop(self):
+        """Stop accepting punches and wait for the threads to finish"""
+        if not self.running:
+            return
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.pending.put(None)  # Wake the writer
+        for thread in self.threads:
+            thread.join(timeout=REQUEST_TIMEOUT)
+
+    def submit(self, staff_ids):
+        """Queue punches and block until their batch is committed. Returns the results in order."""
+        punches = [PendingPunch(staff_id) for staff_id in staff_ids]
+        for punch in punches:
+            self.pending.put(punch)
+        for punch in punches:
+            if not punch.done.wait(REQUEST_TIMEOUT):
+                raise TimeoutError("Timed out waiting for the punch to be recorded")
+            if punch.error is not None:
+                raise punch.error
+        return [punch.result for punch in punches]
+
+    def _writer_loop(self):
+        while self.running:
+            first = self.pending.get()
+            if first is None:
+                continue
+            batch = [first]
+
+            # Group the burst: everything that queued up during the previous commit,
+            # then anything arriving within the window, up to a full batch
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < MAX_BATCH:
+                try:
+                    punch = self.pending.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        punch = self.pending.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if punch is not None:
+                    batch.append(punch)
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            results = self.work_time_manager.handle_punches([punch.staff_id for punch in batch])
+            for punch, result in zip(batch, results):
+                punch.result = result
+        except Exception as e:
+            print(f"Error recording punch batch: {str(e)}")
+            for punch in batch:
+                punch.error = e
+        finally:
+            for punch in batch:
+                punch.done.set()
+
+        recorded = [punch.result[0] for punch in batch if punch.result and punch.result[1]]
+        self.batches_committed += 1
+        self.punches_recorded += len(recorded)
+        if recorded and self.on_recorded:
+            try:
+                self.on_recorded(recorded)
+            except Exception as e:
+                print(f"Error notifying punch listeners: {str(e)}")
+
+    def _handler_class(self):
+        server = self
+
+        class PunchRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive for readers that send bursts
+            # Headers and body are written separately; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send(200, {"status": "success", "punches_recorded": server.punches_recorded})
+                else:
+                    self._send(404, {"status": "error", "message": "Not found"})
+
+            def do_POST(self):
+                if self.path != "/punch":
+                    self._send(404, {"status": "error", "message": "Not found"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    if "staff_ids" in payload:
+                        staff_ids = [int(staff_id) for staff_id in payload["staff_ids"]]
+                    else:
+                        staff_ids = [int(payload["staff_id"])]
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send(400, {"status": "error", "message": f"Invalid punch request: {str(e)}"})
+                    return
+
+                try:
+                    results = server.submit(staff_ids)
+                except Exception as e:
+                    self._send(500, {"status": "error", "message": str(e)})
+                    return
+
+                self._send(200, {"status": "success", "data": [
+                    {"staff_id": staff_id, "punch_type": punch_type, "punch_time": punch_time}
+                    for staff_id, punch_type, punch_time in results
+                ]})
+
+            def _send(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # Punches are frequent; don't print a line per request
+                pass
+
+        return PunchRequestHandler
@@ -0,0 +1,140 @@
+# punctuality.py rolling per-staff punctuality over the last WINDOW_DAYS days
+#
+# The window is read once, on a background thread since a month of a large
+# roster takes a noticeable fraction of a second, and from then on kept up
+# to date from the roster rows as punches arrive: each row already carries
+# its minutes_late, so a punch only replaces one day's entry and adjusts
+# the running sums. At the day rollover the oldest day is dropped the same
+# way; the window is only read again when it can't slide (first load, or
+# days the app didn't see).
+import threading
+from datetime import timedelta
+
+import db_functions
+from hub_protocol import LOAD_ERRORS
+from metrics import timed
+
+WINDOW_DAYS = 30
+
+class PunctualityStats:
+    """Late arrivals per staff member over the last WINDOW_DAYS days, today included"""
+    def __init__(self, store=None, window_days=WINDOW_DAYS):
+        self.store = store if store is not None else db_functions
+        self.window_days = window_days
+        self.today = None
+        self.days = {}          # work_date -> {staff_id: minutes late, negative when early}
+        self.arrivals = {}      # staff_id -> days punched in against a schedule
+        self.late_days = {}     # staff_id -> days of those punched in late
+        self.late_minutes = {}  # staff_id -> minutes late summed over the late days
+        self.lock = threading.Lock()
+        self.thread = None
+        self.generation = 0     # Bumped per load, so a load for a window since moved on is dropped
+
+    def is_loading(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def advance(self, today, background=True):
+        """Move the window to end on today (a date), sliding it when possible"""
+        if today == self.today:
+            return
+        # Only yesterday's punches were seen; after a gap the days in between are read
+        if self.today is None or self.today + timedelta(days=1) != today or self.is_loading():
+            self._start_load(today, background)
+            return
+
+        start = (today - timedelta(days=self.window_days - 1)).isoformat()
+        with self.lock:
+            for work_date in [work_date for work_date in self.days if work_date < start]:
+                for staff_id, minutes in self.days.pop(work_date).items():
+                    self._count(staff_id, minutes, -1)
+            self.today = today
+
+    def _start_load(self, today, background):
+        with self.lock:
+            self.today = today
+            self.generation += 1
+            # Today's punches are recorded meanwhile and kept over the loaded copy
+            today_entries = self.days.get(today.isoformat(), {})
+            self.days = {today.isoformat(): today_entries}
+            self.arrivals, self.late_days, self.late_minutes = {}, {}, {}
+            for staff_id, minutes in today_entries.items():
+                self._count(staff_id, minutes, 1)
+        args = (today, self.generation)
+        if not background:
+            self._load(*args)
+            return
+        self.thread = threading.Thread(target=self._load, args=args, name="punctuality-load", daemon=True)
+        self.thread.start()
+
+    @timed("punctuality.load", "Rolling punctuality window read")
+    def _load(self, today, generation):
+        """Read the days before today; today comes from the roster rows"""
+        first = today - timedelta(days=self.window_days - 1)
+        try:
+            arrivals = self.store.fetch_arrivals(first.isoformat(), (today - timedelta(days=1)).isoformat())
+        except LOAD_ERRORS as e:
+            # Fills in again from today's punches
+            print(f"Error loading punctuality: {str(e)}")
+            return
+
+        with self.lock:
+            if generation != self.generation:
+                return
+            for staff_id, work_date, minutes in arrivals:
+                self.days.setdefault(work_date, {})[staff_id] = minutes
+                self._count(staff_id, minutes, 1)
+
+    def _count(self, staff_id, minutes, sign):
+        self.arrivals[staff_id] = self.arrivals.get(staff_id, 0) + sign
+        if minutes > 0:
+            self.late_days[staff_id] = self.late_days.get(staff_id, 0) + sign
+            self.late_minutes[staff_id] = self.late_minutes.get(staff_id, 0) + sign * minutes
+
+    def record(self, staff_id, minutes_late):
+        """Today's arrival of a staff member, from their roster row (None: nothing to compare)"""
+        self.record_all(((staff_id, minutes_late),))
+
+    def record_all(self, arrivals):
+        """record() for many (staff_id, minutes late) pairs under one lock"""
+        if self.today is None:
+            return
+        with self.lock:
+            today = self.days.setdefault(self.today.isoformat(), {})
+            for staff_id, minutes_late in arrivals:
+                previous = today.get(staff_id)
+                if previous == minutes_late:
+                    continue
+                if previous is not None:
+                    self._count(staff_id, previous, -1)
+                    del today[staff_id]
+                if minutes_late is not None:
+                    today[staff_id] = minutes_late
+                    self._count(staff_id, minutes_late, 1)
+
+    def forget(self, staff_id):
+        """Drop a staff member who left the roster"""
+        with self.lock:
+            for entries in self.days.values():
+                entries.pop(staff_id, None)
+            for counts in (self.arrivals, self.late_days, self.late_minutes):
+                counts.pop(staff_id, None)
+
+    def summary(self, staff_id):
+        """(days punched in, days late, average minutes late on those days)"""
+        with self.lock:
+            arrivals = self.arrivals.get(staff_id, 0)
+            late_days = self.late_days.get(staff_id, 0)
+            late_minutes = self.late_minutes.get(staff_id, 0)
+        return arrivals, late_days, late_minutes / late_days if late_days else 0.0
+
+    def describe(self, staff_id):
+        """Tooltip text for a staff member, or "" before any arrival"""
+        arrivals, late_days, average = self.summary(staff_id)
+        if not arrivals:
+            return ""
+        period = f"in the last {self.window_days} days"
+        if self.is_loading():
+            period += " (still loading)"
+        if not late_days:
+            return f"On time all {arrivals} days {period}"
+        return f"Late {late_days} of {arrivals} days {period}, {average:.0f} min on average"
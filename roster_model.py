@@ -0,0 +1,134 @@
+# roster_model.py the day's roster as a virtual model for the main window's table
+#
+# Cells are worked out from the roster rows when the view asks for them, and
+# kept until the row changes, so only rows that have been on screen cost
+# anything. The model shows the staff the search matched, in roster order:
+# a keystroke swaps that list in one reset instead of hiding rows one by one.
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from ui_builders import (centered_cell, name_cell, work_time_cell, button_cell, day_off_cell,
+                         live_hours_cell, BUTTON_ROLE, WORK_IN, WORK_OFF)
+
+HEADERS = ("Name", "Scheduled In", "Work In", "Scheduled Out", "Work Off", "Hours")
+NO_CELL = {}
+
+def row_cells(data, live_hours=None):
+    """
+    The six cells of a roster row. live_hours is the (text, overtime) of the
+    running hours of an open session, shown in place of hours_worked.
+    """
+    name = name_cell(data.display_name)
+    if data.day_off:
+        # Spanned over the schedule columns by TableManager
+        return (name, day_off_cell(), NO_CELL, NO_CELL, NO_CELL, NO_CELL)
+
+    staff_id = data.staff_id
+    open_schedule = data.open_schedule
+
+    # Scheduled In
+    sched_in = centered_cell("Open" if open_schedule else (data.sched_in_display if data.sched_in else ""))
+
+    # Work In, offered again once a session is closed so a split shift can start the next one
+    if not data.work_in:
+        work_in = button_cell(WORK_IN, staff_id)
+    elif data.work_off and not data.open_in:
+        late = f", {data.minutes_late} min late" if data.minutes_late and data.minutes_late > 0 else ""
+        work_in = button_cell(WORK_IN, staff_id, f"First in at {data.work_in_display}{late}")
+    else:
+        work_in = work_time_cell(data.work_in_display, data.minutes_late)
+
+    # Scheduled Out
+    sched_out = centered_cell("Open" if open_schedule else (data.sched_out_display if data.sched_out else ""))
+
+    # Work Off
+    if data.work_in and not data.work_off:
+        work_off = button_cell(WORK_OFF, staff_id)
+    elif data.work_off:
+        work_off = work_time_cell(data.work_off_display, data.minutes_early, is_work_off=True)
+    else:
+        work_off = NO_CELL
+
+    # Hours
+    hours = live_hours_cell(*live_hours) if live_hours is not None else centered_cell(data.hours_display)
+
+    return (name, sched_in, work_in, sched_out, work_off, hours)
+
+class RosterTableModel(QAbstractTableModel):
+    """The shown staff of the day's roster, a row each, in roster order"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows_by_id = {}    # staff_id -> roster row, TableManager's dict
+        self.shown = []         # staff_id of each row of the view
+        self.live_hours = {}    # staff_id -> (text, overtime) of the running hours of open sessions
+        self._positions = None  # staff_id -> row of the view, rebuilt lazily after a reset
+        self._cells = {}        # staff_id -> row_cells() of the rows asked for since they last changed
+
+    def set_roster(self, rows_by_id, shown, live_hours):
+        """Show a new roster"""
+        self.beginResetModel()
+        self.rows_by_id = rows_by_id
+        self.shown = shown
+        self.live_hours = live_hours
+        self._positions = None
+        self._cells = {}
+        self.endResetModel()
+
+    def set_shown(self, shown):
+        """Show other staff of the same roster; the cells already worked out are kept"""
+        self.beginResetModel()
+        self.shown = shown
+        self._positions = None
+        self.endResetModel()
+
+    def row_of(self, staff_id):
+        """Row of the view showing a staff member, or None"""
+        if self._positions is None:
+            self._positions = {staff_id: row for row, staff_id in enumerate(self.shown)}
+        return self._positions.get(staff_id)
+
+    def row_changed(self, staff_id, first_column=0, last_column=len(HEADERS) - 1):
+        """Repaint a staff member's cells after its row in rows_by_id changed"""
+        self._cells.pop(staff_id, None)
+        row = self.row_of(staff_id)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, first_column), self.index(row, last_column))
+
+    def set_live_hours(self, staff_id, live_hours):
+        """Show the running hours of an open session, or hours_worked again when live_hours is None"""
+        if live_hours is None:
+            if self.live_hours.pop(staff_id, None) is None:
+                return
+        else:
+            self.live_hours[staff_id] = live_hours
+        self.row_changed(staff_id, 5, 5)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.shown)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def cells(self, row):
+        staff_id = self.shown[row]
+        cells = self._cells.get(staff_id)
+        if cells is None:
+            cells = self._cells[staff_id] = row_cells(self.rows_by_id[staff_id], self.live_hours.get(staff_id))
+        return cells
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.cells(index.row())[index.column()].get(role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        # Buttons are clicked, never selected
+        if BUTTON_ROLE in self.cells(index.row())[index.column()]:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return HEADERS[section]
@@ -0,0 +1,105 @@
+# roster_row.py compact roster row with derived display fields
+import sys
+from collections import namedtuple
+from functools import partial
+from utilities import format_time
+
+FIELDS = ("staff_id", "first_name", "last_name", "sched_in", "sched_out",
+          "work_in", "work_off", "hours_worked", "day_off", "open_schedule", "open_in",
+          "minutes_late", "minutes_early")
+
+# format_time parses with strptime; a roster only holds a few hundred distinct times
+_formatted_times = {}
+
+def cached_format_time(time_str):
+    formatted = _formatted_times.get(time_str)
+    if formatted is None:
+        formatted = _formatted_times[time_str] = format_time(time_str)
+    return formatted
+
+def minutes_after(actual, scheduled):
+    """
+    Minutes from an 'HH:MM:SS' scheduled time to an actual one, to the minute
+    like the AM/PM times on screen, or None when either is missing.
+    """
+    if not actual or not scheduled:
+        return None
+    try:
+        return (int(actual[0:2]) * 60 + int(actual[3:5])) - (int(scheduled[0:2]) * 60 + int(scheduled[3:5]))
+    except ValueError:
+        return None
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+# Default of minutes_late, so a None from the query is kept rather than worked out again
+_UNSET = object()
+
+_RosterFields = namedtuple("_RosterFields", FIELDS)
+
+class RosterRow(_RosterFields):
+    """
+    One staff member's roster line for a day, as returned by the roster query.
+
+    A named tuple in FIELDS order, with no per-row state beyond its fields:
+    from_rows makes a roster's rows straight from sqlite's tuples, in C.
+    Schedule times and last names repeat across a roster and are interned
+    so 10k rows share them. Display fields are worked out on use; the
+    formatted times come from cached_format_time, so that is a dict lookup.
+    open_in is the start of the session still open, or None; rows from a
+    hub that predates it leave it out.
+
+    minutes_late (work in after the scheduled in) and minutes_early (work
+    off before the scheduled out) are columns of the roster query, stored
+    with the row: negative means early in or late off, None means nothing
+    to compare (no punch, open schedule or day off). Rows made here without
+    them, such as from an older hub, get them worked out once by minutes_after.
+    """
+    __slots__ = ()
+
+    def __new__(cls, staff_id, first_name, last_name, sched_in, sched_out,
+                work_in, work_off, hours_worked, day_off, open_schedule, open_in=None,
+                minutes_late=_UNSET, minutes_early=_UNSET):
+        if minutes_late is _UNSET:
+            compared = not (day_off or open_schedule)
+            minutes_late = minutes_after(work_in, sched_in) if compared else None
+            minutes_early = minutes_after(sched_out, work_off) if compared else None
+        return _make_row((staff_id, first_name, _intern(last_name), _intern(sched_in), _intern(sched_out),
+                          work_in, work_off, hours_worked, day_off, open_schedule, open_in,
+                          minutes_late, minutes_early))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """RosterRows from the roster query's tuples"""
+        return [_make_row((staff_id, first_name, _intern(last_name), _intern(sched_in), _intern(sched_out),
+                           work_in, work_off, hours_worked, day_off, open_schedule, open_in,
+                           minutes_late, minutes_early))
+                for (staff_id, first_name, last_name, sched_in, sched_out, work_in, work_off,
+                     hours_worked, day_off, open_schedule, open_in, minutes_late, minutes_early) in rows]
+
+    @property
+    def display_name(self):
+        return f"{self.first_name} {self.last_name[0]}."
+
+    @property
+    def sched_in_display(self):
+        return cached_format_time(self.sched_in)
+
+    @property
+    def sched_out_display(self):
+        return cached_format_time(self.sched_out)
+
+    @property
+    def work_in_display(self):
+        return cached_format_time(self.work_in)
+
+    @property
+    def work_off_display(self):
+        return cached_format_time(self.work_off)
+
+    @property
+    def hours_display(self):
+        return f"{self.hours_worked:.2f}" if self.hours_worked is not None else ""
+
+# tuple.__new__ skips RosterRow.__new__ and the namedtuple length check: no Python frame per row
+_make_row = partial(tuple.__new__, RosterRow)
@@ -22,6 +22,7 @@ class SignalHandler:
         """Handle completion of sync operation"""
         if success:
             self.main_window.table_manager.refresh(force=True)
+            self.main_window.notify_terminals()
         else:
             # Handle sync failure
             if not self.main_window.is_internet_available():
@@ -33,6 +34,8 @@ class SignalHandler:
         """Handle time update from sync"""
         self.main_window.current_datetime = new_datetime
         self.main_window.work_time_manager.update_current_datetime(new_datetime)
+        if hasattr(self.main_window, 'table_manager'):
+            self.main_window.table_manager.update_current_datetime(new_datetime)
         self.update_datetime_display()
     
     def handle_time_increment(self, new_datetime):
@@ -41,10 +44,18 @@ class SignalHandler:
         self.main_window.work_time_manager.update_current_datetime(new_datetime)
         self.update_datetime_display()
 
-        # Check for date change
+        # The table exists once the loading sequence has built the UI
+        if not hasattr(self.main_window, 'table_manager'):
+            return
+        self.main_window.table_manager.update_current_datetime(new_datetime)
+
+        # Check for date change; the roster prefetched before midnight is swapped in without a query
         if self.main_window.current_datetime.date() != self.main_window.current_date:
             self.main_window.current_date = self.main_window.current_datetime.date()
             self.main_window.table_manager.refresh()
+        else:
+            self.main_window.table_manager.update_live_hours()
+            self.main_window.prefetch_next_day()
 
     def update_datetime_display(self):
         """Update the datetime display in the UI"""
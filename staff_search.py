@@ -0,0 +1,128 @@
+# staff_search.py in-memory type-ahead index over staff names
+from bisect import bisect_left, bisect_right
+
+class StaffSearchIndex:
+    """
+    Prefix and trigram index over staff first and last names.
+
+    Every search term must match the start of the first name, the last name or
+    the full name. Terms of three characters or more also match anywhere inside
+    a name, using the trigram index. Updates are incremental so a sync that
+    renames a few staff only touches their entries.
+    """
+    def __init__(self):
+        self.names = {}       # staff_id -> (full name, last name) lowercase keys
+        # Sorted name keys with the staff_id of each key at the same position,
+        # so a prefix lookup is two bisects and a slice
+        self.prefix_keys = []
+        self.prefix_ids = []
+        self.trigrams = {}    # trigram -> set of staff_ids
+
+    def rebuild(self, rows):
+        """Build the index from scratch from roster rows"""
+        self.names = {}
+        self.trigrams = {}
+        entries = []
+        for row in rows:
+            keys = self._insert(row[0], row[1], row[2])
+            entries.extend((key, row[0]) for key in keys)
+        entries.sort()
+        self.prefix_keys = [key for key, _ in entries]
+        self.prefix_ids = [staff_id for _, staff_id in entries]
+
+    def add(self, staff_id, first_name, last_name):
+        """Add a staff member, replacing any previous entry"""
+        keys = self._keys(first_name, last_name)
+        if self.names.get(staff_id) == keys:
+            return
+        self.remove(staff_id)
+        for key in self._insert(staff_id, first_name, last_name):
+            position = bisect_right(self.prefix_keys, key)
+            self.prefix_keys.insert(position, key)
+            self.prefix_ids.insert(position, staff_id)
+
+    def remove(self, staff_id):
+        """Remove a staff member from the index"""
+        keys = self.names.pop(staff_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            position = bisect_left(self.prefix_keys, key)
+            while position < len(self.prefix_keys) and self.prefix_keys[position] == key:
+                if self.prefix_ids[position] == staff_id:
+                    del self.prefix_keys[position]
+                    del self.prefix_ids[position]
+                    break
+                position += 1
+        for trigram in self._trigrams_of(keys):
+            ids = self.trigrams.get(trigram)
+            if ids is not None:
+                ids.discard(staff_id)
+                if not ids:
+                    del self.trigrams[trigram]
+
+    def search(self, text):
+        """
+        Return the set of matching staff_ids, or None when the query is empty
+        (meaning everyone matches).
+        """
+        terms = text.lower().split()
+        if not terms:
+            return None
+
+        result = None
+        # Longest terms are the most selective, so intersect them first
+        for term in sorted(terms, key=len, reverse=True):
+            matches = self._match_term(term)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result
+
+    def __len__(self):
+        return len(self.names)
+
+    def _match_term(self, term):
+        """All staff_ids with a name starting with, or containing, the term"""
+        start = bisect_left(self.prefix_keys, term)
+        end = bisect_left(self.prefix_keys, term + "\uffff", start)
+        matches = set(self.prefix_ids[start:end])
+
+        if len(term) >= 3:
+            candidates = None
+            for trigram in self._term_trigrams(term):
+                ids = self.trigrams.get(trigram)
+                if not ids:
+                    return matches
+                candidates = ids if candidates is None else candidates & ids
+            if len(term) == 3:
+                return matches | candidates
+            # Longer terms may match their trigrams out of order, so confirm the substring
+            names = self.names
+            matches.update(staff_id for staff_id in candidates - matches
+                           if term in names[staff_id][0])
+        return matches
+
+    def _insert(self, staff_id, first_name, last_name):
+        """Record the names and trigrams of a staff member and return its prefix keys"""
+        keys = self._keys(first_name, last_name)
+        self.names[staff_id] = keys
+        for trigram in self._trigrams_of(keys):
+            self.trigrams.setdefault(trigram, set()).add(staff_id)
+        return keys
+
+    @staticmethod
+    def _keys(first_name, last_name):
+        # The full name key also serves first name prefixes
+        first = (first_name or "").lower()
+        last = (last_name or "").lower()
+        return (f"{first} {last}", last)
+
+    @staticmethod
+    def _term_trigrams(term):
+        return {term[i:i + 3] for i in range(len(term) - 2)}
+
+    @classmethod
+    def _trigrams_of(cls, keys):
+        # The full name key already contains the first and last names
+        return cls._term_trigrams(keys[0])
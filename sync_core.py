@@ -0,0 +1,353 @@
+# sync_core.py time and data sync without Qt, shared by the GUI and the headless CLI
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pytz import timezone
+from internet_conn import is_internet_available
+import metrics
+# ntplib and db_sync (which pulls in requests) are imported on first use so
+# they stay off the startup path
+
+class TimeSync:
+    def __init__(self):
+        self.beirut_tz = timezone('Asia/Beirut')
+        self.current_datetime = datetime.now(self.beirut_tz)
+        self.time_difference_threshold = timedelta(minutes=5)
+        self.ntp_servers = [
+            'time.google.com',
+            'pool.ntp.org',          # Global NTP pool
+            'time.nist.gov',         # NIST's public time server
+            'time.cloudflare.com',   # Cloudflare's NTP service
+        ]
+        
+    def get_current_datetime(self):
+        return self.current_datetime
+    
+    def increment_time(self):
+        self.current_datetime += timedelta(seconds=1)
+        return self.current_datetime
+    
+    def sync_with_system_time(self):
+        system_time = datetime.now(self.beirut_tz)
+        self.current_datetime = system_time
+        return self.current_datetime
+
+    @metrics.timed("ntp.sync", "NTP time sync")
+    def sync_with_ntp(self):
+        import ntplib
+
+        if not is_internet_available():
+            print("No internet connection. Cannot sync with NTP server.")
+            return None
+
+        last_error = None
+        for server in self.ntp_servers:
+            try:
+                client = ntplib.NTPClient()
+                response = client.request(server, version=3, timeout=5)
+                ntp_time = datetime.fromtimestamp(response.tx_time, dt_timezone.utc)
+                beirut_time = ntp_time.astimezone(self.beirut_tz)
+                print(f"Time Sync with {server}. {beirut_time}")
+                self.current_datetime = beirut_time
+                return beirut_time
+                
+            except (ntplib.NTPException, OSError) as e:
+                last_error = e
+                print(f"Failed to sync with {server}: {str(e)}")
+                continue
+                
+        # If we get here, all servers failed
+        metrics.counter("ntp.failed", "NTP syncs where every server failed").inc()
+        print(f"Failed to sync with all NTP servers. Last error: {str(last_error)}")
+        return None
+
+    def fallback_to_system_time(self):
+        system_time = datetime.now(self.beirut_tz)
+        time_difference = abs(system_time - self.current_datetime)
+
+        if time_difference <= self.time_difference_threshold:
+            self.current_datetime = system_time
+            print(f"Synced with system time. Time difference was within threshold: {time_difference}")
+        else:
+            print(f"Time difference exceeds threshold. Using App time, Current time might be inaccurate. Difference: {time_difference}")
+
+class DataSync:
+    def __init__(self, current_datetime):
+        self.last_sync_attempt = current_datetime
+        self.sync_counter = 0
+        self.last_report = None  # db_sync.SyncReport of the last successful sync
+
+    def sync_data(self, app_time):
+        """Synchronize all data with the server"""
+        from db_sync import SyncReport, sync_staff_data, sync_schedule_data, sync_temp_schedule_data
+        import effective_schedule
+
+        # Keep the materialized schedule window moving with the calendar, even offline
+        effective_schedule.advance_window(app_time.date())
+
+        if is_internet_available():
+            report = SyncReport()
+            if sync_staff_data(report) and sync_schedule_data(report) and sync_temp_schedule_data(report):
+                self.sync_counter += 1
+                self.last_report = report
+                metrics.counter("sync.data_succeeded", "Completed data syncs").inc()
+                if report.changed:
+                    metrics.counter("sync.data_changed", "Data syncs that changed local data").inc()
+                print(f"Data sync #{self.sync_counter} completed at App time: {app_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                return True
+            else:
+                metrics.counter("sync.data_failed", "Failed data syncs").inc()
+                print(f"Failed to synchronize data. Using local data. {app_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                return False
+        else:
+            print(f"No internet connection. Using local data. {app_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            return False
+
+# Results of SyncCore.attempt_sync
+SYNCED = "synced"      # time synced and data sync attempted
+RETRY = "retry"        # try again after backing off
+GAVE_UP = "gave_up"    # retries exhausted, fell back to system time
+
+class SyncCore:
+    """
+    One sync attempt without Qt: NTP first, then the data sync, falling back
+    to the system time after max_retries failed attempts in a row.
+
+    Results are reported through plain callbacks, on_time_updated(datetime)
+    and on_sync_complete(success). SyncScheduler decides when attempts run,
+    for both the GUI and the headless CLI.
+    """
+    def __init__(self, time_sync, data_sync, current_datetime,
+                 on_time_updated=None, on_sync_complete=None):
+        self.time_sync = time_sync
+        self.data_sync = data_sync
+        self.current_datetime = current_datetime
+        self.on_time_updated = on_time_updated
+        self.on_sync_complete = on_sync_complete
+
+        # Sync parameters
+        self.sync_interval = 120  # seconds until the next sync, adapted after each one
+        # The interval drops to min_sync_interval after a sync that changed data and
+        # grows by interval_growth after each one that didn't, up to max_sync_interval
+        self.min_sync_interval = 30
+        self.max_sync_interval = 900  # 15 minutes
+        self.interval_growth = 1.5
+        self.retry_interval = 15  # first backoff after a failure, doubling each time
+        self.max_backoff = 600    # 10 minutes in seconds
+        self.max_retries = 5
+        self.retries = 0
+        self.internet_check_interval = 30  # 30 seconds
+        # Assume online until the first check instead of probing the network up front
+        self.last_internet_status = True
+        self.last_sync_success = False
+
+    def attempt_sync(self):
+        """One combined time and data sync attempt. Returns SYNCED, RETRY or GAVE_UP."""
+        if not is_internet_available():
+            print("No internet connection. Skipping sync.")
+            return self._retry_or_give_up()
+
+        ntp_time = self.time_sync.sync_with_ntp()
+        if not ntp_time:
+            print("Failed to sync time. Starting retry process...")
+            return self._retry_or_give_up()
+
+        self.retries = 0  # Reset retry counter on success
+        self._set_time(ntp_time)
+
+        # Immediately sync data after successful time sync
+        self._sync_complete(self.data_sync.sync_data(self.current_datetime))
+        return SYNCED
+
+    def fix_interval(self, seconds):
+        """Sync every seconds, no matter what the syncs change"""
+        self.sync_interval = self.min_sync_interval = self.max_sync_interval = seconds
+
+    def adapt_interval(self):
+        """
+        Set sync_interval from what the last data sync changed, or from the
+        server's next_poll hint when it sent one, within the configured bounds.
+        Data sources without a report (a terminal's hub) keep the interval.
+        """
+        report = getattr(self.data_sync, "last_report", None)
+        if report is None:
+            return self.sync_interval
+        if report.next_poll is not None:
+            interval = report.next_poll
+        elif report.changed:
+            interval = self.min_sync_interval
+        else:
+            interval = self.sync_interval * self.interval_growth
+        self.sync_interval = max(self.min_sync_interval, min(self.max_sync_interval, interval))
+        return self.sync_interval
+
+    def sync_now(self):
+        """Manual sync: time if possible, data regardless. Returns True if the data sync succeeded."""
+        ntp_time = self.time_sync.sync_with_ntp()
+        if ntp_time:
+            print(f"Time synced successfully: {ntp_time}")
+            self._set_time(ntp_time)
+        else:
+            print("Failed to sync time with NTP. Using current app time.")
+
+        success = self.data_sync.sync_data(self.current_datetime)
+        self._sync_complete(success)
+        return success
+
+    def connection_restored(self):
+        """Check the connection; True when it just came back and a sync should run"""
+        current_internet_status = is_internet_available()
+        restored = current_internet_status and not self.last_internet_status
+        if restored:
+            print("Internet connection restored. Initiating sync...")
+        self.last_internet_status = current_internet_status
+        return restored
+
+    def _retry_or_give_up(self):
+        if self.retries < self.max_retries:
+            self.retries += 1
+            print(f"Sync attempt failed ({self.retries}/{self.max_retries}), backing off")
+            return RETRY
+
+        print(f"Maximum retry attempts ({self.max_retries}) reached. Falling back to system time...")
+        self.time_sync.fallback_to_system_time()
+        self._set_time(self.time_sync.get_current_datetime())
+        self._sync_complete(False)
+        return GAVE_UP
+
+    def _set_time(self, new_datetime):
+        self.current_datetime = new_datetime
+        if self.on_time_updated:
+            self.on_time_updated(new_datetime)
+
+    def _sync_complete(self, success):
+        self.last_sync_success = success
+        if self.on_sync_complete:
+            self.on_sync_complete(success)
+
+    def advance_clock(self, seconds):
+        """Move the app clock forward; the GUI does this every second from its clock timer"""
+        self.time_sync.current_datetime += timedelta(seconds=seconds)
+        self.current_datetime = self.time_sync.current_datetime
+
+    def run_forever(self, stop_event=None):
+        """Headless loop: sync now and then on schedule, advancing the clock. Returns when stop_event is set."""
+        SyncScheduler(self, tick=self.advance_clock).run_forever(stop_event)
+
+# Sync triggers. A manual one that arrives during a sync still gets its own sync afterwards.
+PERIODIC = 1
+MANUAL = 2
+
+BACKOFF_JITTER = 0.2  # each backoff is randomly stretched or shrunk by up to 20%
+WAKE_INTERVAL = 1.0   # longest the loop sleeps, so the clock ticks and stop is noticed
+
+class SyncScheduler:
+    """
+    Runs the syncs of a SyncCore one at a time on a single thread.
+
+    The interval, the connection coming back and the user all call trigger().
+    A trigger that arrives while a sync is waiting to start is folded into it,
+    and a periodic one that arrives while a sync is running is dropped; both
+    count as sync.coalesced. Failed syncs are retried with exponential backoff
+    and jitter, from core.retry_interval up to core.max_backoff.
+
+    start() runs the loop on a daemon thread for the GUI, run_forever() on the
+    calling thread for the CLI. The core's callbacks are called from the loop.
+    """
+    def __init__(self, core, tick=None):
+        self.core = core
+        self.tick = tick  # tick(seconds) on every wakeup, for a clock nothing else advances
+        self.condition = threading.Condition()
+        self.pending = None    # PERIODIC or MANUAL waiting to run
+        self.running = False   # a sync is in flight
+        self.failures = 0      # failed syncs in a row
+        self.next_sync = time.monotonic() + core.sync_interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, initial=MANUAL):
+        """Run the loop on a background thread, beginning with an initial sync"""
+        self.thread = threading.Thread(target=self.run_forever, args=(None, initial),
+                                       name="sync-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def trigger(self, manual=False):
+        """Ask for a sync as soon as possible. Returns False if it was coalesced into another one."""
+        kind = MANUAL if manual else PERIODIC
+        with self.condition:
+            if self.pending is not None:
+                # Fold into the sync already waiting, keeping the stronger kind
+                self.pending = max(self.pending, kind)
+            elif not (self.running and kind == PERIODIC):
+                self.pending = kind
+                self.condition.notify_all()
+                return True
+            # Otherwise the running sync covers it
+            metrics.counter("sync.coalesced", "Sync triggers folded into a running or waiting sync").inc()
+            return False
+
+    def backoff_delay(self):
+        """Seconds to wait after the current run of failures"""
+        delay = min(self.core.max_backoff, self.core.retry_interval * 2 ** (self.failures - 1))
+        return delay * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+
+    def run_forever(self, stop_event=None, initial=MANUAL):
+        """The scheduler loop. Returns when stop_event (or stop()) is set."""
+        if stop_event is not None:
+            self.stop_event = stop_event
+        last_tick = time.monotonic()
+        next_check = last_tick + self.core.internet_check_interval
+        if initial:
+            self.trigger(manual=initial == MANUAL)
+
+        while not self.stop_event.is_set():
+            with self.condition:
+                now = time.monotonic()
+                if self.pending is None and now >= self.next_sync:
+                    self.pending = PERIODIC
+                if self.pending is None and now < next_check:
+                    self.condition.wait(min(self.next_sync, next_check, now + WAKE_INTERVAL) - now)
+                kind, self.pending = self.pending, None
+                self.running = kind is not None
+
+            now = time.monotonic()
+            if self.tick:
+                self.tick(now - last_tick)
+            last_tick = now
+
+            if kind is not None:
+                self._run(kind)
+            elif now >= next_check:
+                next_check = now + self.core.internet_check_interval
+                if self.core.connection_restored():
+                    self.trigger()
+
+    def _run(self, kind):
+        metrics.counter("sync.started", "Syncs run by the scheduler").inc()
+        try:
+            if kind == MANUAL:
+                success = self.core.sync_now()
+            else:
+                success = self.core.attempt_sync() == SYNCED and self.core.last_sync_success
+        except Exception as e:
+            print(f"Error during sync: {str(e)}")
+            success = False
+
+        with self.condition:
+            self.running = False
+            if success:
+                self.failures = 0
+                delay = self.core.adapt_interval()
+            else:
+                self.failures += 1
+                delay = self.backoff_delay()
+                print(f"Next sync in {delay:.0f} s")
+            self.next_sync = time.monotonic() + delay
@@ -1,21 +1,86 @@
-from PyQt5.QtWidgets import QTableWidgetItem, QPushButton
-from PyQt5.QtCore import Qt
-from db_functions import fetch_all_staff
-from utilities import format_time
-from ui_builders import bold_font, create_centered_item, create_work_time_item, create_centered_widget
+from datetime import datetime, time, timedelta
+from PyQt5.QtWidgets import QHeaderView
+import db_functions
+from ui_builders import WORK_IN
+from button_delegate import ButtonDelegate
+from roster_model import RosterTableModel
+from staff_search import StaffSearchIndex
+from punctuality import PunctualityStats
+from metrics import timed
+
+def _clock_seconds(time_str):
+    """Seconds since midnight of an 'HH:MM:SS' time"""
+    hours, minutes, seconds = time_str.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
 
 class TableManager:
-    def __init__(self, table_widget, current_datetime, beirut_tz):
-        self.table = table_widget
+    ROW_HEIGHT = 60
+
+    # RosterRow fields each table column is built from
+    COLUMN_FIELDS = {
+        0: ("first_name", "last_name"),                              # Name
+        1: ("sched_in", "open_schedule"),                            # Scheduled In
+        # Work In, a button again between the sessions of a split shift
+        2: ("sched_in", "work_in", "work_off", "open_in", "open_schedule"),
+        3: ("sched_out", "open_schedule"),                           # Scheduled Out
+        4: ("sched_out", "work_in", "work_off", "open_schedule"),    # Work Off
+        # Hours, running while a session is open and red past the scheduled length
+        5: ("hours_worked", "open_in", "sched_in", "sched_out", "open_schedule"),
+    }
+    PREFETCH_MINUTES = 10  # Start building tomorrow's roster this long before midnight
+    # A search matching fewer than one in this many staff sorts its matches instead of filtering the roster
+    SORT_MATCHES_RATIO = 8
+
+    def __init__(self, table_view, current_datetime, beirut_tz, store=None):
+        self.table = table_view
+        self.model = RosterTableModel(table_view)
+        # Where rows are read from: the local database, or a HubClient on terminals
+        self.store = store if store is not None else db_functions
         self.current_datetime = current_datetime
         self.beirut_tz = beirut_tz
         self.staff_data = None
         self.last_refresh_date = None
+        # Keyed view of the roster; row_ids is replaced, never changed in place, as the model may show it
+        self.row_ids = []       # staff_id of each roster row, in display order
+        self.rows_by_id = {}    # staff_id -> roster row currently displayed
+        self._positions = None  # staff_id -> roster row, rebuilt lazily after structural changes
+        self.spanned_rows = set()  # Rows of the view whose day off spans the schedule columns
+        # Type-ahead search state
+        self.search_index = StaffSearchIndex()
+        self.search_text = ""
+        # Staff on shift: staff_id -> [open_in s, closed hours s, scheduled s or None, shown (text, overtime)]
+        self.live_sessions = {}
+        self.live_hours_minute = None   # App-time minute the running hours were last updated for
+        # Late arrivals over the last 30 days, shown when hovering a name
+        self.punctuality = PunctualityStats(self.store)
+        # Tomorrow's roster, built in the background before midnight:
+        # (date, rows, search index, generation, (staff_id, minutes late) of each row)
+        self.next_day = None
+        self.next_day_requested = None  # Date a prefetch was last started for
+        self.data_generation = 0        # Bumped whenever the data may have changed under a prefetch
         # Store callbacks
         self.handle_work_in_callback = None
         self.handle_work_off_callback = None
         self.show_error_callback = None
 
+        self._setup_view()
+
+    def _setup_view(self):
+        """Show the model with fixed row heights, so Qt never measures rows it doesn't paint"""
+        self.table.setModel(self.model)
+        header = self.table.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.Fixed)
+        header.setDefaultSectionSize(self.ROW_HEIGHT)
+        # Work In / Work Off buttons are painted by a delegate instead of per-row widgets
+        button_delegate = ButtonDelegate(self.table)
+        button_delegate.clicked.connect(self._handle_button_click)
+        button_delegate.tooltip_provider = self._tooltip
+        self.table.setItemDelegate(button_delegate)
+        # Day off rows are spanned as they come on screen
+        scroll_bar = self.table.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._span_visible_rows)
+        scroll_bar.rangeChanged.connect(self._span_visible_rows)
+
     def set_callbacks(self, handle_work_in_callback, handle_work_off_callback, show_error_callback):
         """Set the callbacks for table interactions"""
         self.handle_work_in_callback = handle_work_in_callback
@@ -26,133 +91,369 @@ class TableManager:
         """
         Refresh the table data and display.
         Args:
-            force (bool): If True, refreshes regardless of whether data has changed
+            force (bool): If True, re-queries the data even if the date has not changed.
+                          Only the rows and cells that changed are updated.
         """
         if not all([self.handle_work_in_callback, self.handle_work_off_callback, self.show_error_callback]):
             print("Error: Callbacks not set for TableManager")
             return False
 
         current_date = self.current_datetime.date()
-        
+
         try:
+            # Midnight rollover: show the roster built before midnight instead of querying on the clock tick
+            if not force and self.staff_data is not None and self.last_refresh_date != current_date:
+                prepared = self._take_next_day(current_date)
+                if prepared is not None:
+                    self.staff_data = prepared[1]
+                    self._rebuild_table(prepared[2], prepared[4])
+                    self.last_refresh_date = current_date
+                    return True
+
             # Only refresh if date has changed or force=True
             if force or self.last_refresh_date != current_date:
-                new_data = fetch_all_staff(current_date.strftime("%Y-%m-%d"))
-                
-                # Check if data has actually changed
-                if force or self._has_data_changed(new_data):
+                if force:
+                    # A sync or reload may have changed tomorrow's schedules too
+                    self.discard_next_day()
+                new_data = self.store.fetch_all_staff(current_date.strftime("%Y-%m-%d"))
+
+                # A new day changes every row, so rebuild from scratch
+                if self.staff_data is None or self.last_refresh_date != current_date:
                     self.staff_data = new_data
                     self._rebuild_table()
                     self.last_refresh_date = current_date
                     return True
-                    
+
+                # Same day: apply only what changed
+                if self._has_data_changed(new_data):
+                    self._apply_diff(new_data)
+                    return True
+
+        except Exception as e:
+            self.show_error_callback(f"Error refreshing table: {str(e)}")
+            return False
+
+        return False
+
+    def refresh_staff(self, staff_id):
+        """
+        Re-query and update the row of a single staff member.
+        Falls back to a full keyed refresh if the staff member is not displayed yet.
+        """
+        if self.staff_data is None or staff_id not in self.rows_by_id:
+            return self.refresh(force=True)
+
+        current_date = self.current_datetime.date()
+        if self.last_refresh_date != current_date:
+            return self.refresh()
+
+        try:
+            new_row = self.store.fetch_staff(staff_id, current_date.strftime("%Y-%m-%d"))
+            old_row = self.rows_by_id[staff_id]
+
+            # Deleted or renamed (which may move the row) goes through the full diff
+            if new_row is None or (new_row.first_name, new_row.last_name) != (old_row.first_name, old_row.last_name):
+                return self.refresh(force=True)
+
+            if new_row != old_row:
+                self._update_row(old_row, new_row)
+                self.staff_data = [self.rows_by_id[row_id] for row_id in self.row_ids]
+                return True
+
         except Exception as e:
             self.show_error_callback(f"Error refreshing table: {str(e)}")
             return False
-                
+
         return False
 
     def _has_data_changed(self, new_data):
         """Check if the new data is different from current data."""
         if self.staff_data is None:
             return True
-            
-        if len(self.staff_data) != len(new_data):
-            return True
-            
-        # Compare each row's key data
-        for old_row, new_row in zip(self.staff_data, new_data):
-            if (old_row[2:8] != new_row[2:8]):  # Compare relevant fields
-                return True
-                
-        return False
 
-    def _rebuild_table(self):
-        """Rebuild the entire table with current data"""
-        self.table.setRowCount(0)
-        row_height = 60
-
-        for row, (staff_id, first_name, last_name, sched_in, sched_out, 
-                 work_in, work_off, hours_worked, day_off, open_schedule) in enumerate(self.staff_data):
-                     
-            self.table.insertRow(row)
-            self.table.setRowHeight(row, row_height)
-
-            # Build name column
-            self._build_name_column(row, first_name, last_name)
-
-            if day_off:
-                self._display_day_off(row)
-            else:
-                self._build_schedule_columns(row, sched_in, sched_out, work_in, 
-                                          work_off, hours_worked, staff_id, row_height,
-                                          open_schedule)
-
-    def _build_name_column(self, row, first_name, last_name):
-        """Build the name column"""
-        display_name = f"{first_name} {last_name[0]}."
-        name_item = QTableWidgetItem(display_name)
-        name_item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        self.table.setItem(row, 0, name_item)
-
-    def _build_schedule_columns(self, row, sched_in, sched_out, work_in, 
-                              work_off, hours_worked, staff_id, row_height, open_schedule):
-        """Build all schedule-related columns"""
-        # Convert times to AM/PM for display
-        sched_in_display = format_time(sched_in)
-        sched_out_display = format_time(sched_out)
-        work_in_display = format_time(work_in)
-        work_off_display = format_time(work_off)
-        
-        # Scheduled In
-        sched_in_text = "Open" if open_schedule else (sched_in_display if sched_in else "")
-        self.table.setItem(row, 1, create_centered_item(sched_in_text))
-
-        # Work In
-        if not work_in:
-            self._create_work_in_button(row, staff_id, row_height)
+        return self.staff_data != new_data
+
+    @timed("ui.rebuild_table", "Full roster table rebuild")
+    def _rebuild_table(self, search_index=None, arrivals=None):
+        """
+        Show staff_data from scratch, in one model reset.
+        Args:
+            search_index (StaffSearchIndex): Index already built over staff_data, if any.
+            arrivals (list): (staff_id, minutes late) of each row of staff_data, if already collected.
+        """
+        self.row_ids = [data.staff_id for data in self.staff_data]
+        self.rows_by_id = {data.staff_id: data for data in self.staff_data}
+        self._positions = None
+
+        self.punctuality.advance(self.current_datetime.date())
+        if arrivals is None:
+            arrivals = [(data.staff_id, data.minutes_late) for data in self.staff_data]
+        self.punctuality.record_all(arrivals)
+
+        self.live_sessions = {}
+        live_hours = {}
+        now = self._now_seconds()
+        for data in self.staff_data:
+            if data.open_in and not data.day_off:
+                live_hours[data.staff_id] = self._start_live_session(data, now)
+
+        if search_index is not None:
+            self.search_index = search_index
         else:
-            self.table.setItem(row, 2, create_work_time_item(work_in_display, 
-                             sched_in_display if sched_in and not open_schedule else None))
-
-        # Scheduled Out
-        sched_out_text = "Open" if open_schedule else (sched_out_display if sched_out else "")
-        self.table.setItem(row, 3, create_centered_item(sched_out_text))
-
-        # Work Off
-        if work_in and not work_off:
-            self._create_work_off_button(row, staff_id, work_in, row_height)
-        elif work_off:
-            self.table.setItem(row, 4, create_work_time_item(work_off_display, 
-                             sched_out_display if sched_out and not open_schedule else None, 
-                             is_work_off=True))
-
-        # Hours
-        hours_display = f"{hours_worked:.2f}" if hours_worked is not None else ""
-        self.table.setItem(row, 5, create_centered_item(hours_display))
-
-    def _display_day_off(self, row):
-        self.table.setSpan(row, 1, 1, 5)
-        day_off_item = QTableWidgetItem("DAY OFF")
-        day_off_item.setTextAlignment(Qt.AlignCenter)
-        day_off_item.setBackground(Qt.lightGray)
-        day_off_item.setFont(bold_font())
-        self.table.setItem(row, 1, day_off_item)
-
-    def _create_work_in_button(self, row, staff_id, row_height):
-        work_in_button = QPushButton("Work In")
-        work_in_button.setStyleSheet("background-color: #2196F3; color: white; font-weight: bold;")
-        work_in_button.setFixedSize(120, int(row_height * 0.8))
-        work_in_button.clicked.connect(lambda: self.handle_work_in_callback(row, staff_id))
-        self.table.setCellWidget(row, 2, create_centered_widget(work_in_button))
-
-    def _create_work_off_button(self, row, staff_id, work_in_time, row_height):
-        work_off_button = QPushButton("Work Off")
-        work_off_button.setStyleSheet("background-color: #2196F3; color: white; font-weight: bold;")
-        work_off_button.setFixedSize(120, int(row_height * 0.8))
-        work_off_button.clicked.connect(lambda: self.handle_work_off_callback(row, staff_id, work_in_time))
-        self.table.setCellWidget(row, 4, create_centered_widget(work_off_button))
+            self.search_index.rebuild(self.staff_data)
+        self.model.set_roster(self.rows_by_id, self._matching_ids(self.search_text), live_hours)
+        self._reset_spans()
+
+    def next_day_due(self):
+        """Tomorrow's date if its roster should be prefetched now, otherwise None"""
+        if self.staff_data is None:
+            return None
+        tomorrow = self.current_datetime.date() + timedelta(days=1)
+        if self.next_day_requested == tomorrow:
+            return None
+        # Wall-clock minutes left, ignoring the timezone object on current_datetime
+        midnight = datetime.combine(tomorrow, time.min)
+        if midnight - self.current_datetime.replace(tzinfo=None) > timedelta(minutes=self.PREFETCH_MINUTES):
+            return None
+        self.next_day_requested = tomorrow
+        return tomorrow
+
+    def build_next_day(self, target_date):
+        """
+        Fetch a day's roster and do the Qt-free part of building it: formatting
+        its times and the search index. Safe to run off the UI thread.
+        Returns a value for set_next_day().
+        """
+        generation = self.data_generation
+        rows = self.store.fetch_all_staff(target_date.strftime("%Y-%m-%d"))
+        for data in rows:
+            # Fills the shared formatted time cache, so the cells only look times up
+            data.sched_in_display
+            data.sched_out_display
+            data.work_in_display
+            data.work_off_display
+        search_index = StaffSearchIndex()
+        search_index.rebuild(rows)
+        arrivals = [(data.staff_id, data.minutes_late) for data in rows]
+        return (target_date, rows, search_index, generation, arrivals)
+
+    def set_next_day(self, prepared):
+        """Keep a roster from build_next_day() for the rollover, unless the data changed meanwhile"""
+        if prepared is None or prepared[3] != self.data_generation:
+            # Failed or stale; the next clock tick starts another prefetch
+            self.next_day_requested = None
+            return False
+        self.next_day = prepared
+        return True
+
+    def discard_next_day(self):
+        self.data_generation += 1
+        self.next_day = None
+        self.next_day_requested = None
+
+    def _take_next_day(self, current_date):
+        prepared, self.next_day = self.next_day, None
+        self.next_day_requested = None
+        if prepared is None or prepared[0] != current_date or prepared[3] != self.data_generation:
+            return None
+        return prepared
+
+    @timed("ui.apply_diff", "Keyed roster table update")
+    def _apply_diff(self, new_data):
+        """
+        Apply the new data keyed by staff_id. Changed rows repaint only their
+        changed cells; staff added, deleted or moved by a rename reset the model.
+        """
+        new_rows = {data.staff_id: data for data in new_data}
+
+        for staff_id in self.rows_by_id.keys() - new_rows.keys():
+            self.search_index.remove(staff_id)
+            self.live_sessions.pop(staff_id, None)
+            self.model.set_live_hours(staff_id, None)
+            self.punctuality.forget(staff_id)
+
+        for data in new_data:
+            old_data = self.rows_by_id.get(data.staff_id)
+            if old_data is None:
+                self.rows_by_id[data.staff_id] = data
+                self.search_index.add(data.staff_id, data.first_name, data.last_name)
+                self.punctuality.record(data.staff_id, data.minutes_late)
+                self._sync_live_hours(data)
+            elif old_data != data:
+                self._update_row(old_data, data)
+
+        self.staff_data = new_data
+        new_ids = [data.staff_id for data in new_data]
+        if new_ids == self.row_ids:
+            # Renames that kept their place can still change what the search matches
+            self.apply_search(self.search_text)
+            return
+
+        self.row_ids = new_ids
+        self.rows_by_id = new_rows
+        self._positions = None
+        self.model.set_roster(self.rows_by_id, self._matching_ids(self.search_text), self.model.live_hours)
+        self._reset_spans()
+
+    def apply_search(self, text):
+        """Show only the rows matching the search text, in one model reset"""
+        self.search_text = text
+        shown = self._matching_ids(text)
+        if shown == self.model.shown:
+            return
+        self.model.set_shown(shown)
+        self._reset_spans()
+
+    def _matching_ids(self, text):
+        """staff_id of the staff the search text matches, in roster order"""
+        matches = self.search_index.search(text)
+        # Matches are always staff of the roster, so as many as it has is all of them
+        if matches is None or len(matches) == len(self.row_ids):
+            return self.row_ids
+        if len(matches) * self.SORT_MATCHES_RATIO < len(self.row_ids):
+            return sorted(matches, key=self._row_positions().__getitem__)
+        return list(filter(matches.__contains__, self.row_ids))
+
+    def _reset_spans(self):
+        """After a model reset: drop the spans of the rows shown before, and span those on screen now"""
+        if self.spanned_rows:
+            self.table.clearSpans()
+            self.spanned_rows = set()
+        self._span_visible_rows()
+
+    def _span_visible_rows(self, *args):
+        """
+        Span the schedule columns of the day off rows on screen. Rows are only
+        spanned once scrolled to, so a reset costs the same at any roster size.
+        """
+        first = self.table.rowAt(0)
+        if first < 0:
+            return
+        last = self.table.rowAt(self.table.viewport().height() - 1)
+        if last < 0:
+            last = self.model.rowCount() - 1
+        shown = self.model.shown
+        for row in range(first, last + 1):
+            if row not in self.spanned_rows and self.rows_by_id[shown[row]].day_off:
+                self.table.setSpan(row, 1, 1, 5)
+                self.spanned_rows.add(row)
+
+    def _update_row(self, old_data, new_data):
+        """Show a staff member's new row, repainting only the cells whose source fields changed"""
+        staff_id = new_data.staff_id
+        self.rows_by_id[staff_id] = new_data
+
+        if old_data.day_off != new_data.day_off:
+            changed = set(self.COLUMN_FIELDS)
+            row = self.model.row_of(staff_id)
+            if row is not None and new_data.day_off:
+                self.table.setSpan(row, 1, 1, 5)
+                self.spanned_rows.add(row)
+            elif row in self.spanned_rows:
+                self.table.setSpan(row, 1, 1, 1)
+                self.spanned_rows.discard(row)
+        else:
+            changed = {
+                column for column, fields in self.COLUMN_FIELDS.items()
+                if any(getattr(old_data, field) != getattr(new_data, field) for field in fields)
+            }
+        if not changed:
+            return
+
+        # A punch in (or a schedule change) moves the punctuality figures
+        if 2 in changed:
+            self.punctuality.record(staff_id, new_data.minutes_late)
+
+        if 0 in changed:
+            self.search_index.add(staff_id, new_data.first_name, new_data.last_name)
+
+        if 5 in changed:
+            self._sync_live_hours(new_data)
+
+        self.model.row_changed(staff_id, min(changed), max(changed))
+
+    def _row_positions(self):
+        """Mapping of staff_id to current roster row"""
+        if self._positions is None:
+            self._positions = {staff_id: row for row, staff_id in enumerate(self.row_ids)}
+        return self._positions
+
+    def _row_of(self, staff_id):
+        """Current roster row of a staff member"""
+        return self._row_positions()[staff_id]
+
+    def _sync_live_hours(self, data):
+        """Start or stop the running hours of a row whose session may have opened or closed"""
+        if data.open_in and not data.day_off:
+            self.model.set_live_hours(data.staff_id, self._start_live_session(data, self._now_seconds()))
+        elif self.live_sessions.pop(data.staff_id, None) is not None:
+            self.model.set_live_hours(data.staff_id, None)
+
+    def _start_live_session(self, data, now):
+        """Keep the running hours of an open session ticking. Returns the (text, overtime) shown now."""
+        scheduled = None
+        if data.sched_in and data.sched_out and not data.open_schedule:
+            scheduled = (_clock_seconds(data.sched_out) - _clock_seconds(data.sched_in)) % 86400 or None
+        closed = round((data.hours_worked or 0) * 3600)
+        session = [_clock_seconds(data.open_in), closed, scheduled, None]
+        session[3] = self._live_hours(session, now)
+        self.live_sessions[data.staff_id] = session
+        return session[3]
+
+    @timed("ui.live_hours", "Running hours update of staff on shift")
+    def update_live_hours(self):
+        """
+        Once per app-time minute, recompute the running hours of everyone on
+        shift from the sessions already in memory and repaint only the Hours
+        cells whose text or overtime state changed. No query, no rebuild.
+        Returns the number of cells updated.
+        """
+        minute = self.current_datetime.replace(second=0, microsecond=0)
+        if minute == self.live_hours_minute or not self.live_sessions:
+            self.live_hours_minute = minute
+            return 0
+        self.live_hours_minute = minute
+
+        now = self._now_seconds()
+        updated = 0
+        for staff_id, session in self.live_sessions.items():
+            shown = self._live_hours(session, now)
+            if shown != session[3]:
+                session[3] = shown
+                self.model.set_live_hours(staff_id, shown)
+                updated += 1
+        return updated
+
+    @staticmethod
+    def _live_hours(session, now):
+        """(text, overtime) of a session's running hours"""
+        opened, closed, scheduled, shown = session
+        # Sessions run past midnight the same way the punch triggers count them
+        worked = closed + (now - opened) % 86400
+        return f"{worked / 3600:.2f}", scheduled is not None and worked > scheduled
+
+    def _now_seconds(self):
+        current = self.current_datetime
+        return current.hour * 3600 + current.minute * 60 + current.second
+
+    def _tooltip(self, index):
+        """Punctuality of the staff member under the mouse, worked out on hover instead of per rebuild"""
+        if index.column() != 0 or index.row() >= len(self.model.shown):
+            return None
+        return self.punctuality.describe(self.model.shown[index.row()])
+
+    def _handle_button_click(self, staff_id, button):
+        """Dispatch a delegate button click to the work in / work off callbacks"""
+        if staff_id not in self.rows_by_id:
+            return
+        # Rows shift as staff are added or removed, so resolve the row at click time
+        row = self._row_of(staff_id)
+        if button == WORK_IN:
+            self.handle_work_in_callback(row, staff_id)
+        else:
+            work_in_time = self.rows_by_id[staff_id].work_in
+            self.handle_work_off_callback(row, staff_id, work_in_time)
 
     def update_current_datetime(self, current_datetime):
         """Update the current datetime used by the manager"""
-        self.current_datetime = current_datetime
\ No newline at end of file
+        self.current_datetime = current_datetime
@@ -1,33 +1,73 @@
-
-from PyQt5.QtWidgets import QTableWidgetItem, QWidget, QHBoxLayout
+from PyQt5.QtWidgets import QWidget, QHBoxLayout
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from utilities import compare_times
-
-def create_centered_item(text):
-        item = QTableWidgetItem(text)
-        item.setTextAlignment(Qt.AlignCenter)
-        return item
-
-def create_work_time_item(work_time, scheduled_time, is_work_off=False):
-        item = create_centered_item(work_time)
-        if work_time and scheduled_time:
-            time_difference = compare_times(work_time, scheduled_time)
-            if is_work_off:
-                if time_difference < 0:
-                    item.setBackground(Qt.red)
-                else:
-                    item.setBackground(Qt.green)
+from PyQt5.QtGui import QFont, QBrush, QColor
+
+# Item data roles used by the table cells
+BUTTON_ROLE = Qt.UserRole          # WORK_IN / WORK_OFF for cells painted as buttons
+STAFF_ID_ROLE = Qt.UserRole + 1    # staff_id of the row the button belongs to
+
+WORK_IN = "work_in"
+WORK_OFF = "work_off"
+BUTTON_LABELS = {WORK_IN: "Work In", WORK_OFF: "Work Off"}
+BUTTON_COLOR = "#2196F3"
+BUTTON_PRESSED_COLOR = "#1976D2"
+LIVE_HOURS_COLOR = "#1565C0"       # running hours of staff still on shift
+
+# A cell is the data of each role it has, as the roster model serves it
+ALIGN_CENTER = int(Qt.AlignCenter)
+ALIGN_NAME = int(Qt.AlignLeft | Qt.AlignVCenter)
+
+# Fonts and brushes are shared by every cell, so they are only created once
+_bold_font = None
+_brushes = {}
+
+def centered_cell(text):
+        return {Qt.DisplayRole: text, Qt.TextAlignmentRole: ALIGN_CENTER}
+
+def name_cell(text):
+        return {Qt.DisplayRole: text, Qt.TextAlignmentRole: ALIGN_NAME}
+
+def work_time_cell(work_time, minutes_off_schedule, is_work_off=False):
+        """
+        A punch time, white on red when late in (or early off) and on green
+        otherwise. minutes_off_schedule is the row's minutes_late, or
+        minutes_early for a work off; None leaves the time uncolored.
+        """
+        cell = centered_cell(work_time)
+        if work_time and minutes_off_schedule is not None:
+            if minutes_off_schedule > 0:
+                cell[Qt.BackgroundRole] = shared_brush(Qt.red)
+                cell[Qt.ToolTipRole] = f"{minutes_off_schedule} min {'early' if is_work_off else 'late'}"
             else:
-                if time_difference > 0:
-                    item.setBackground(Qt.red)
-                else:
-                    item.setBackground(Qt.green)
-            item.setForeground(Qt.white)
+                cell[Qt.BackgroundRole] = shared_brush(Qt.green)
+            cell[Qt.ForegroundRole] = shared_brush(Qt.white)
+        else:
+            cell[Qt.ForegroundRole] = shared_brush(Qt.black)
+        cell[Qt.FontRole] = bold_font()
+        return cell
+
+def button_cell(button, staff_id, tooltip=None):
+        """A cell that the ButtonDelegate paints as a Work In / Work Off button"""
+        cell = {BUTTON_ROLE: button, STAFF_ID_ROLE: staff_id}
+        if tooltip:
+            cell[Qt.ToolTipRole] = tooltip
+        return cell
+
+def day_off_cell():
+        """The schedule columns of a day off, spanned into one grey cell"""
+        return {Qt.DisplayRole: "DAY OFF", Qt.TextAlignmentRole: ALIGN_CENTER,
+                Qt.BackgroundRole: shared_brush(Qt.lightGray), Qt.FontRole: bold_font()}
+
+def live_hours_cell(text, overtime):
+        """Running hours of an open session: blue, or white on red once past the scheduled length"""
+        cell = centered_cell(text)
+        if overtime:
+            cell[Qt.BackgroundRole] = shared_brush(Qt.red)
+            cell[Qt.ForegroundRole] = shared_brush(Qt.white)
         else:
-            item.setForeground(Qt.black)
-        item.setFont(bold_font())
-        return item
+            cell[Qt.ForegroundRole] = shared_brush(LIVE_HOURS_COLOR)
+        cell[Qt.FontRole] = bold_font()
+        return cell
 
 def create_centered_widget(widget):
         container = QWidget()
@@ -39,6 +79,16 @@ def create_centered_widget(widget):
         return container
 
 def bold_font():
-        font = QFont()
-        font.setBold(True)
-        return font
\ No newline at end of file
+        global _bold_font
+        if _bold_font is None:
+            _bold_font = QFont()
+            _bold_font.setBold(True)
+        return _bold_font
+
+def shared_brush(color):
+        """Return a cached brush for a Qt global color or a '#RRGGBB' string"""
+        brush = _brushes.get(color)
+        if brush is None:
+            brush = QBrush(QColor(color))
+            _brushes[color] = brush
+        return brush
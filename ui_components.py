@@ -1,7 +1,8 @@
 from pytz import timezone
 from PyQt5.QtWidgets import QApplication, QWidget, QMessageBox, QSystemTrayIcon
 from PyQt5.QtCore import QTimer
-from Classes import TimeSync, DataSync, LoadingScreen, LoadingSignals
+from Classes import (TimeSync, DataSync, LoadingScreen, LoadingSignals, PunchSignals, HubSignals,
+                     RosterPrefetchWorker)
 from table_manager import TableManager
 from work_time_manager import WorkTimeManager
 from sync_manager import SyncManager
@@ -9,15 +10,42 @@ from loading_manager import LoadingManager
 from window_manager import WindowManager
 from signal_handler import SignalHandler
 from internet_conn import is_internet_available
+from hub_server import HubServer
+from hub_client import HubClient
+import hub_protocol
+from diagnostics_dialog import DiagnosticsDialog
+from attendance_grid import AttendanceGridDialog
+from db_backup import BackupManager, BACKUP_CHECK_INTERVAL
+from db_maintenance import MaintenanceManager, MAINTENANCE_CHECK_INTERVAL
+import metrics
 
 class MainWindow(QWidget):
-    def __init__(self):
+    def __init__(self, startup_time=None):
         super().__init__()
         # Initialize is internet available
         self.is_internet_available = is_internet_available
         
         # Initialize signals
         self.loading_signals = LoadingSignals()
+        self.punch_signals = PunchSignals()
+        self.punch_server = None
+        self.diagnostics_dialog = None
+        self.attendance_grid_dialog = None
+
+        # Standalone keeps its own database; a hub shares it with terminals, which read and write through it
+        self.mode = hub_protocol.get_mode()
+        self.hub_signals = HubSignals()
+        self.hub_server = None
+        self.hub_client = None
+        self.store = None  # None means the local database
+        if self.mode == hub_protocol.TERMINAL:
+            host, port = hub_protocol.hub_address()
+            # Pushes arrive on the subscriber thread; the signals hand them to the UI thread
+            self.hub_client = HubClient(host, port, hub_protocol.hub_token(),
+                                        on_punched=self.hub_signals.punched.emit,
+                                        on_reload=self.hub_signals.reload.emit)
+            self.store = self.hub_client
+            print(f"Terminal mode, using the hub at {host}:{port}")
         
         # Initialize TimeSync and core datetime
         self.time_sync = TimeSync()
@@ -29,17 +57,38 @@ class MainWindow(QWidget):
         # Initialize managers
         self.window_manager = WindowManager(self)
         self.signal_handler = SignalHandler(self)
-        self.work_time_manager = WorkTimeManager(self.current_datetime, self.beirut_tz)
-        self.data_sync = DataSync(self.current_datetime)
+        self.work_time_manager = WorkTimeManager(self.current_datetime, self.beirut_tz, self.store)
+        # Terminals leave the remote API to the hub; their sync re-reads the roster from it
+        self.data_sync = self.hub_client if self.hub_client else DataSync(self.current_datetime)
         self.sync_manager = SyncManager(self.time_sync, self.data_sync, self.current_datetime)
 
         # Create loading screen and manager
         self.loading_screen = LoadingScreen()
-        self.loading_manager = LoadingManager(self.loading_screen, self)
+        self.loading_manager = LoadingManager(self.loading_screen, self, startup_time)
 
         # Set up all signals
         self.signal_handler.setup_signals()
 
+        # Export the metrics snapshot periodically
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(metrics.registry.export)
+        self.metrics_timer.start(metrics.EXPORT_INTERVAL * 1000)
+
+        # Snapshot the database in the background when the last one is a day old;
+        # terminals have no database of their own
+        self.backup_manager = None if self.hub_client else BackupManager()
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self.backup_if_due)
+        if self.backup_manager:
+            self.backup_timer.start(BACKUP_CHECK_INTERVAL * 1000)
+
+        # ANALYZE, vacuum and orphan cleanup in small steps once punching goes quiet
+        self.maintenance_manager = None if self.hub_client else MaintenanceManager()
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.maintenance_if_idle)
+        if self.maintenance_manager:
+            self.maintenance_timer.start(MAINTENANCE_CHECK_INTERVAL * 1000)
+
         # Show loading screen and start sequence
         self.loading_screen.show()
         QTimer.singleShot(100, self.loading_manager.start_loading_sequence)
@@ -48,20 +97,22 @@ class MainWindow(QWidget):
         """Handler for loading completion signal"""
         self.loading_manager.finish_loading()
     
-    def handle_ntp_sync_complete(self, ntp_time):
-        """Handler for NTP sync completion"""
-        if ntp_time:
-            self.current_datetime = ntp_time
-            print(f"NTP sync successful: {self.current_datetime}")
-        else:
-            print("NTP sync failed, using system time")
-        
+    def prefetch_next_day(self):
+        """Build tomorrow's roster in the background during the last minutes of the day"""
+        target_date = self.table_manager.next_day_due()
+        if target_date is None:
+            return
+        self.roster_prefetch_worker = RosterPrefetchWorker(self.table_manager, target_date)
+        self.roster_prefetch_worker.finished.connect(self.handle_roster_prefetch_complete)
+        self.roster_prefetch_worker.start()
+
+    def handle_roster_prefetch_complete(self, prepared):
+        """Keep the prefetched roster for the swap at midnight"""
+        self.table_manager.set_next_day(prepared)
+
         # Clean up the worker
-        if hasattr(self, 'ntp_worker'):
-            self.ntp_worker.deleteLater()
-        
-        # Signal that loading is complete
-        self.loading_signals.finished.emit()
+        if hasattr(self, 'roster_prefetch_worker'):
+            self.roster_prefetch_worker.deleteLater()
 
     def show_window(self):
         """Show and maximize the window"""
@@ -74,7 +125,8 @@ class MainWindow(QWidget):
         # Initialize table manager with the table from window manager
         self.table_manager = TableManager(self.window_manager.table, 
                                         self.current_datetime, 
-                                        self.beirut_tz)
+                                        self.beirut_tz,
+                                        self.store)
         
         # Set up table manager callbacks
         self.table_manager.set_callbacks(
@@ -83,6 +135,9 @@ class MainWindow(QWidget):
             show_error_callback=self.show_error_message
         )
 
+        # Filter the roster as the user types
+        self.window_manager.search_box.textChanged.connect(self.table_manager.apply_search)
+
         # Initial table refresh
         self.table_manager.refresh(force=True)
 
@@ -93,24 +148,106 @@ class MainWindow(QWidget):
     def handle_work_in(self, row, staff_id):
         """Handle work in button clicks"""
         if self.work_time_manager.handle_work_in(row, staff_id, self.show_error_message):
-            self.table_manager.refresh(force=True)
+            self.table_manager.refresh_staff(staff_id)
+            self.refresh_attendance_grid()
+            self.notify_terminals([staff_id])
 
     def handle_work_off(self, row, staff_id, work_in_time):
         """Handle work off button clicks"""
         if self.work_time_manager.handle_work_off(row, staff_id, work_in_time, self.show_error_message):
-            self.table_manager.refresh(force=True)
+            self.table_manager.refresh_staff(staff_id)
+            self.refresh_attendance_grid()
+            self.notify_terminals([staff_id])
+
+    def start_punch_server(self):
+        """Start accepting punches from badge readers and secondary terminals"""
+        # Imported here: http.server is a noticeable part of the import time before the first frame
+        from punch_server import PunchServer
+        self.punch_signals.recorded.connect(self.handle_remote_punches)
+        # The server calls back from its writer thread; the signal hands the ids to the UI thread
+        self.punch_server = PunchServer(self.work_time_manager,
+                                        on_recorded=self.punch_signals.recorded.emit)
+        if not self.punch_server.start():
+            self.punch_server = None
+
+    def handle_remote_punches(self, staff_ids):
+        """Show punches recorded through the punch server"""
+        self.handle_hub_punches(staff_ids)
+        self.notify_terminals(staff_ids)
+
+    def start_hub(self):
+        """Serve the terminals in hub mode, or subscribe to the hub's changes in terminal mode"""
+        if self.mode == hub_protocol.HUB:
+            self.hub_signals.punched.connect(self.handle_hub_punches)
+            host, port = hub_protocol.hub_address()
+            # Terminal punches are reported from connection threads
+            self.hub_server = HubServer(on_recorded=self.hub_signals.punched.emit,
+                                        host=host, port=port, token=hub_protocol.hub_token())
+            if not self.hub_server.start():
+                self.hub_server = None
+        elif self.mode == hub_protocol.TERMINAL:
+            self.hub_signals.punched.connect(self.handle_hub_punches)
+            self.hub_signals.reload.connect(lambda: self.table_manager.refresh(force=True))
+            self.hub_client.start()
+
+    def handle_hub_punches(self, staff_ids):
+        """Show rows changed by another terminal"""
+        for staff_id in dict.fromkeys(staff_ids):
+            self.table_manager.refresh_staff(staff_id)
+        self.refresh_attendance_grid()
+
+    def notify_terminals(self, staff_ids=None):
+        """In hub mode, push changed rows (or a full reload when staff_ids is None) to the terminals"""
+        if self.hub_server is None:
+            return
+        if staff_ids is None:
+            self.hub_server.notify_reload()
+        else:
+            self.hub_server.notify_punches(staff_ids, self.current_datetime.date().strftime("%Y-%m-%d"))
+
+    def backup_if_due(self):
+        """Start a background snapshot unless one is running or the last is recent"""
+        if self.backup_manager.is_running() or not self.backup_manager.is_due():
+            return
+        self.backup_manager.start_backup()
+
+    def maintenance_if_idle(self):
+        """Start the due maintenance tasks if nobody has punched for a while"""
+        # A backup copying the file would only be slowed down by it
+        if self.backup_manager and self.backup_manager.is_running():
+            return
+        self.maintenance_manager.start_if_due()
+
+    def show_diagnostics(self):
+        """Show the live metrics dialog"""
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.refresh()
+        self.diagnostics_dialog.refresh_timer.start(DiagnosticsDialog.REFRESH_INTERVAL)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def show_attendance_grid(self):
+        """Show the weekly / monthly attendance grid"""
+        today = self.current_datetime.date()
+        # A grid opened yesterday ends a day short
+        if self.attendance_grid_dialog is None or self.attendance_grid_dialog.today != today:
+            self.attendance_grid_dialog = AttendanceGridDialog(today, self.store, self)
+        self.attendance_grid_dialog.show()
+        self.attendance_grid_dialog.raise_()
+
+    def refresh_attendance_grid(self):
+        """Let an open attendance grid re-read today after a punch"""
+        if self.attendance_grid_dialog is not None and self.attendance_grid_dialog.isVisible():
+            self.attendance_grid_dialog.punched(self.current_datetime.date())
 
     def show_error_message(self, message):
         """Show error message to user"""
         QMessageBox.critical(self, "Error", message)
 
     def sync_data(self):
-        """Method for manual data sync"""
-        try:
-            if self.data_sync.sync_data(self.current_datetime):
-                self.table_manager.refresh(force=True)
-        except Exception as e:
-            print(f"Error during manual data sync: {str(e)}")
+        """Manual sync; the roster refreshes when it completes"""
+        self.sync_manager.sync_time_and_data()
 
     def closeEvent(self, event):
         """Handle window close event to minimize to both taskbar and system tray"""
@@ -126,4 +263,18 @@ class MainWindow(QWidget):
     def close_application(self):
         """Clean shutdown of the application"""
         self.sync_manager.stop_timers()
+        self.metrics_timer.stop()
+        self.backup_timer.stop()
+        if self.backup_manager:
+            self.backup_manager.stop()
+        self.maintenance_timer.stop()
+        if self.maintenance_manager:
+            self.maintenance_manager.stop()
+        metrics.registry.export()
+        if self.punch_server:
+            self.punch_server.stop()
+        if self.hub_server:
+            self.hub_server.stop()
+        if self.hub_client:
+            self.hub_client.stop()
         QApplication.quit()
\ No newline at end of file
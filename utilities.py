@@ -2,8 +2,6 @@
 import os
 import sys
 from datetime import datetime
-from PyQt5.QtWidgets import QSystemTrayIcon, QMenu
-from PyQt5.QtGui import QIcon
 
 def format_time(time_str):
         if not time_str:
@@ -33,6 +31,9 @@ def resource_path(relative_path):
         return os.path.join(base_path, relative_path)
 
 def setup_system_tray(self):
+        # Imported here so the time helpers can be used without Qt
+        from PyQt5.QtWidgets import QSystemTrayIcon, QMenu
+        from PyQt5.QtGui import QIcon
         self.tray_icon = QSystemTrayIcon(QIcon(resource_path("images/sys_icon.ico")), self)
         tray_menu = QMenu()
         show_action = tray_menu.addAction("Show")
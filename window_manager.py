@@ -1,6 +1,6 @@
 import os
 import sys
-from PyQt5.QtWidgets import QVBoxLayout, QLabel, QTableWidget, QHeaderView, QSystemTrayIcon, QMenu
+from PyQt5.QtWidgets import QVBoxLayout, QLabel, QLineEdit, QTableView, QHeaderView, QSystemTrayIcon, QMenu
 from PyQt5.QtGui import QPixmap, QIcon
 from PyQt5.QtCore import Qt
 from utilities import resource_path
@@ -9,6 +9,7 @@ class WindowManager:
     def __init__(self, main_window):
         self.main_window = main_window
         self.table = None  # Will be initialized during setup
+        self.search_box = None
         self.tray_icon = None
         
     def setup_window(self):
@@ -47,6 +48,10 @@ class WindowManager:
         self.main_window.datetime_label = QLabel()
         self.main_window.datetime_label.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(self.main_window.datetime_label)
+
+        # Add staff search box
+        self.search_box = self.create_search_box()
+        main_layout.addWidget(self.search_box)
         
         # Create and add table
         self.table = self.create_table()
@@ -62,14 +67,17 @@ class WindowManager:
         logo_label.setAlignment(Qt.AlignCenter)
         return logo_label
         
+    def create_search_box(self):
+        """Create and return the type-ahead staff search box"""
+        search_box = QLineEdit(self.main_window)
+        search_box.setPlaceholderText("Search staff...")
+        search_box.setClearButtonEnabled(True)
+        search_box.setStyleSheet("font-size: 16px; padding: 6px;")
+        return search_box
+        
     def create_table(self):
-        """Create and set up the table widget"""
-        table = QTableWidget(self.main_window)
-        table.setColumnCount(6)
-        table.setHorizontalHeaderLabels([
-            "Name", "Scheduled In", "Work In", 
-            "Scheduled Out", "Work Off", "Hours"
-        ])
+        """Create and set up the table view; TableManager gives it the roster model and its headers"""
+        table = QTableView(self.main_window)
         header = table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
         table.verticalHeader().setVisible(False)
@@ -92,6 +100,16 @@ class WindowManager:
         # Add menu items
         show_action = tray_menu.addAction("Show")
         show_action.triggered.connect(self.show_window)
+
+        # Syncs straight away instead of waiting out the adaptive interval
+        sync_action = tray_menu.addAction("Sync now")
+        sync_action.triggered.connect(self.main_window.sync_data)
+
+        grid_action = tray_menu.addAction("Attendance grid")
+        grid_action.triggered.connect(self.main_window.show_attendance_grid)
+
+        diagnostics_action = tray_menu.addAction("Diagnostics")
+        diagnostics_action.triggered.connect(self.main_window.show_diagnostics)
         
         quit_action = tray_menu.addAction("Quit")
         quit_action.triggered.connect(self.main_window.close_application)
@@ -1,11 +1,12 @@
 # work_time_manager.py
-from datetime import datetime, timedelta
-from db_functions import update_work_in, update_work_off
+import db_functions
 
 class WorkTimeManager:
-    def __init__(self, current_datetime, beirut_tz):
+    def __init__(self, current_datetime, beirut_tz, store=None):
         self.current_datetime = current_datetime
         self.beirut_tz = beirut_tz
+        # Where punches are recorded: the local database, or a HubClient on terminals
+        self.store = store if store is not None else db_functions
 
     def handle_work_in(self, row, staff_id, error_callback):
         """
@@ -18,7 +19,7 @@ class WorkTimeManager:
         """
         try:
             current_time = self.current_datetime.strftime("%H:%M:%S")  # 24-hour format
-            update_work_in(staff_id, current_time, self.current_datetime.date().strftime("%Y-%m-%d"))
+            self.store.update_work_in(staff_id, current_time, self.current_datetime.date().strftime("%Y-%m-%d"))
             return True
         except Exception as e:
             error_callback(f"Error recording Work In: {str(e)}")
@@ -26,7 +27,8 @@ class WorkTimeManager:
 
     def handle_work_off(self, row, staff_id, work_in_time, error_callback):
         """
-        Handle work off time recording and calculate hours worked
+        Handle work off time recording. Hours worked are derived from the
+        punch log when the punch is recorded.
         
         Args:
             row: Row number in the table
@@ -38,32 +40,32 @@ class WorkTimeManager:
             if work_in_time is None:
                 raise ValueError("Work In time is not available")
 
-            # Ensure work_in_time is timezone-aware
-            work_in_dt = datetime.strptime(work_in_time, "%H:%M:%S")
-            work_in_full = self.beirut_tz.localize(datetime.combine(self.current_datetime.date(), work_in_dt.time()))
-
-            # Ensure current_datetime is timezone-aware
-            current_datetime = self.beirut_tz.localize(self.current_datetime.replace(tzinfo=None))
-
-            # Calculate the time difference
-            time_diff = current_datetime - work_in_full
-
-            # Handle cases where work spans midnight
-            if time_diff.days < 0:
-                time_diff = timedelta(days=1) + time_diff
-
-            # Calculate hours worked
-            hours_worked = time_diff.total_seconds() / 3600
-
             # Format work_off_time in 24-hour format for database
-            work_off_time = current_datetime.strftime("%H:%M:%S")
+            work_off_time = self.current_datetime.strftime("%H:%M:%S")
 
-            update_work_off(staff_id, work_off_time, hours_worked, self.current_datetime.date().strftime("%Y-%m-%d"))
+            self.store.update_work_off(staff_id, work_off_time, self.current_datetime.date().strftime("%Y-%m-%d"))
             return True
         except Exception as e:
             error_callback(f"Error recording Work Off: {str(e)}")
             return False
 
+    def handle_punches(self, staff_ids):
+        """
+        Record a burst of punches from a badge reader or another terminal, all
+        stamped with the current app time. Each staff member is toggled: punched
+        in if no session is open, otherwise punched off.
+
+        Args:
+            staff_ids: IDs of the staff members, in arrival order
+
+        Returns:
+            List of (staff_id, punch_type, punch_time), punch_type None for unknown staff
+        """
+        current_datetime = self.current_datetime
+        punch_time = current_datetime.strftime("%H:%M:%S")  # 24-hour format
+        results = self.store.record_punches(staff_ids, punch_time, current_datetime.date().strftime("%Y-%m-%d"))
+        return [(staff_id, punch_type, punch_time) for staff_id, punch_type in results]
+
     def update_current_datetime(self, current_datetime):
         """
         Update the current datetime used by the manager